@@ -0,0 +1,199 @@
+import os
+import socket
+import threading
+import time
+from functools import partial
+from datetime import datetime, timedelta
+
+from flask import g
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import TarefaAgendada
+
+
+# Identifica este processo na coluna bloqueado_por
+ID_PROCESSO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _garantir_registro(nome: str):
+    """Cria a linha de controle da tarefa se ainda não existir."""
+    with db.engine.begin() as conn:
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(TarefaAgendada).values(nome=nome))
+        except IntegrityError:
+            pass  # Já existe (ou outro processo criou agora)
+
+
+def adquirir_tarefa(nome: str, intervalo: int, duracao_trava: int) -> bool:
+    """
+    Tenta assumir a execução da tarefa. Um único UPDATE condicional garante
+    que só um processo (entre todos os workers) ganha a vez: a tarefa precisa
+    estar vencida e sem trava válida de outro processo.
+    """
+    agora = datetime.now()
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            update(TarefaAgendada)
+            .where(
+                TarefaAgendada.nome == nome,
+                or_(
+                    TarefaAgendada.bloqueado_ate.is_(None),
+                    TarefaAgendada.bloqueado_ate < agora,
+                ),
+                or_(
+                    TarefaAgendada.ultima_execucao.is_(None),
+                    TarefaAgendada.ultima_execucao <= agora - timedelta(seconds=intervalo),
+                ),
+            )
+            .values(
+                bloqueado_ate=agora + timedelta(seconds=duracao_trava),
+                bloqueado_por=ID_PROCESSO,
+            )
+        )
+    return resultado.rowcount == 1
+
+
+def renovar_trava(nome: str, duracao_trava: int) -> bool:
+    """
+    Estende a trava deste processo sobre a tarefa. Falso se outro processo
+    já a assumiu (a trava expirou no meio da execução).
+    """
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            update(TarefaAgendada)
+            .where(TarefaAgendada.nome == nome, TarefaAgendada.bloqueado_por == ID_PROCESSO)
+            .values(bloqueado_ate=datetime.now() + timedelta(seconds=duracao_trava))
+        )
+    return resultado.rowcount == 1
+
+
+class TravaPerdida(Exception):
+    """A trava da tarefa passou para outro processo durante a execução."""
+
+
+def manter_trava():
+    """
+    Chamada por tarefas longas entre um lote e outro: renova a trava da
+    tarefa em execução pelo agendador e levanta TravaPerdida se outro
+    processo já a assumiu, para as duas execuções não correrem juntas.
+    Fora do agendador (ex: linha de comando) não faz nada.
+    """
+    renovar = g.get("renovar_trava")
+    if renovar is not None and not renovar():
+        raise TravaPerdida("Trava da tarefa assumida por outro processo")
+
+
+def registrar_execucao(nome: str, inicio: datetime, duracao_ms: int, resultado=None, erro=None):
+    """Grava o resultado da execução e libera a trava."""
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(TarefaAgendada)
+            .where(TarefaAgendada.nome == nome, TarefaAgendada.bloqueado_por == ID_PROCESSO)
+            .values(
+                bloqueado_ate=None,
+                bloqueado_por=None,
+                ultima_execucao=inicio,
+                ultima_duracao_ms=duracao_ms,
+                ultimo_resultado=resultado,
+                ultimo_erro=erro,
+            )
+        )
+
+
+class Agendador:
+    """
+    Executa tarefas periódicas em uma thread do próprio processo.
+    Todos os workers rodam o agendador, mas a trava no banco
+    (tabela tarefas_agendadas) faz com que cada execução aconteça em um só.
+    """
+
+    def __init__(self, app, tick: int = 15):
+        self.app = app
+        self.tick = tick
+        self.tarefas = {}  # nome -> (funcao, intervalo em segundos)
+        self._parar = threading.Event()
+        self._thread = None
+
+    def adicionar(self, nome: str, funcao, intervalo: int):
+        self.tarefas[nome] = (funcao, intervalo)
+
+    def iniciar(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._loop, name="agendador", daemon=True)
+        self._thread.start()
+        print(f"⏰ Agendador iniciado ({', '.join(self.tarefas)})")
+
+    def parar(self):
+        self._parar.set()
+
+    def aguardar(self):
+        """Bloqueia até o agendador parar (usado pelo processo dedicado)."""
+        while self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1)
+
+    def _loop(self):
+        with self.app.app_context():
+            for nome in self.tarefas:
+                _garantir_registro(nome)
+
+        while not self._parar.wait(self.tick):
+            for nome, (funcao, intervalo) in self.tarefas.items():
+                with self.app.app_context():
+                    try:
+                        self._executar_se_devido(nome, funcao, intervalo)
+                    except Exception as e:
+                        print(f"❌ Erro no agendador ({nome}): {e}")
+                    finally:
+                        db.session.remove()
+
+    def _executar_se_devido(self, nome, funcao, intervalo):
+        # A trava dura mais que a execução esperada; se o processo morrer,
+        # outro worker assume depois que ela expirar. Tarefas em lotes a
+        # renovam com manter_trava()
+        duracao_trava = max(60, min(intervalo, 3600))
+        if not adquirir_tarefa(nome, intervalo, duracao_trava=duracao_trava):
+            return
+        g.renovar_trava = partial(renovar_trava, nome, duracao_trava)
+
+        inicio = datetime.now()
+        relogio = time.perf_counter()
+        resultado, erro = None, None
+        try:
+            resultado = funcao()
+        except Exception as e:
+            db.session.rollback()
+            erro = str(e)
+            print(f"❌ Tarefa {nome} falhou: {e}")
+
+        duracao_ms = int((time.perf_counter() - relogio) * 1000)
+        registrar_execucao(nome, inicio, duracao_ms, resultado, erro)
+        print(f"⏰ Tarefa {nome}: resultado={resultado} em {duracao_ms} ms")
+
+
+def iniciar_agendador(app):
+    """Registra as tarefas periódicas da aplicação e inicia o agendador."""
+    from routes_notificacoes import verificar_e_criar_notificacoes
+    from retencao_notificacoes import aplicar_retencao_notificacoes
+    from fila_ia import reenfileirar_pendentes
+    from cache_ia import limpar_respostas_expiradas
+
+    agendador = Agendador(app)
+    agendador.adicionar(
+        "verificar_notificacoes",
+        partial(verificar_e_criar_notificacoes, propagar_erro=True),
+        app.config.get("NOTIFICACOES_INTERVALO", 300),
+    )
+    agendador.adicionar(
+        "retencao_notificacoes",
+        aplicar_retencao_notificacoes,
+        app.config.get("NOTIFICACOES_RETENCAO_INTERVALO", 86400),
+    )
+    agendador.adicionar("reenfileirar_tarefas_ia", reenfileirar_pendentes, 60)
+    agendador.adicionar("limpar_cache_ia", limpar_respostas_expiradas, 86400)
+    agendador.iniciar()
+    app.extensions["agendador"] = agendador
+    return agendador
@@ -1,85 +1,151 @@
+import json
 import os
-import time
+import threading
 from dotenv import load_dotenv
 from mistralai.client import MistralClient
 
+from cache_ia import guardar_resposta, obter_ou_gerar, obter_resposta
+from busca_fuzzy import fuzz, fuzzy_disponivel
+from indice_entidades import montar_indice, palavras_de
+from intencoes_ia import intencao_do_grupo
+from respostas_diretas import responder_diretamente
+from texto_utils import normalizar_busca
+
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
 
 client = MistralClient(api_key=os.getenv("MISTRAL_API_KEY"))
 
-# Cache simples em memória para dados de contexto
-_cache_dados_contexto = {"dados": None, "timestamp": 0, "ttl": 300}  # 5 minutos
+# Limite de chamadas simultâneas à API da Mistral neste processo
+_limite_mistral = threading.BoundedSemaphore(
+    int(os.getenv("MISTRAL_MAX_CONCORRENTES", "4"))
+)
+
 
-# Cache para resultados de IA similares
-_cache_resultados_ia = {}
+def chamar_mistral(prompt: str, model: str = "mistral-large-latest") -> str:
+    """Envia um prompt à Mistral respeitando o limite de concorrência."""
+    with _limite_mistral:
+        response = client.chat(
+            model=model, messages=[{"role": "user", "content": prompt}]
+        )
+    return response.choices[0].message.content.strip()
 
 
-def get_cached_dados_contexto():
+def chamar_mistral_stream(prompt: str, model: str = "mistral-large-latest"):
     """
-    Retorna dados de contexto do cache se ainda válidos.
+    Como chamar_mistral, mas gera os trechos do texto à medida que a
+    Mistral os envia. A vaga de concorrência fica ocupada até o fim.
     """
-    current_time = time.time()
-    if (
-        _cache_dados_contexto["dados"]
-        and current_time - _cache_dados_contexto["timestamp"]
-        < _cache_dados_contexto["ttl"]
-    ):
-        return _cache_dados_contexto["dados"]
-    return None
+    with _limite_mistral:
+        for chunk in client.chat_stream(
+            model=model, messages=[{"role": "user", "content": prompt}]
+        ):
+            trecho = chunk.choices[0].delta.content if chunk.choices else None
+            if trecho:
+                yield trecho
 
 
-def set_cached_dados_contexto(dados):
+def gerar_em_stream(tipo: str, partes, prompt: str):
     """
-    Armazena dados de contexto no cache.
+    Gera a resposta de (tipo, partes) em trechos: de uma vez se já estiver
+    no cache, senão direto da Mistral. A resposta só vai para o cache
+    quando o stream termina por completo.
     """
-    _cache_dados_contexto["dados"] = dados
-    _cache_dados_contexto["timestamp"] = time.time()
-
-
-def get_cached_resultado_ia(consulta_hash):
+    resposta = obter_resposta(tipo, partes)
+    if resposta is not None:
+        yield resposta
+        return
+
+    trechos = []
+    for trecho in chamar_mistral_stream(prompt):
+        trechos.append(trecho)
+        yield trecho
+    resposta = "".join(trechos).strip()
+    if resposta:
+        guardar_resposta(tipo, partes, resposta)
+
+# Validade das respostas de consultas em linguagem natural; a versão dos
+# dados faz parte da chave, então qualquer alteração em clientes, OS ou
+# produtos já descarta as respostas antigas
+CONSULTA_CACHE_TTL = int(os.getenv("IA_CONSULTA_CACHE_TTL", "600"))
+
+
+def get_cached_resultado_ia(consulta: str, versao: int):
     """
-    Retorna resultado de IA do cache se existir.
+    Retorna o resultado em cache da consulta para a versão `versao` dos
+    dados (ou None). Cada chamada devolve uma cópia nova do resultado.
     """
-    return _cache_resultados_ia.get(consulta_hash)
+    bruto = obter_resposta("consulta", [consulta, str(versao)])
+    return json.loads(bruto) if bruto else None
 
 
-def set_cached_resultado_ia(consulta_hash, resultado):
+def set_cached_resultado_ia(consulta: str, versao: int, resultado: dict):
     """
-    Armazena resultado de IA no cache (máximo 50 entradas).
+    Armazena o resultado da consulta no cache (memória do processo e tabela
+    respostas_ia, compartilhada entre os workers). `versao` deve ser a
+    lida antes de coletar os dados usados na resposta.
     """
-    if len(_cache_resultados_ia) >= 50:
-        # Remove entrada mais antiga
-        oldest_key = min(
-            _cache_resultados_ia.keys(),
-            key=lambda k: _cache_resultados_ia[k].get("timestamp", 0),
-        )
-        del _cache_resultados_ia[oldest_key]
+    guardar_resposta(
+        "consulta",
+        [consulta, str(versao)],
+        json.dumps(resultado, ensure_ascii=False),
+        ttl=CONSULTA_CACHE_TTL,
+    )
 
-    _cache_resultados_ia[consulta_hash] = {
-        "resultado": resultado,
-        "timestamp": time.time(),
-    }
 
+def prompt_resumo(problema_relatado: str) -> str:
+    return (
+        f"Resuma o seguinte problema relatado de forma concisa e "
+        f"técnica, focando nos pontos principais: {problema_relatado}"
+    )
 
-def gerar_resumo(problema_relatado: str) -> str:
+
+def gerar_resumo(problema_relatado: str, propagar_erro: bool = False) -> str:
     """
     Gera um resumo conciso do problema relatado pelo cliente.
+    Com `propagar_erro` a falha é levantada (para a fila poder repetir).
     """
     try:
-        prompt = (
-            f"Resuma o seguinte problema relatado de forma concisa e "
-            f"técnica, focando nos pontos principais: {problema_relatado}"
-        )
-        response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
+        prompt = prompt_resumo(problema_relatado)
+        return obter_ou_gerar("resumo", [problema_relatado], lambda: chamar_mistral(prompt))
     except Exception as e:
+        if propagar_erro:
+            raise
         print(f"Erro ao gerar resumo: {e}")
         return "Resumo não disponível."
 
 
+def prompt_pre_diagnostico(
+    tipo_aparelho: str, marca_modelo: str, problema_relatado: str
+) -> str:
+    return (
+        "Act as a senior computer and smartphone repair technician, focused on fast bench-level diagnosis.\n\n"
+        "Service context:\n"
+        f"- Device: {tipo_aparelho} {marca_modelo}\n"
+        f"- Reported issue: {problema_relatado}\n\n"
+        "Mandatory rules:\n"
+        "- DO NOT repeat the reported issue.\n"
+        "- DO NOT rewrite or summarize the context.\n"
+        "- Write in plain text only (no lists, no markdown, no symbols).\n"
+        "- Start by stating the main suspected cause.\n"
+        "- Use extremely concise, technical language.\n"
+        "- Limit the entire response to a maximum of 60 words.\n"
+        "- Avoid explanations, background, or theory.\n\n"
+        "Response language:\n"
+        "- The entire response MUST be written in Brazilian Portuguese.\n\n"
+        "Mandatory response format:\n"
+        "Paragraph 1: One short sentence stating the most likely cause.\n\n"
+        "Paragraph 2: One short sentence stating the first diagnostic check.\n\n"
+        "Insert exactly one blank line between paragraphs.\n\n"
+        "End with exactly:\n\n"
+        "Suspeitos principais:\n"
+        "1) <causa> – Testar: <teste direto>\n"
+        "2) <causa> – Testar: <teste direto>\n\n"
+        "Goal:\n"
+        "Deliver a minimal, actionable diagnosis for an experienced repair technician."
+    )
+
+
 def gerar_pre_diagnostico(
     tipo_aparelho: str, marca_modelo: str, problema_relatado: str
 ) -> str:
@@ -87,101 +153,90 @@ def gerar_pre_diagnostico(
     Gera um pré-diagnóstico baseado nas informações do aparelho e problema.
     """
     try:
-        prompt = (
-            "Act as a senior computer and smartphone repair technician, focused on fast bench-level diagnosis.\n\n"
-            "Service context:\n"
-            f"- Device: {tipo_aparelho} {marca_modelo}\n"
-            f"- Reported issue: {problema_relatado}\n\n"
-            "Mandatory rules:\n"
-            "- DO NOT repeat the reported issue.\n"
-            "- DO NOT rewrite or summarize the context.\n"
-            "- Write in plain text only (no lists, no markdown, no symbols).\n"
-            "- Start by stating the main suspected cause.\n"
-            "- Use extremely concise, technical language.\n"
-            "- Limit the entire response to a maximum of 60 words.\n"
-            "- Avoid explanations, background, or theory.\n\n"
-            "Response language:\n"
-            "- The entire response MUST be written in Brazilian Portuguese.\n\n"
-            "Mandatory response format:\n"
-            "Paragraph 1: One short sentence stating the most likely cause.\n\n"
-            "Paragraph 2: One short sentence stating the first diagnostic check.\n\n"
-            "Insert exactly one blank line between paragraphs.\n\n"
-            "End with exactly:\n\n"
-            "Suspeitos principais:\n"
-            "1) <causa> – Testar: <teste direto>\n"
-            "2) <causa> – Testar: <teste direto>\n\n"
-            "Goal:\n"
-            "Deliver a minimal, actionable diagnosis for an experienced repair technician."
+        prompt = prompt_pre_diagnostico(tipo_aparelho, marca_modelo, problema_relatado)
+        # Mesmo aparelho e problema (ex: "tela quebrada iPhone 11") -> mesma resposta
+        return obter_ou_gerar(
+            "pre_diagnostico",
+            [tipo_aparelho, marca_modelo, problema_relatado],
+            lambda: chamar_mistral(prompt),
         )
-        response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
-        )
-        return response.choices[0].message.content.strip()
     except Exception as e:
         print(f"Erro ao gerar pré-diagnóstico: {e}")
         return "Pré-diagnóstico não disponível."
 
 
-def interpretar_consulta_ia(
+def preparar_consulta_ia(
     consulta: str, dados_contexto: dict, estado_conversacional: dict = None
-) -> dict:
+) -> tuple:
     """
-    Interpreta uma consulta em linguagem natural e extrai informações dos dados disponíveis.
-    Suporta criação conversacional de dados (clientes, OS, produtos).
-    Retorna uma resposta estruturada com a informação solicitada.
+    Resolve a consulta sem a IA quando possível (fluxos conversacionais,
+    intenções, respostas diretas do banco). Retorna (resultado, None) ou,
+    para perguntas abertas, (None, prompt) a enviar à Mistral.
     """
-    try:
-        consulta_lower = consulta.lower()
-
-        # Verificar se estamos em um fluxo conversacional de criação
-        if estado_conversacional and estado_conversacional.get("modo"):
-            return processar_fluxo_conversacional(
-                consulta, estado_conversacional, dados_contexto
-            )
+    consulta_lower = consulta.lower()
 
-        # Verificar se é uma pergunta conversacional (não relacionada aos dados)
-        resposta_conversacional = detectar_pergunta_conversacional(consulta_lower)
-        if resposta_conversacional:
-            return {
-                "resposta": resposta_conversacional,
-                "dados": {"tipo": "conversacional"},
-                "consulta": consulta,
-                "estado_conversacional": None,
-            }
+    # Verificar se estamos em um fluxo conversacional de criação
+    if estado_conversacional and estado_conversacional.get("modo"):
+        return processar_fluxo_conversacional(
+            consulta, estado_conversacional, dados_contexto
+        ), None
 
-        # Verificar se o usuário quer excluir ou editar dados
-        intencao_operacao = detectar_intencao_exclusao_edicao(
-            consulta_lower, dados_contexto
-        )
-        if intencao_operacao:
-            return processar_operacao_dados(intencao_operacao, dados_contexto)
+    # Verificar se é uma pergunta conversacional (não relacionada aos dados)
+    resposta_conversacional = detectar_pergunta_conversacional(consulta_lower)
+    if resposta_conversacional:
+        return {
+            "resposta": resposta_conversacional,
+            "dados": {"tipo": "conversacional"},
+            "consulta": consulta,
+            "estado_conversacional": None,
+        }, None
 
-        # Verificar se o usuário quer iniciar criação de dados
-        intencao_criacao = detectar_intencao_criacao(consulta_lower)
-        if intencao_criacao:
-            return iniciar_fluxo_criacao(intencao_criacao, dados_contexto)
+    # Verificar se o usuário quer excluir ou editar dados
+    intencao_operacao = detectar_intencao_exclusao_edicao(
+        consulta_lower, dados_contexto
+    )
+    if intencao_operacao:
+        return processar_operacao_dados(intencao_operacao, dados_contexto), None
+
+    # Verificar se o usuário quer iniciar criação de dados
+    intencao_criacao = detectar_intencao_criacao(consulta_lower)
+    if intencao_criacao:
+        return iniciar_fluxo_criacao(intencao_criacao, dados_contexto), None
+
+    # Perguntas estruturadas (status de OS, faturamento, estoque baixo,
+    # contagens) são respondidas direto do banco, sem chamar a IA
+    resposta_direta = responder_diretamente(consulta, dados_contexto)
+    if resposta_direta:
+        resposta, dados_resposta = resposta_direta
+        return {
+            "resposta": resposta,
+            "dados": dados_resposta,
+            "consulta": consulta,
+            "estado_conversacional": None,
+        }, None
 
-        # Contexto dos dados disponíveis
-        contexto = f"""
+    # Contexto dos dados disponíveis: totais do banco e só os registros
+    # relacionados à consulta (ou alguns exemplos, se nenhum foi citado)
+    contexto = f"""
 Sistema de Assistência Técnica - Dados Disponíveis:
 
 CLIENTES:
 Total: {dados_contexto.get('total_clientes', 0)} clientes
-Lista: {', '.join([f"{c['nome']} (ID: {c['id']})" for c in dados_contexto.get('clientes', [])[:10]])}
 
 ORDENS DE SERVIÇO:
 Total: {dados_contexto.get('total_os', 0)} OS
 Status disponíveis: aguardando, em_reparo, pronto, entregue, cancelado
-Exemplos: {', '.join([f"{os['numeroOS']} - {os['clienteNome']} - {os['status']}" for os in dados_contexto.get('os', [])[:10]])}
 
 PRODUTOS/ESTOQUE:
 Total: {dados_contexto.get('total_produtos', 0)} produtos
-Produtos com estoque baixo: {len([p for p in dados_contexto.get('produtos', []) if p['quantidade'] < p['estoqueMinimo']])} itens
+Produtos com estoque baixo: {dados_contexto.get('produtos_baixo_estoque', 0)} itens
 
 FINANCEIRO:
 Receitas totais: R$ {dados_contexto.get('receitas_totais', 0):.2f}
 OS entregues: {dados_contexto.get('os_entregues', 0)} OS
 
+{formatar_registros_contexto(dados_contexto)}
+
 CONSULTA DO USUÁRIO: "{consulta}"
 
 INSTRUÇÕES:
@@ -198,7 +253,7 @@ TIPO DE RESPOSTAS ESPERADAS:
 - Para produtos: nome, quantidade, preço, categoria
 """
 
-        prompt = f"""{contexto}
+    prompt = f"""{contexto}
 
 Sua tarefa é interpretar a consulta do usuário e fornecer a informação solicitada baseada apenas nos dados fornecidos acima.
 
@@ -208,31 +263,89 @@ INSTRUÇÕES IMPORTANTES:
 - Escreva de forma natural e conversacional, mas direta
 - Se a informação não estiver disponível, diga "Não encontrei essa informação nos dados disponíveis."
 """
+    return None, prompt
 
-        response = client.chat(
-            model="mistral-large-latest", messages=[{"role": "user", "content": prompt}]
-        )
 
-        resposta_ia = response.choices[0].message.content.strip()
+def finalizar_consulta_ia(consulta: str, dados_contexto: dict, resposta_ia: str) -> dict:
+    """Monta o resultado de uma consulta respondida pela Mistral."""
+    # Buscar dados específicos baseados na interpretação da IA
+    dados_resposta = extrair_dados_consulta(consulta, dados_contexto)
 
-        # Buscar dados específicos baseados na interpretação da IA
-        dados_resposta = extrair_dados_consulta(consulta, dados_contexto)
+    return {
+        "resposta": resposta_ia,
+        "dados": dados_resposta,
+        "consulta": consulta,
+        "estado_conversacional": None,  # Não há fluxo conversacional ativo
+    }
 
-        return {
-            "resposta": resposta_ia,
-            "dados": dados_resposta,
-            "consulta": consulta,
-            "estado_conversacional": None,  # Não há fluxo conversacional ativo
-        }
+
+def resultado_erro_consulta(consulta: str) -> dict:
+    return {
+        "resposta": "Desculpe, não foi possível processar sua consulta no momento.",
+        "dados": {},
+        "consulta": consulta,
+        "estado_conversacional": None,
+    }
+
+
+def interpretar_consulta_ia(
+    consulta: str, dados_contexto: dict, estado_conversacional: dict = None
+) -> dict:
+    """
+    Interpreta uma consulta em linguagem natural e extrai informações dos dados disponíveis.
+    Suporta criação conversacional de dados (clientes, OS, produtos).
+    Retorna uma resposta estruturada com a informação solicitada.
+    """
+    try:
+        resultado, prompt = preparar_consulta_ia(
+            consulta, dados_contexto, estado_conversacional
+        )
+        if resultado is None:
+            resultado = finalizar_consulta_ia(
+                consulta, dados_contexto, chamar_mistral(prompt)
+            )
+        return resultado
 
     except Exception as e:
         print(f"Erro ao interpretar consulta IA: {e}")
-        return {
-            "resposta": "Desculpe, não foi possível processar sua consulta no momento.",
-            "dados": {},
-            "consulta": consulta,
-            "estado_conversacional": None,
-        }
+        return resultado_erro_consulta(consulta)
+
+
+def formatar_registros_contexto(dados_contexto: dict) -> str:
+    """
+    Lista para o prompt os registros recuperados para a consulta, com os
+    campos necessários para responder; sem registros recuperados, mostra
+    alguns exemplos de clientes e OS.
+    """
+    relevantes = dados_contexto.get("relevantes") or {}
+    if not any(relevantes.values()):
+        clientes = dados_contexto.get("clientes", [])[:5]
+        ordens = dados_contexto.get("os", [])[:5]
+        exemplos_clientes = ", ".join(f"{c['nome']} (ID: {c['id']})" for c in clientes)
+        exemplos_os = ", ".join(
+            f"{o['numeroOS']} - {o['clienteNome']} - {o['status']}" for o in ordens
+        )
+        return f"EXEMPLOS:\nClientes: {exemplos_clientes}\nOS: {exemplos_os}"
+
+    linhas = ["REGISTROS RELACIONADOS À CONSULTA:"]
+    for c in relevantes.get("clientes", []):
+        linhas.append(
+            f"Cliente {c['nome']} (ID: {c['id']}) - telefone: {c['telefone']}, "
+            f"email: {c['email'] or '-'}, endereço: {c['endereco'] or '-'}"
+        )
+    for o in relevantes.get("os", []):
+        linhas.append(
+            f"OS {o['numeroOS']} - cliente: {o['clienteNome']}, status: {o['status']}, "
+            f"valor: R$ {o['valorOrcamento']:.2f}, aparelho: {o['tipoAparelho']} "
+            f"{o['marcaModelo']}, problema: {o['problemaRelatado']}"
+        )
+    for p in relevantes.get("produtos", []):
+        linhas.append(
+            f"Produto {p['nome']} (código {p['codigo']}) - categoria: {p['categoria']}, "
+            f"quantidade: {p['quantidade']} (mínimo {p['estoqueMinimo']}), "
+            f"preço: R$ {p['precoVenda']:.2f}"
+        )
+    return "\n".join(linhas)
 
 
 def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
@@ -291,7 +404,7 @@ def extrair_dados_consulta(consulta: str, dados_contexto: dict) -> dict:
         return {
             "tipo": "produtos",
             "dados": {
-                "total_produtos": len(dados_contexto.get("produtos", [])),
+                "total_produtos": dados_contexto.get("total_produtos", 0),
                 "baixo_estoque": produtos_baixo_estoque,
                 "todos_produtos": dados_contexto.get("produtos", [])[
                     :20
@@ -307,52 +420,8 @@ def detectar_intencao_criacao(consulta_lower: str) -> str:
     Detecta se o usuário quer criar dados (cliente, OS, produto).
     Retorna o tipo de criação ou None.
     """
-    # Padrões para detectar intenção de criação
-    padroes_cliente = [
-        "adicionar cliente",
-        "cadastrar cliente",
-        "criar cliente",
-        "novo cliente",
-        "registrar cliente",
-        "incluir cliente",
-        "quero adicionar um cliente",
-        "gostaria de adicionar um cliente",
-    ]
-
-    padroes_os = [
-        "criar os",
-        "nova os",
-        "adicionar os",
-        "cadastrar os",
-        "registrar os",
-        "nova ordem",
-        "ordem de serviço",
-        "quero criar uma os",
-    ]
-
-    padroes_produto = [
-        "adicionar produto",
-        "cadastrar produto",
-        "criar produto",
-        "novo produto",
-        "registrar produto",
-        "incluir produto",
-        "quero adicionar um produto",
-    ]
-
-    for padrao in padroes_cliente:
-        if padrao in consulta_lower:
-            return "cliente"
-
-    for padrao in padroes_os:
-        if padrao in consulta_lower:
-            return "os"
-
-    for padrao in padroes_produto:
-        if padrao in consulta_lower:
-            return "produto"
-
-    return None
+    intencao = intencao_do_grupo(consulta_lower, "criacao")
+    return intencao.nome if intencao else None
 
 
 def detectar_intencao_exclusao_edicao(
@@ -362,66 +431,54 @@ def detectar_intencao_exclusao_edicao(
     Detecta se o usuário quer excluir ou editar dados.
     Retorna dict com tipo de operação e entidade afetada.
     """
-    import re
+    intencao = intencao_do_grupo(consulta_lower, "operacao")
+    if not intencao:
+        return None
 
-    # Padrões para exclusão
-    padroes_exclusao = [
-        "exclua",
-        "delete",
-        "remova",
-        "apague",
-        "elimine",
-        "quero excluir",
-        "quero deletar",
-        "quero remover",
-    ]
+    # Tentar identificar o que excluir/editar
+    entidade = identificar_entidade_para_operacao(consulta_lower, dados_contexto)
+    if not entidade:
+        return None
+    return {
+        "operacao": intencao.nome,
+        "tipo_entidade": entidade["tipo"],
+        "entidade": entidade["dados"],
+        "id": entidade["id"],
+        "candidatos": entidade.get("candidatos"),
+    }
 
-    # Padrões para edição
-    padroes_edicao = [
-        "altere",
-        "modifique",
-        "atualize",
-        "edite",
-        "mude",
-        "alterar",
-        "modificar",
-        "quero alterar",
-        "quero modificar",
-        "quero atualizar",
-        "quero editar",
-    ]
 
-    # Verificar exclusão primeiro
-    for padrao in padroes_exclusao:
-        if padrao in consulta_lower:
-            # Tentar identificar o que excluir
-            entidade = identificar_entidade_para_operacao(
-                consulta_lower, dados_contexto
-            )
-            if entidade:
-                return {
-                    "operacao": "exclusao",
-                    "tipo_entidade": entidade["tipo"],
-                    "entidade": entidade["dados"],
-                    "id": entidade["id"],
-                }
+# Palavras de comando ignoradas na identificação da entidade
+PALAVRAS_COMANDO = frozenset({
+    "exclua", "delete", "remova", "altere", "modifique", "excluir", "deletar",
+    "remover", "alterar", "modificar", "o", "a", "do", "da", "de", "um", "uma",
+})
+PALAVRAS_COMANDO_OS = PALAVRAS_COMANDO | {"os", "ordem", "servico", "cliente"}
 
-    # Verificar edição
-    for padrao in padroes_edicao:
-        if padrao in consulta_lower:
-            # Tentar identificar o que editar
-            entidade = identificar_entidade_para_operacao(
-                consulta_lower, dados_contexto
-            )
-            if entidade:
-                return {
-                    "operacao": "edicao",
-                    "tipo_entidade": entidade["tipo"],
-                    "entidade": entidade["dados"],
-                    "id": entidade["id"],
-                }
 
-    return None
+def indices_entidades(dados_contexto: dict) -> dict:
+    """
+    Índices de clientes, produtos e OS: os do banco inteiro, quando a rota
+    os incluiu no contexto, ou montados a partir das listas do contexto.
+    """
+    indices = dados_contexto.get("indices")
+    if indices:
+        return indices
+    return {
+        "cliente": montar_indice(dados_contexto.get("clientes", []), ("nome",)),
+        "produto": montar_indice(
+            dados_contexto.get("produtos", []), ("nome", "codigo"), campo_codigo="codigo"
+        ),
+        "os": montar_indice(dados_contexto.get("os", []), ("clienteNome", "numeroOS")),
+    }
+
+
+def registro_completo(dados_contexto: dict, lista: str, registro: dict) -> dict:
+    """Versão completa do registro do índice, se ele estiver no contexto."""
+    for item in dados_contexto.get(lista, []):
+        if item["id"] == registro["id"]:
+            return item
+    return registro
 
 
 def identificar_entidade_para_operacao(
@@ -444,9 +501,11 @@ def identificar_entidade_para_operacao(
                 return {"tipo": "os", "dados": os, "id": os["id"]}
 
     # Segundo: procurar por códigos de produto (específicos)
-    for produto in dados_contexto.get("produtos", []):
-        if produto["codigo"].upper() in consulta_lower.upper():
-            return {"tipo": "produto", "dados": produto, "id": produto["id"]}
+    indice_produtos = indices_entidades(dados_contexto)["produto"]
+    produto = indice_produtos.por_codigo(consulta_lower)
+    if produto:
+        produto = registro_completo(dados_contexto, "produtos", produto)
+        return {"tipo": "produto", "dados": produto, "id": produto["id"]}
 
     # Terceiro: busca inteligente por produtos (mais flexível)
     produto_encontrado = encontrar_produto_por_nome_inteligente(
@@ -480,6 +539,13 @@ def identificar_entidade_para_operacao(
         if produto["nome"].lower() in consulta_lower:
             return {"tipo": "produto", "dados": produto, "id": produto["id"]}
 
+    # Sétimo: busca aproximada (erros de digitação). Um nome parecido não
+    # basta para excluir ou editar: os candidatos voltam para o usuário
+    # repetir o pedido com o nome ou código exato
+    candidatos = candidatos_busca_fuzzy(consulta_lower, dados_contexto)
+    if candidatos:
+        return {"tipo": "candidatos", "candidatos": candidatos, "dados": None, "id": None}
+
     return None
 
 
@@ -514,50 +580,25 @@ def encontrar_os_por_contexto_inteligente(
     Busca inteligente por OS usando contexto (cliente, número, etc.).
     Retorna a OS com melhor correspondência.
     """
-    os_list = dados_contexto.get("os", [])
-    if not os_list:
-        return None
-
-    # Separar palavras da consulta (remover palavras de comando)
-    palavras_comando = [
-        "exclua",
-        "delete",
-        "remova",
-        "altere",
-        "modifique",
-        "excluir",
-        "deletar",
-        "remover",
-        "alterar",
-        "modificar",
-        "o",
-        "a",
-        "do",
-        "da",
-        "de",
-        "do",
-        "da",
-        "um",
-        "uma",
-        "os",
-        "ordem",
-        "servico",
-        "serviço",
-        "cliente",
-    ]
+    indice = indices_entidades(dados_contexto)["os"]
     palavras_consulta = [
         palavra
-        for palavra in consulta_lower.split()
-        if palavra not in palavras_comando and len(palavra) > 1
+        for palavra in palavras_de(consulta_lower)
+        if palavra not in PALAVRAS_COMANDO_OS and len(palavra) > 1
     ]
+    if not palavras_consulta:
+        return None
+    sequencia = " ".join(palavras_consulta)
 
     melhor_correspondencia = None
     melhor_score = 0
 
-    for os_item in os_list:
+    # Só as OS que contêm as palavras da consulta (pelo índice)
+    for id_os in indice.buscar(palavras_consulta):
+        textos = indice.textos[id_os]
+        nome_cliente = textos["clienteNome"]
+        numero_os = textos["numeroOS"]
         score = 0
-        nome_cliente = (os_item.get("clienteNome") or "").lower()
-        numero_os = (os_item.get("numeroOS") or "").lower()
 
         # Verificar cada palavra da consulta no nome do cliente
         for palavra in palavras_consulta:
@@ -571,12 +612,13 @@ def encontrar_os_por_contexto_inteligente(
             score += 200
 
         # Bônus para sequência exata
-        if " ".join(palavras_consulta) in nome_cliente:
+        if sequencia in nome_cliente:
             score += 100
 
         # Atualizar melhor correspondência
         if score > melhor_score and score >= 2:  # Mínimo de 2 pontos para OS
             melhor_score = score
+            os_item = registro_completo(dados_contexto, "os", indice.registros[id_os])
             melhor_correspondencia = {
                 "tipo": "os",
                 "dados": os_item,
@@ -594,65 +636,36 @@ def encontrar_entidade_por_nome_inteligente(
     Busca inteligente genérica por entidades usando palavras-chave.
     Funciona para produtos e clientes.
     """
-    if tipo_entidade == "produto":
-        entidades = dados_contexto.get("produtos", [])
-        campo_nome = "nome"
-        campo_codigo = "codigo"
-    elif tipo_entidade == "cliente":
-        entidades = dados_contexto.get("clientes", [])
-        campo_nome = "nome"
-        campo_codigo = None
-    else:
-        return None
-
-    if not entidades:
+    if tipo_entidade not in ("produto", "cliente"):
         return None
+    indice = indices_entidades(dados_contexto)[tipo_entidade]
+    lista = "produtos" if tipo_entidade == "produto" else "clientes"
 
-    # Separar palavras da consulta (remover palavras de comando)
-    palavras_comando = [
-        "exclua",
-        "delete",
-        "remova",
-        "altere",
-        "modifique",
-        "excluir",
-        "deletar",
-        "remover",
-        "alterar",
-        "modificar",
-        "o",
-        "a",
-        "do",
-        "da",
-        "de",
-        "um",
-        "uma",
-        tipo_entidade,
-    ]
     palavras_consulta = [
         palavra
-        for palavra in consulta_lower.split()
-        if palavra not in palavras_comando and len(palavra) > 2
+        for palavra in palavras_de(consulta_lower)
+        if palavra not in PALAVRAS_COMANDO
+        and palavra != tipo_entidade
+        and len(palavra) > 2
     ]
-
     if not palavras_consulta:
         return None
+    sequencia = " ".join(palavras_consulta)
 
     melhor_correspondencia = None
     melhor_score = 0
 
-    for entidade in entidades:
-        nome_entidade = entidade[campo_nome].lower()
-        score = 0
+    # Só as entidades que contêm as palavras da consulta (pelo índice)
+    for id_entidade in indice.buscar(palavras_consulta):
+        textos = indice.textos[id_entidade]
+        nome_entidade = textos["nome"]
 
         # Verificar cada palavra da consulta no nome da entidade
-        for palavra in palavras_consulta:
-            if palavra in nome_entidade:
-                score += len(palavra)  # Palavras mais longas têm mais peso
+        score = sum(len(palavra) for palavra in palavras_consulta if palavra in nome_entidade)
 
         # Verificar código (para produtos)
-        if campo_codigo and entidade.get(campo_codigo):
-            codigo_entidade = entidade[campo_codigo].lower()
+        if indice.campo_codigo:
+            codigo_entidade = textos[indice.campo_codigo]
             for palavra in palavras_consulta:
                 if palavra in codigo_entidade:
                     score += len(palavra) * 1.5  # Código tem peso menor que nome
@@ -662,12 +675,15 @@ def encontrar_entidade_por_nome_inteligente(
             score += 100
 
         # Bônus se a sequência exata está presente
-        if " ".join(palavras_consulta) in nome_entidade:
+        if sequencia in nome_entidade:
             score += 50
 
         # Atualizar melhor correspondência
         if score > melhor_score and score >= 3:  # Mínimo de 3 pontos para considerar
             melhor_score = score
+            entidade = registro_completo(
+                dados_contexto, lista, indice.registros[id_entidade]
+            )
             melhor_correspondencia = {
                 "tipo": tipo_entidade,
                 "dados": entidade,
@@ -1045,6 +1061,8 @@ def processar_operacao_dados(intencao: dict, dados_contexto: dict) -> dict:
     entidade = intencao.get("entidade")
     entidade_id = intencao.get("id")
 
+    if tipo_entidade == "candidatos":
+        return pedir_confirmacao_candidatos(operacao, intencao["candidatos"])
     if operacao == "exclusao":
         return processar_exclusao_dados(tipo_entidade, entidade, entidade_id)
     elif operacao == "edicao":
@@ -1058,6 +1076,32 @@ def processar_operacao_dados(intencao: dict, dados_contexto: dict) -> dict:
         }
 
 
+def pedir_confirmacao_candidatos(operacao: str, candidatos: list) -> dict:
+    """
+    Entidade achada só pela busca aproximada: lista os candidatos e pede o
+    pedido de novo com o nome, código ou número exato, sem iniciar a operação.
+    """
+    verbo = "excluir" if operacao == "exclusao" else "editar"
+    linhas = []
+    for candidato in candidatos:
+        dados = candidato["dados"]
+        if candidato["tipo"] == "cliente":
+            linhas.append(f'• Cliente "{dados.get("nome")}"')
+        else:
+            linhas.append(f'• Produto "{dados.get("nome")}" (Código: {dados.get("codigo")})')
+    resposta = (
+        f"🔎 Não encontrei exatamente o que você quer {verbo}. Você quis dizer:\n"
+        + "\n".join(linhas)
+        + "\n\nRepita o pedido com o nome completo ou o código para continuar."
+    )
+    return {
+        "resposta": resposta,
+        "dados": {"tipo": "candidatos", "candidatos": candidatos},
+        "consulta": "",
+        "estado_conversacional": None,
+    }
+
+
 def processar_exclusao_dados(
     tipo_entidade: str, entidade: dict, entidade_id: int
 ) -> dict:
@@ -1423,7 +1467,12 @@ def processar_fluxo_edicao(consulta: str, estado: dict, dados_contexto: dict) ->
 
                     os_obj = OrdemServico.query.get(entidade_id)
                     if os_obj:
+                        status_anterior = os_obj.status
                         os_obj.status = novo_status
+                        if status_anterior != "entregue" and novo_status == "entregue":
+                            from routes_financeiro import registrar_os_entregue
+
+                            registrar_os_entregue(os_obj)
                         from extensions import db
 
                         db.session.commit()
@@ -1486,177 +1535,86 @@ def processar_fluxo_edicao(consulta: str, estado: dict, dados_contexto: dict) ->
         }
 
 
+RESPOSTAS_CONVERSACIONAIS = {
+    "saudacao": "Olá! Como posso ajudar você hoje com seus clientes, ordens de serviço ou produtos?",
+    "sobre_ia": "Sim, sou uma IA assistente especializada em gestão de assistência técnica! Posso ajudar você a consultar dados, criar clientes, ordens de serviço e gerenciar seu negócio.",
+    "capacidades": "Posso ajudar você com: consultar dados de clientes e OS, criar novos registros via conversa, gerar relatórios financeiros, gerenciar estoque e muito mais! O que você gostaria de saber?",
+    "agradecimento": "De nada! Estou sempre aqui para ajudar com sua gestão de assistência técnica.",
+    "confirmacao": "Que bom! Posso ajudar com mais alguma coisa sobre seus clientes, OS ou produtos?",
+    "despedida": "Até logo! Quando precisar de ajuda com sua assistência técnica, estarei aqui.",
+    "ajuda": "Posso ajudar você a: consultar clientes (digite o nome), ver status de OS (digite o número), criar novos registros, ver relatórios financeiros, etc. O que você gostaria de fazer?",
+}
+
+
 def detectar_pergunta_conversacional(consulta_lower: str) -> str:
     """
     Detecta perguntas conversacionais e retorna respostas apropriadas.
     Retorna None se não for uma pergunta conversacional.
     """
-    # Saudações
-    if any(
-        saudacao in consulta_lower
-        for saudacao in [
-            "oi",
-            "olá",
-            "ola",
-            "bom dia",
-            "boa tarde",
-            "boa noite",
-            "e ai",
-            "eae",
-        ]
-    ):
-        return "Olá! Como posso ajudar você hoje com seus clientes, ordens de serviço ou produtos?"
-
-    # Sobre a própria IA
-    if any(
-        pergunta in consulta_lower
-        for pergunta in [
-            "voce é uma ia",
-            "você é uma ia",
-            "é uma ia",
-            "voce é um robo",
-            "você é um robo",
-            "o que voce é",
-            "o que você é",
-            "quem é voce",
-            "quem é você",
-        ]
-    ):
-        return "Sim, sou uma IA assistente especializada em gestão de assistência técnica! Posso ajudar você a consultar dados, criar clientes, ordens de serviço e gerenciar seu negócio."
-
-    # Capacidades da IA
-    if any(
-        pergunta in consulta_lower
-        for pergunta in [
-            "o que voce faz",
-            "o que você faz",
-            "o que pode fazer",
-            "suas funcoes",
-            "suas funções",
-            "como voce ajuda",
-            "como você ajuda",
-            "para que serve",
-        ]
-    ):
-        return "Posso ajudar você com: consultar dados de clientes e OS, criar novos registros via conversa, gerar relatórios financeiros, gerenciar estoque e muito mais! O que você gostaria de saber?"
-
-    # Agradecimentos
-    if any(
-        agradecimento in consulta_lower
-        for agradecimento in [
-            "obrigado",
-            "obrigada",
-            "valeu",
-            "thanks",
-            "thank you",
-            "agradecido",
-        ]
-    ):
-        return "De nada! Estou sempre aqui para ajudar com sua gestão de assistência técnica."
-
-    # Confirmações positivas
-    if any(
-        confirmacao in consulta_lower
-        for confirmacao in [
-            "entendi",
-            "entendi",
-            "beleza",
-            "ok",
-            "okay",
-            "certo",
-            "claro",
-            "perfeito",
-            "ótimo",
-            "otimo",
-            "bom",
-            "show",
-            "legal",
-        ]
-    ):
-        return "Que bom! Posso ajudar com mais alguma coisa sobre seus clientes, OS ou produtos?"
-
-    # Despedidas
-    if any(
-        despedida in consulta_lower
-        for despedida in [
-            "tchau",
-            "até logo",
-            "ate logo",
-            "até mais",
-            "ate mais",
-            "bye",
-            "falou",
-        ]
-    ):
-        return "Até logo! Quando precisar de ajuda com sua assistência técnica, estarei aqui."
+    intencao = intencao_do_grupo(consulta_lower, "conversacional")
+    return RESPOSTAS_CONVERSACIONAIS[intencao.nome] if intencao else None
 
-    # Perguntas sobre o sistema
-    if any(
-        pergunta in consulta_lower
-        for pergunta in [
-            "como funciona",
-            "como funciona o sistema",
-            "como usar",
-            "ajuda",
-            "help",
-        ]
-    ):
-        return "Posso ajudar você a: consultar clientes (digite o nome), ver status de OS (digite o número), criar novos registros, ver relatórios financeiros, etc. O que você gostaria de fazer?"
 
-    # Não é uma pergunta conversacional
-    return None
-
-
-def melhorar_busca_com_fuzzy(
-    consulta: str, entidades: list, campo_nome: str, campo_codigo: str = None
-) -> dict:
+def candidatos_busca_fuzzy(consulta_lower: str, dados_contexto: dict,
+                           limite: int = 3) -> list:
     """
-    Melhora a busca usando fuzzy matching se disponível.
-    Retorna a melhor correspondência encontrada.
+    Busca aproximada (erros de digitação) por nome de cliente ou produto e
+    por código de produto, usada quando a busca por palavras não achou
+    nada. Lista os `limite` melhores, do maior score para o menor; requer o
+    rapidfuzz (sem ele, lista vazia). Só buscas de leitura devem usar o
+    primeiro candidato diretamente.
     """
-    try:
-        from fuzzywuzzy import fuzz
-        from fuzzywuzzy import process
-    except ImportError:
-        # Fallback para busca simples se fuzzywuzzy não estiver disponível
-        return None
+    if not fuzzy_disponivel():
+        return []
 
-    if not entidades:
-        return None
-
-    # Preparar lista de nomes para busca
-    nomes = [entidade[campo_nome] for entidade in entidades]
-
-    # Buscar melhor correspondência usando fuzzywuzzy
-    melhor_match, score = process.extractOne(
-        consulta, nomes, scorer=fuzz.token_sort_ratio
-    )
-
-    # Só aceitar se score for alto o suficiente (>70%)
-    if score > 70:
-        # Encontrar a entidade correspondente
-        for entidade in entidades:
-            if entidade[campo_nome] == melhor_match:
-                return {"entidade": entidade, "score": score, "tipo": "fuzzy_match"}
-
-    # Tentar também com códigos se disponível
-    if campo_codigo:
-        codigos = []
-        for entidade in entidades:
-            if entidade.get(campo_codigo):
-                codigos.append(entidade[campo_codigo])
-
-        if codigos:
-            melhor_codigo_match, codigo_score = process.extractOne(
-                consulta, codigos, scorer=fuzz.ratio
+    palavras = [
+        palavra
+        for palavra in palavras_de(consulta_lower)
+        if palavra not in PALAVRAS_COMANDO
+        and palavra not in ("cliente", "produto")
+        and len(palavra) > 2
+    ]
+    if not palavras:
+        return []
+    termo = " ".join(palavras)
+
+    indices = indices_entidades(dados_contexto)
+    candidatos = []
+    for tipo, lista in (("produto", "produtos"), ("cliente", "clientes")):
+        for id_registro, score in indices[tipo].fuzzy("nome").melhores(termo, corte=70):
+            candidatos.append((score, tipo, lista, id_registro, "fuzzy_match"))
+
+    # Códigos: comparação caractere a caractere com cada termo da consulta
+    # (separado só por espaços, para manter códigos como "CAP-002" inteiros)
+    busca_codigos = indices["produto"].fuzzy("codigo")
+    for termo_codigo in normalizar_busca(consulta_lower).split():
+        termo_codigo = termo_codigo.strip(".,;:!?()\"'")
+        if len(termo_codigo) < 3:
+            continue
+        for id_registro, score in busca_codigos.melhores(
+            termo_codigo, limite=1, corte=80, comparador=fuzz.ratio
+        ):
+            candidatos.append(
+                (score, "produto", "produtos", id_registro, "codigo_fuzzy_match")
             )
-            if codigo_score > 80:  # Score mais alto para códigos
-                for entidade in entidades:
-                    if entidade.get(campo_codigo) == melhor_codigo_match:
-                        return {
-                            "entidade": entidade,
-                            "score": codigo_score,
-                            "tipo": "codigo_fuzzy_match",
-                        }
 
-    return None
+    resultado, vistos = [], set()
+    for score, tipo, lista, id_registro, tipo_match in sorted(
+        candidatos, key=lambda c: c[0], reverse=True
+    ):
+        if (tipo, id_registro) in vistos:
+            continue
+        vistos.add((tipo, id_registro))
+        entidade = registro_completo(
+            dados_contexto, lista, indices[tipo].registros[id_registro]
+        )
+        resultado.append({
+            "tipo": tipo,
+            "dados": entidade,
+            "id": entidade["id"],
+            "score": score,
+            "tipo_match": tipo_match,
+        })
+        if len(resultado) == limite:
+            break
+    return resultado
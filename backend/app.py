@@ -30,6 +30,9 @@ def create_app():
     # Importa models para que o Migrate reconheça
     from models import Cliente, ProdutoEstoque, OrdemServico, Usuario  # noqa: F401
 
+    # Hooks que versionam os dados usados pelos caches da IA
+    import versao_dados  # noqa: F401
+
     # Cria todas as tabelas no banco de dados
     with app.app_context():
         db.create_all()
@@ -41,6 +44,8 @@ def create_app():
     from routes_estoque import bp as estoque_bp
     from routes_notificacoes import bp as notificacoes_bp
     from routes_ai import bp as ai_bp
+    from routes_financeiro import bp as financeiro_bp
+    from routes_dashboard import bp as dashboard_bp
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(clientes_bp, url_prefix="/api/clientes")
@@ -48,10 +53,19 @@ def create_app():
     app.register_blueprint(estoque_bp, url_prefix="/api/estoque")
     app.register_blueprint(notificacoes_bp)
     app.register_blueprint(ai_bp, url_prefix="/api/ai")
+    app.register_blueprint(financeiro_bp, url_prefix="/api/financeiro")
+    app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
 
     @app.get("/api/health")
     def health_check():
-        return {"status": "ok"}
+        from auth_utils import estatisticas_cache_usuarios
+        from cache_ia import estatisticas_cache_ia
+
+        return {
+            "status": "ok",
+            "cacheUsuarios": estatisticas_cache_usuarios(),
+            "cacheIA": estatisticas_cache_ia(),
+        }
 
     # Rota para verificação automática de notificações
     @app.post("/api/notificacoes/verificar")
@@ -60,9 +74,13 @@ def create_app():
         try:
             from routes_notificacoes import verificar_e_criar_notificacoes
 
-            verificar_e_criar_notificacoes()
+            criadas = verificar_e_criar_notificacoes()
             return jsonify(
-                {"sucesso": True, "mensagem": "Verificação de notificações concluída"}
+                {
+                    "sucesso": True,
+                    "mensagem": "Verificação de notificações concluída",
+                    "criadas": criadas,
+                }
             )
         except Exception as e:
             print(f"Erro na verificação automática de notificações: {e}")
@@ -243,8 +261,32 @@ def create_app():
     return app
 
 
-app = create_app()
+def iniciar_servicos(app, agendador=None):
+    """
+    Inicia as threads em segundo plano: a fila de tarefas de IA e, se
+    `agendador` (padrão: AGENDADOR_ATIVO), as tarefas periódicas.
+    Só os pontos de entrada que atendem requisições (wsgi.py, python app.py)
+    e o executar_agendador.py chamam; os scripts de linha de comando não.
+    """
+    # Fila de tarefas de IA (resumo automático das OS)
+    from fila_ia import iniciar_fila_ia
+
+    iniciar_fila_ia(app)
+
+    # Tarefas periódicas (verificação de notificações etc.)
+    if agendador is None:
+        agendador = app.config.get("AGENDADOR_ATIVO")
+    if agendador:
+        from agendador import iniciar_agendador
+
+        iniciar_agendador(app)
 
 
 if __name__ == "__main__":
+    import os
+
+    app = create_app()
+    # Com o reloader, só o processo filho atende requisições
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        iniciar_servicos(app)
     app.run(debug=True)
@@ -1,16 +1,81 @@
+import hashlib
 import os
+import secrets
+import threading
 from datetime import datetime, timedelta
 from functools import wraps
 import jwt
-from flask import request, jsonify, g
+from flask import current_app, request, jsonify, g
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session, object_session
 from werkzeug.security import check_password_hash
 
-from models import Usuario
+from extensions import db
+from models import TicketStream, Usuario
+from cache_utils import CacheTTL
 
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "mude-esta-chave-jwt-em-producao")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+TICKET_STREAM_VALIDADE_SEGUNDOS = 30
+
+# Situação (ativo/inativo) dos usuários por processo, para não consultar o
+# banco a cada requisição autenticada
+_cache_usuarios = CacheTTL(ttl=60, max_itens=5000)
+# Incrementada a cada invalidação: uma leitura do banco iniciada antes dela
+# (que pode ter visto o valor antigo) não volta a ser gravada no cache
+_geracao_cache = 0
+_geracao_lock = threading.Lock()
+
+
+def usuario_ativo(usuario_id) -> bool:
+    """Indica se o usuário existe e está ativo, usando o cache quando possível."""
+    ativo = _cache_usuarios.get(usuario_id)
+    if ativo is None:
+        geracao = _geracao_cache
+        ativo = bool(
+            db.session.query(Usuario.ativo).filter(Usuario.id == usuario_id).scalar()
+        )
+        with _geracao_lock:
+            if geracao == _geracao_cache:
+                _cache_usuarios.set(
+                    usuario_id, ativo, ttl=current_app.config.get("AUTH_CACHE_TTL", 60)
+                )
+    return ativo
+
+
+def invalidar_cache_usuario(usuario_id=None):
+    """Remove um usuário (ou todos, sem argumento) do cache de situação."""
+    global _geracao_cache
+    with _geracao_lock:
+        _geracao_cache += 1
+        _cache_usuarios.invalidar(usuario_id)
+
+
+def estatisticas_cache_usuarios() -> dict:
+    return _cache_usuarios.estatisticas()
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _registrar_usuario_alterado(mapper, connection, usuario):
+    # Ainda não commitado: invalida só após o commit (ver abaixo)
+    sessao = object_session(usuario)
+    if sessao is not None:
+        sessao.info.setdefault("usuarios_alterados", set()).add(usuario.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_usuarios_alterados(session):
+    # Desativação ou exclusão passam a valer na hora neste processo
+    for usuario_id in session.info.pop("usuarios_alterados", ()):
+        invalidar_cache_usuario(usuario_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_usuarios_alterados(session):
+    session.info.pop("usuarios_alterados", None)
 
 
 def gerar_token_jwt(usuario_id, usuario_nome):
@@ -32,8 +97,7 @@ def verificar_token_jwt(token):
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
 
         # Verifica se o usuário ainda existe e está ativo
-        usuario = Usuario.query.get(payload["user_id"])
-        if not usuario or not usuario.ativo:
+        if not usuario_ativo(payload["user_id"]):
             raise jwt.InvalidTokenError("Usuário inativo ou não encontrado")
 
         return payload
@@ -43,6 +107,55 @@ def verificar_token_jwt(token):
         raise jwt.InvalidTokenError("Token inválido")
 
 
+def _hash_ticket(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+def gerar_ticket_stream(usuario_id) -> str:
+    """
+    Gera um ticket de curta duração e uso único para abrir um stream SSE,
+    no lugar do JWT na query string (que ficaria em logs e históricos).
+    """
+    ticket = secrets.token_urlsafe(32)
+    agora = datetime.utcnow()
+    # Aproveita para descartar os tickets vencidos que nunca foram usados
+    db.session.execute(delete(TicketStream).where(TicketStream.expira_em < agora))
+    db.session.add(
+        TicketStream(
+            ticket_hash=_hash_ticket(ticket),
+            usuario_id=usuario_id,
+            expira_em=agora + timedelta(seconds=TICKET_STREAM_VALIDADE_SEGUNDOS),
+        )
+    )
+    db.session.commit()
+    return ticket
+
+
+def consumir_ticket_stream(ticket):
+    """
+    Troca o ticket pelo id do usuário, apagando-o. Retorna None se o ticket
+    não existe, já foi usado, expirou ou o usuário foi desativado.
+    """
+    if not ticket:
+        return None
+
+    ticket_hash = _hash_ticket(ticket)
+    registro = db.session.get(TicketStream, ticket_hash)
+    if registro is None:
+        return None
+    usuario_id, expira_em = registro.usuario_id, registro.expira_em
+
+    # O DELETE decide quem consome quando duas conexões usam o mesmo ticket
+    apagados = db.session.execute(
+        delete(TicketStream).where(TicketStream.ticket_hash == ticket_hash)
+    ).rowcount
+    db.session.commit()
+
+    if apagados != 1 or expira_em < datetime.utcnow() or not usuario_ativo(usuario_id):
+        return None
+    return usuario_id
+
+
 def autenticar_usuario(usuario, senha):
     """Autentica um usuário com usuário e senha."""
     user = Usuario.query.filter_by(usuario=usuario, ativo=True).first()
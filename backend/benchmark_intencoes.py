@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark da detecção de intenções do assistente de IA.
+Compara a cadeia anterior (detectar_pergunta_conversacional,
+detectar_intencao_exclusao_edicao e detectar_intencao_criacao, cada uma
+testando `frase in consulta` lista por lista) com a expressão regular
+única de intencoes_ia.py, e lista as consultas em que as duas discordam.
+
+Uso: python benchmark_intencoes.py [--repeticoes 20000]
+"""
+
+import argparse
+import statistics
+import time
+
+from intencoes_ia import INTENCOES, detectar_intencoes
+from texto_utils import normalizar_busca
+
+
+CONSULTAS = [
+    "qual o telefone do joão silva?",
+    "status da os 15",
+    "quais produtos estão com estoque baixo?",
+    "quero cadastrar cliente novo",
+    "exclua o produto capa de silicone",
+    "altere o telefone da maria",
+    "bom dia",
+    "obrigado!",
+    "qual o faturamento deste mês?",
+    "me mostre o book de vendas",  # "ok" dentro de "book"
+    "clientes que voltaram depois do reparo",  # "oi" dentro de "depois"
+    "o notebook do carlos já está pronto?",  # "ok" dentro de "notebook"
+    "lista de ordens de serviço abertas",
+    "quanto custa a tela do iphone 11 na loja?",
+    "preciso de ajuda para criar os",
+    "quantas os foram entregues ontem pelo técnico bombeiro?",  # "bom"
+]
+
+
+def cadeia_anterior(consulta: str) -> tuple:
+    """
+    Primeira intenção de cada grupo, como a cadeia de funções fazia:
+    listas percorridas em ordem com teste de substring. O texto é
+    normalizado como no motor atual, para comparar só o casamento.
+    """
+    consulta_lower = normalizar_busca(consulta)
+    resultado = {}
+    for grupo, nome, frases in INTENCOES:
+        if grupo in resultado:
+            continue
+        if any(frase in consulta_lower for frase in frases):
+            resultado[grupo] = nome
+    return tuple(sorted(resultado.items()))
+
+
+def motor_atual(consulta: str) -> tuple:
+    resultado = {}
+    # __wrapped__: mede a expressão regular, não o lru_cache
+    for intencao in detectar_intencoes.__wrapped__(consulta):
+        resultado.setdefault(intencao.grupo, intencao.nome)
+    return tuple(sorted(resultado.items()))
+
+
+def medir(funcao, repeticoes: int) -> float:
+    """Mediana, em microssegundos, do tempo por consulta."""
+    tempos = []
+    for _ in range(5):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes // len(CONSULTAS)):
+            for consulta in CONSULTAS:
+                funcao(consulta)
+        tempos.append((time.perf_counter() - inicio) / repeticoes * 1_000_000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeticoes", type=int, default=20_000)
+    args = parser.parse_args()
+
+    total_frases = sum(len(frases) for _, _, frases in INTENCOES)
+    print(f"📦 {len(INTENCOES)} intenções, {total_frases} frases, {len(CONSULTAS)} consultas")
+
+    anterior = medir(cadeia_anterior, args.repeticoes)
+    atual = medir(motor_atual, args.repeticoes)
+    print(f"\n🐢 Cadeia anterior (substring): {anterior:.2f} µs/consulta")
+    print(f"🚀 Expressão regular única:     {atual:.2f} µs/consulta")
+
+    print("\n🔎 Consultas com resultado diferente:")
+    for consulta in CONSULTAS:
+        antes, depois = cadeia_anterior(consulta), motor_atual(consulta)
+        if antes != depois:
+            print(f"   {consulta!r}\n      antes:  {dict(antes)}\n      depois: {dict(depois)}")
+
+
+if __name__ == "__main__":
+    main()
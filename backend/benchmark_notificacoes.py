@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Benchmark das consultas de notificações (listagem, contador e retenção).
+Usa apenas sqlite3 da biblioteca padrão: cria um banco sintético com o
+layout de eventos_notificacao/recibos_notificacao, mostra o plano de
+execução (EXPLAIN QUERY PLAN) e o tempo de cada consulta na forma
+anterior e na atual (índices de models.py e consultas de
+routes_notificacoes.py / retencao_notificacoes.py).
+
+Uso: python benchmark_notificacoes.py [--eventos 200000] [--usuarios 50]
+     [--leitura 0.1] [--banco arquivo.db]
+(com os padrões são 200 mil eventos e 1 milhão de recibos)
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+
+
+SCHEMA = """
+CREATE TABLE usuarios (
+    id INTEGER PRIMARY KEY,
+    ativo BOOLEAN,
+    notificacoes_lidas_ate INTEGER
+);
+CREATE TABLE eventos_notificacao (
+    id INTEGER PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    titulo VARCHAR(200) NOT NULL,
+    mensagem TEXT NOT NULL,
+    dados_referencia JSON,
+    chave_referencia VARCHAR(50),
+    prioridade VARCHAR(20),
+    usuario_id INTEGER,
+    criado_em DATETIME,
+    atualizado_em DATETIME
+);
+CREATE INDEX ix_eventos_notificacao_usuario_id ON eventos_notificacao (usuario_id);
+CREATE INDEX ix_eventos_notificacao_dedup ON eventos_notificacao (tipo, chave_referencia);
+CREATE INDEX ix_eventos_notificacao_criado_em ON eventos_notificacao (criado_em);
+CREATE TABLE recibos_notificacao (
+    usuario_id INTEGER NOT NULL,
+    evento_id INTEGER NOT NULL,
+    lida BOOLEAN NOT NULL,
+    excluida BOOLEAN NOT NULL,
+    PRIMARY KEY (usuario_id, evento_id)
+);
+"""
+
+INDICES = """
+DROP INDEX IF EXISTS ix_eventos_notificacao_criado_em;
+CREATE INDEX ix_eventos_notificacao_criado_em ON eventos_notificacao (criado_em, id);
+"""
+
+VISIVEL_ANTES = (
+    "(eventos_notificacao.usuario_id IS NULL OR eventos_notificacao.usuario_id = :usuario)"
+)
+VISIVEL_DEPOIS = "coalesce(eventos_notificacao.usuario_id, :usuario) = :usuario"
+
+RECIBO = """EXISTS (SELECT recibos_notificacao.evento_id FROM recibos_notificacao
+                   WHERE recibos_notificacao.usuario_id = :usuario
+                     AND recibos_notificacao.evento_id = eventos_notificacao.id
+                     AND {condicao})"""
+
+CONTADOR = f"""
+    SELECT count(*) FROM eventos_notificacao
+    WHERE eventos_notificacao.id > :marca AND {{visivel}}
+      AND NOT ({RECIBO.format(condicao="(recibos_notificacao.lida IS 1 OR recibos_notificacao.excluida IS 1)")})
+"""
+
+LISTAR_NAO_LIDAS = f"""
+    SELECT eventos_notificacao.* FROM eventos_notificacao
+    WHERE eventos_notificacao.id > :marca AND {{visivel}}
+      AND NOT ({RECIBO.format(condicao="(recibos_notificacao.lida IS 1 OR recibos_notificacao.excluida IS 1)")})
+    ORDER BY eventos_notificacao.id DESC
+    LIMIT 50
+"""
+
+LISTAR_LIDAS = f"""
+    SELECT eventos_notificacao.* FROM eventos_notificacao
+    WHERE {{visivel}}
+      AND (eventos_notificacao.id <= :marca
+           OR {RECIBO.format(condicao="recibos_notificacao.lida IS 1")})
+      AND NOT ({RECIBO.format(condicao="recibos_notificacao.excluida IS 1")})
+    ORDER BY eventos_notificacao.id DESC
+    LIMIT 50
+"""
+
+RETENCAO = """
+    SELECT eventos_notificacao.id FROM eventos_notificacao
+    WHERE eventos_notificacao.criado_em < :limite
+    ORDER BY {ordem}
+    LIMIT 500
+"""
+
+# Consultas de routes_notificacoes / retencao_notificacoes: forma anterior
+# (índice só em criado_em, visibilidade com OR) e forma atual
+CONSULTAS_ANTES = {
+    "contador": CONTADOR.format(visivel=VISIVEL_ANTES),
+    "listar_nao_lidas": LISTAR_NAO_LIDAS.format(visivel=VISIVEL_ANTES),
+    "listar_lidas": LISTAR_LIDAS.format(visivel=VISIVEL_ANTES),
+    "retencao (nada a arquivar)": RETENCAO.format(ordem="eventos_notificacao.id"),
+}
+CONSULTAS_DEPOIS = {
+    "contador": CONTADOR.format(visivel=VISIVEL_DEPOIS),
+    "listar_nao_lidas": LISTAR_NAO_LIDAS.format(visivel=VISIVEL_DEPOIS),
+    "listar_lidas": LISTAR_LIDAS.format(visivel=VISIVEL_DEPOIS),
+    "retencao (nada a arquivar)": RETENCAO.format(
+        ordem="eventos_notificacao.criado_em, eventos_notificacao.id"
+    ),
+}
+
+
+def popular(conn, eventos, usuarios, leitura):
+    random.seed(42)
+    agora = datetime.now()
+    inicio = agora - timedelta(days=365)
+    passo = timedelta(days=365) / eventos
+
+    marca = eventos - 5000  # ~5 mil eventos recentes ainda não lidos
+    conn.executemany(
+        "INSERT INTO usuarios VALUES (?, 1, ?)",
+        [(u, marca) for u in range(1, usuarios + 1)],
+    )
+
+    tipos = ["os_atrasada", "estoque_critico", "os_pronta", "cliente_novo"]
+    conn.executemany(
+        "INSERT INTO eventos_notificacao VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i,
+                tipos[i % 4],
+                f"Notificação {i}",
+                "Mensagem de teste",
+                f'{{"os_id": {i}}}',
+                f"os:{i}",
+                "normal",
+                random.randint(1, usuarios) if i % 20 == 0 else None,
+                (inicio + passo * i).isoformat(sep=" "),
+                (inicio + passo * i).isoformat(sep=" "),
+            )
+            for i in range(1, eventos + 1)
+        ),
+    )
+
+    por_usuario = int(eventos * leitura)
+    conn.executemany(
+        "INSERT INTO recibos_notificacao VALUES (?, ?, ?, ?)",
+        (
+            (u, e, 1, 1 if random.random() < 0.02 else 0)
+            for u in range(1, usuarios + 1)
+            for e in random.sample(range(1, eventos + 1), por_usuario)
+        ),
+    )
+    conn.commit()
+
+    total = conn.execute("SELECT count(*) FROM recibos_notificacao").fetchone()[0]
+    print(f"📦 {eventos} eventos, {usuarios} usuários, {total} recibos")
+    return {
+        "usuario": 1,
+        "marca": marca,
+        # Anterior a todos os eventos: o caso comum da retenção diária
+        "limite": (inicio - timedelta(days=1)).isoformat(sep=" "),
+    }
+
+
+def medir(conn, consultas, params, repeticoes=5):
+    for nome, sql in consultas.items():
+        plano = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        print(f"\n   {nome}: {statistics.median(tempos):.2f} ms (mediana de {repeticoes})")
+        for linha in plano:
+            print(f"      {linha[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--eventos", type=int, default=200_000)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--leitura", type=float, default=0.1,
+                        help="fração dos eventos com recibo, por usuário")
+    parser.add_argument("--banco", default=":memory:")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.banco)
+    conn.executescript(SCHEMA)
+    params = popular(conn, args.eventos, args.usuarios, args.leitura)
+    conn.execute("ANALYZE")
+
+    print("\n🐢 Antes (visibilidade com OR, índice só em criado_em):")
+    medir(conn, CONSULTAS_ANTES, params)
+
+    conn.executescript(INDICES)
+    conn.execute("ANALYZE")
+
+    print("\n🚀 Depois (COALESCE, índice composto criado_em, id):")
+    medir(conn, CONSULTAS_DEPOIS, params)
+
+
+if __name__ == "__main__":
+    main()
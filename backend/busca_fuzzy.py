@@ -0,0 +1,36 @@
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    # Dependência opcional: sem ela a busca aproximada fica desativada
+    fuzz = process = None
+
+
+def fuzzy_disponivel() -> bool:
+    return process is not None
+
+
+class BuscaFuzzy:
+    """
+    Busca aproximada de nomes (ou códigos) já normalizados, por id.
+    Todas as escolhas são pontuadas em uma única chamada do rapidfuzz
+    (em C), que devolve os ids diretamente e descarta cedo quem não
+    alcança o corte.
+    """
+
+    def __init__(self, escolhas: dict):
+        self.escolhas = escolhas  # id -> texto normalizado
+
+    def melhores(self, consulta: str, limite: int = 3, corte: float = 70,
+                 comparador=None) -> list:
+        """Lista de (id, pontuação) das melhores escolhas, da maior para a menor."""
+        if not fuzzy_disponivel() or not consulta or not self.escolhas:
+            return []
+        resultados = process.extract(
+            consulta,
+            self.escolhas,
+            scorer=comparador or fuzz.token_sort_ratio,
+            processor=None,  # escolhas e consulta já vêm normalizadas
+            score_cutoff=corte,
+            limit=limite,
+        )
+        return [(id_registro, pontuacao) for _, pontuacao, id_registro in resultados]
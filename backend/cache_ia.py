@@ -0,0 +1,103 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import RespostaIA, normalizar_busca
+from cache_utils import CacheTTL
+
+
+# Respostas da IA guardadas em dois níveis: memória do processo (LRU) e
+# tabela respostas_ia (compartilhada entre processos e reinícios)
+TTL_SEGUNDOS = int(os.getenv("IA_CACHE_TTL_DIAS", "30")) * 86400
+_memoria = CacheTTL(ttl=TTL_SEGUNDOS, max_itens=int(os.getenv("IA_CACHE_MAX_ITENS", "500")))
+
+
+def chave_prompt(tipo: str, *partes: str) -> str:
+    """Hash do conteúdo normalizado (caixa, acentos e espaços não importam)."""
+    normalizado = "|".join(normalizar_busca(p or "") for p in partes)
+    return hashlib.sha256(f"{tipo}|{normalizado}".encode("utf-8")).hexdigest()
+
+
+def _ler_banco(chave: str):
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(RespostaIA.resposta).where(
+                RespostaIA.chave == chave, RespostaIA.expira_em > datetime.now()
+            )
+        ).scalar()
+
+
+def _gravar_banco(chave: str, tipo: str, resposta: str, ttl: int):
+    agora = datetime.now()
+    valores = dict(tipo=tipo, resposta=resposta, criado_em=agora,
+                   expira_em=agora + timedelta(seconds=ttl))
+    # Transação própria: não interfere na sessão de quem chamou
+    with db.engine.begin() as conn:
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(RespostaIA).values(chave=chave, **valores))
+        except IntegrityError:
+            conn.execute(update(RespostaIA).where(RespostaIA.chave == chave).values(**valores))
+
+
+def obter_resposta(tipo: str, partes):
+    """
+    Resposta em cache para (tipo, partes) ou None. Fora de um app context
+    só o nível em memória é consultado.
+    """
+    chave = chave_prompt(tipo, *partes)
+
+    resposta = _memoria.get(chave)
+    if resposta is not None or not has_app_context():
+        return resposta
+
+    try:
+        resposta = _ler_banco(chave)
+    except Exception as e:
+        print(f"Aviso: cache de IA no banco indisponível: {e}")
+        return None
+    if resposta is not None:
+        _memoria.set(chave, resposta)
+    return resposta
+
+
+def guardar_resposta(tipo: str, partes, resposta: str, ttl: int = None):
+    """Guarda a resposta nos dois níveis (`ttl` em segundos, padrão do cache)."""
+    ttl = ttl or TTL_SEGUNDOS
+    chave = chave_prompt(tipo, *partes)
+    _memoria.set(chave, resposta, ttl=ttl)
+    if has_app_context():
+        try:
+            _gravar_banco(chave, tipo, resposta, ttl)
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o cache de IA: {e}")
+
+
+def obter_ou_gerar(tipo: str, partes, gerar):
+    """
+    Retorna a resposta em cache para (tipo, partes) ou chama `gerar()` e
+    guarda o resultado. Exceções de `gerar` não são cacheadas.
+    """
+    resposta = obter_resposta(tipo, partes)
+    if resposta is None:
+        resposta = gerar()
+        guardar_resposta(tipo, partes, resposta)
+    return resposta
+
+
+def limpar_respostas_expiradas() -> int:
+    """Remove do banco as respostas vencidas (executado pelo agendador)."""
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            delete(RespostaIA).where(RespostaIA.expira_em <= datetime.now())
+        )
+    return max(resultado.rowcount or 0, 0)
+
+
+def estatisticas_cache_ia() -> dict:
+    return _memoria.estatisticas()
@@ -0,0 +1,59 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Cache em memória com expiração (TTL) e descarte LRU ao atingir o limite.
+    Seguro entre threads; mantém contadores de acertos/erros para monitoramento.
+    """
+
+    def __init__(self, ttl: float, max_itens: int = 1000):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens = OrderedDict()  # chave -> (expira_em, valor)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.erros = 0
+
+    def get(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.erros += 1
+                return padrao
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self.erros += 1
+                return padrao
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def set(self, chave, valor, ttl: float = None):
+        expira_em = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def invalidar(self, chave=None):
+        """Remove uma chave ou, sem argumento, esvazia o cache."""
+        with self._lock:
+            if chave is None:
+                self._itens.clear()
+            else:
+                self._itens.pop(chave, None)
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            total = self.acertos + self.erros
+            return {
+                "itens": len(self._itens),
+                "acertos": self.acertos,
+                "erros": self.erros,
+                "taxaAcerto": round(self.acertos / total, 3) if total else 0,
+            }
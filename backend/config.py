@@ -19,6 +19,49 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "mude-esta-chave-em-producao")
     MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
+    # Quantos números de OS cada processo reserva por vez no banco.
+    # 1 = sem lacunas; valores maiores reduzem a disputa entre workers.
+    SEQUENCIA_OS_BLOCO = int(os.getenv("SEQUENCIA_OS_BLOCO", "1"))
+
+    # Segundos que os KPIs do dashboard ficam em cache em cada processo
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "30"))
+
+    # Segundos que a situação (ativo/inativo) de cada usuário fica em cache
+    AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+
+    # Tarefas periódicas (thread em cada processo, trava no banco).
+    # Com gunicorn --preload, desative aqui e use um processo separado.
+    AGENDADOR_ATIVO = os.getenv("AGENDADOR_ATIVO", "1") == "1"
+    # Intervalo, em segundos, da verificação automática de notificações
+    NOTIFICACOES_INTERVALO = int(os.getenv("NOTIFICACOES_INTERVALO", "300"))
+
+    # Stream SSE de notificações: duração máxima de cada conexão e intervalo
+    # da recontagem de segurança (eventos gerados em outros processos).
+    # Cada conexão aberta (aqui e em /api/ai/*/stream) ocupa uma thread do
+    # worker: o Procfile usa gunicorn gthread (GUNICORN_THREADS por worker).
+    # NOTIFICACOES_STREAM_MAX limita os streams por processo (acima disso,
+    # 503 e o navegador volta ao polling por NOTIFICACOES_STREAM_RETRY
+    # segundos); mantenha-o abaixo de GUNICORN_THREADS.
+    NOTIFICACOES_STREAM_DURACAO = int(os.getenv("NOTIFICACOES_STREAM_DURACAO", "300"))
+    NOTIFICACOES_STREAM_RECONTAGEM = int(os.getenv("NOTIFICACOES_STREAM_RECONTAGEM", "120"))
+    NOTIFICACOES_STREAM_MAX = int(os.getenv("NOTIFICACOES_STREAM_MAX", "16"))
+    NOTIFICACOES_STREAM_RETRY = int(os.getenv("NOTIFICACOES_STREAM_RETRY", "60"))
+
+    # Retenção: eventos com mais de NOTIFICACOES_ARQUIVAR_DIAS vão para
+    # arquivos JSONL.gz; os já lidos por todos saem após NOTIFICACOES_LIDAS_DIAS
+    NOTIFICACOES_ARQUIVAR_DIAS = int(os.getenv("NOTIFICACOES_ARQUIVAR_DIAS", "90"))
+    NOTIFICACOES_LIDAS_DIAS = int(os.getenv("NOTIFICACOES_LIDAS_DIAS", "30"))
+    NOTIFICACOES_ARQUIVO_DIR = os.getenv(
+        "NOTIFICACOES_ARQUIVO_DIR", os.path.join(BASE_DIR, "arquivo")
+    )
+    NOTIFICACOES_RETENCAO_INTERVALO = int(os.getenv("NOTIFICACOES_RETENCAO_INTERVALO", "86400"))
+
+    # Fila de tarefas de IA em segundo plano (por processo). O limite de
+    # chamadas simultâneas à Mistral é MISTRAL_MAX_CONCORRENTES (ai_utils).
+    IA_WORKERS = int(os.getenv("IA_WORKERS", "2"))
+    IA_FILA_TAMANHO = int(os.getenv("IA_FILA_TAMANHO", "100"))
+    IA_MAX_TENTATIVAS = int(os.getenv("IA_MAX_TENTATIVAS", "3"))
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
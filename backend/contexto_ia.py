@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+from cache_ia import guardar_resposta, obter_resposta
+from versao_dados import versao_dados
+
+
+# Estruturas da IA montadas por versão dos dados (ver versao_dados.py):
+# os dados de contexto e o índice de entidades. Cada processo mantém a
+# última versão montada em memória; os dados de contexto também são
+# compartilhados entre os workers pela tabela respostas_ia. Quando a
+# versão muda, a cópia antiga continua sendo servida enquanto a nova é
+# montada em segundo plano (uma montagem por vez neste processo).
+CONTEXTO_TTL = int(os.getenv("IA_CONTEXTO_TTL", "300"))
+
+
+class CacheVersionado:
+    def __init__(self, nome: str, ttl: int, compartilhado: bool = True):
+        self.nome = nome
+        self.ttl = ttl
+        self.compartilhado = compartilhado
+        self._atual = {"versao": None, "dados": None, "montado_em": 0.0}
+        self._lock = threading.Lock()
+        self._montando = set()  # versões sendo montadas neste processo
+
+    def _guardar_local(self, versao: int, dados):
+        with self._lock:
+            if self._atual["versao"] is None or versao >= self._atual["versao"]:
+                self._atual.update(versao=versao, dados=dados, montado_em=time.monotonic())
+
+    def _montar(self, versao: int, construir):
+        """Busca a versão na tabela compartilhada ou monta a partir do banco."""
+        bruto = obter_resposta(self.nome, [str(versao)]) if self.compartilhado else None
+        if bruto:
+            dados = json.loads(bruto)
+        else:
+            dados = construir()
+            if dados and self.compartilhado:
+                guardar_resposta(
+                    self.nome, [str(versao)], json.dumps(dados, ensure_ascii=False),
+                    ttl=self.ttl,
+                )
+        if dados:
+            self._guardar_local(versao, dados)
+        return dados
+
+    def _montar_em_segundo_plano(self, versao: int, construir):
+        with self._lock:
+            if versao in self._montando:
+                return
+            self._montando.add(versao)
+        app = current_app._get_current_object()
+
+        def executar():
+            try:
+                with app.app_context():
+                    self._montar(versao, construir)
+            except Exception as e:
+                print(f"Erro ao montar {self.nome} da IA em segundo plano: {e}")
+            finally:
+                with self._lock:
+                    self._montando.discard(versao)
+
+        threading.Thread(target=executar, daemon=True).start()
+
+    def obter(self, construir) -> tuple:
+        """
+        Retorna (versao_servida, dados). `construir()` monta a estrutura a
+        partir do banco; só é chamada de forma síncrona quando o processo
+        ainda não tem nenhuma versão. Enquanto a versão nova é montada,
+        `versao_servida` é a da cópia anterior, menor que versao_dados():
+        quem guarda algo derivado dos dados deve usar esta versão. O
+        resultado é compartilhado: quem recebe não deve alterá-lo.
+        """
+        versao = versao_dados()
+        with self._lock:
+            atual = dict(self._atual)
+
+        expirado = time.monotonic() - atual["montado_em"] > self.ttl
+        if atual["versao"] == versao and not expirado:
+            return versao, atual["dados"]
+
+        if atual["dados"] is None:
+            print(f"📊 Montando {self.nome} da IA a partir do banco")
+            return versao, self._montar(versao, construir)
+
+        # Versão antiga (ou vencida) atende enquanto a nova é montada
+        print(f"📊 Usando {self.nome} da IA anterior; atualizando em segundo plano")
+        self._montar_em_segundo_plano(versao, construir)
+        return atual["versao"], atual["dados"]
+
+
+_contexto = CacheVersionado("contexto", CONTEXTO_TTL)
+# O índice de entidades não é serializável: cada processo monta o seu
+_indice_entidades = CacheVersionado("indice", CONTEXTO_TTL, compartilhado=False)
+
+
+def obter_contexto(construir) -> tuple:
+    """(versao, dados de contexto) (ver CacheVersionado.obter)."""
+    return _contexto.obter(construir)
+
+
+def obter_indice_entidades(construir) -> tuple:
+    """(versao, índices de entidades) (ver CacheVersionado.obter)."""
+    return _indice_entidades.obter(construir)
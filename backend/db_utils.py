@@ -0,0 +1,47 @@
+from sqlalchemy import String, cast, func, literal, literal_column
+
+from extensions import db
+from models import OrdemServico
+
+
+def expr_prazo_vencido(agora):
+    """
+    Condição SQL "criado_em + prazo_estimado dias < agora".
+    A aritmética de datas muda de banco para banco, por isso o dialeto.
+    """
+    criado_em = OrdemServico.criado_em
+    prazo = OrdemServico.prazo_estimado
+    dialeto = db.engine.dialect.name
+
+    if dialeto == "sqlite":
+        return func.julianday(agora) - func.julianday(criado_em) > prazo
+    if dialeto == "postgresql":
+        return criado_em + func.make_interval(0, 0, 0, prazo) < agora
+    # MySQL / MariaDB
+    return func.timestampdiff(literal_column("SECOND"), criado_em, agora) > prazo * 86400
+
+
+def texto_sql(*partes):
+    """
+    Concatena textos e colunas em SQL. O SQLAlchemy traduz para `||` ou
+    CONCAT() conforme o banco; colunas não textuais são convertidas.
+    """
+    expressao = None
+    for parte in partes:
+        if isinstance(parte, str):
+            parte = literal(parte, String)
+        elif not isinstance(parte.type, String):
+            parte = cast(parte, String)
+        expressao = parte if expressao is None else expressao + parte
+    return expressao
+
+
+def json_objeto_sql(**campos):
+    """Monta um objeto JSON em SQL a partir de pares chave=expressão."""
+    argumentos = []
+    for chave, valor in campos.items():
+        argumentos.extend([literal(chave, String), valor])
+    if db.engine.dialect.name == "postgresql":
+        return func.json_build_object(*argumentos)
+    # SQLite (JSON1) e MySQL / MariaDB
+    return func.json_object(*argumentos)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Executa as tarefas periódicas em um processo dedicado.
+Use quando o agendador estiver desativado nos workers web
+(AGENDADOR_ATIVO=0), por exemplo com vários workers gunicorn.
+"""
+
+from app import create_app, iniciar_servicos
+
+
+def main():
+    app = create_app()
+    iniciar_servicos(app, agendador=True)
+    agendador = app.extensions["agendador"]
+    try:
+        agendador.aguardar()
+    except KeyboardInterrupt:
+        agendador.parar()
+        print("👋 Agendador encerrado")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import queue
+import random
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, update
+
+from extensions import db
+from models import OrdemServico, TarefaIA
+from ai_utils import gerar_resumo
+
+
+def executar_resumo_os(tarefa: TarefaIA) -> str:
+    """Gera o resumo do problema da OS e grava nas observações, se vazias."""
+    os_obj = OrdemServico.query.get(tarefa.os_id)
+    if not os_obj:
+        return "OS removida"
+
+    resumo_ia = gerar_resumo(os_obj.problema_relatado, propagar_erro=True)
+    # Atualizar observações com o resumo da IA se não houver observações
+    if not os_obj.observacoes:
+        os_obj.observacoes = f"[IA] Resumo: {resumo_ia}"
+    return resumo_ia
+
+
+# Tipo da tarefa -> função que a executa (recebe a TarefaIA, retorna o resultado)
+EXECUTORES = {
+    "resumo_os": executar_resumo_os,
+}
+
+
+class FilaTarefasIA:
+    """
+    Fila limitada de tarefas de IA com um número fixo de workers.
+    Cada worker usa o próprio app context (e portanto a própria sessão) e
+    grava o status em tarefas_ia. Uma falha devolve a tarefa a "pendente"
+    com `proxima_tentativa_em` (backoff exponencial) e um timer a recoloca
+    na fila nesse momento; o worker segue para a próxima tarefa em vez de
+    esperar. Se a fila estiver cheia, a tarefa fica "pendente" no banco e
+    é recolocada depois por `reenfileirar_pendentes`.
+    """
+
+    def __init__(self, app, workers: int = 2, tamanho: int = 100,
+                 max_tentativas: int = 3, espera_base: float = 2.0):
+        self.app = app
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self._fila = queue.Queue(maxsize=tamanho)
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"fila-ia-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def enfileirar(self, tarefa_id: int) -> bool:
+        try:
+            self._fila.put_nowait(tarefa_id)
+            return True
+        except queue.Full:
+            print(f"⚠️  Fila de IA cheia; tarefa {tarefa_id} ficará pendente")
+            return False
+
+    def espaco_livre(self) -> int:
+        return max(self._fila.maxsize - self._fila.qsize(), 0)
+
+    def _worker(self):
+        while True:
+            tarefa_id = self._fila.get()
+            with self.app.app_context():
+                try:
+                    self._processar(tarefa_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ Erro inesperado na tarefa de IA {tarefa_id}: {e}")
+                finally:
+                    db.session.remove()
+                    self._fila.task_done()
+
+    def _processar(self, tarefa_id: int):
+        # Assume a tarefa de forma atômica: se outro worker/processo já pegou
+        # (ou a próxima tentativa ainda não chegou), sai
+        agora = datetime.now()
+        assumida = db.session.execute(
+            update(TarefaIA)
+            .where(
+                TarefaIA.id == tarefa_id,
+                TarefaIA.status == "pendente",
+                or_(
+                    TarefaIA.proxima_tentativa_em.is_(None),
+                    TarefaIA.proxima_tentativa_em <= agora,
+                ),
+            )
+            .values(status="executando", atualizado_em=agora)
+        ).rowcount
+        db.session.commit()
+        if not assumida:
+            return
+
+        tarefa = TarefaIA.query.get(tarefa_id)
+        executor = EXECUTORES.get(tarefa.tipo)
+        if executor is None:
+            tarefa.status = "erro"
+            tarefa.ultimo_erro = f"Tipo de tarefa desconhecido: {tarefa.tipo}"
+            db.session.commit()
+            return
+
+        try:
+            resultado = executor(tarefa)
+        except Exception as e:
+            # Descarta o que o executor alterou e registra a tentativa
+            db.session.rollback()
+            tarefa = TarefaIA.query.get(tarefa_id)
+            tarefa.tentativas += 1
+            tarefa.ultimo_erro = str(e)
+            if tarefa.tentativas >= self.max_tentativas:
+                tarefa.status = "erro"
+                db.session.commit()
+                print(f"❌ Tarefa de IA {tarefa_id} falhou após {tarefa.tentativas} tentativa(s): {e}")
+                return
+            espera = self.espera_base * 2 ** (tarefa.tentativas - 1)
+            espera += random.uniform(0, espera / 2)
+            tarefa.status = "pendente"
+            tarefa.proxima_tentativa_em = datetime.now() + timedelta(seconds=espera)
+            db.session.commit()
+            self._agendar(tarefa_id, espera)
+            return
+
+        tarefa.tentativas += 1
+        tarefa.resultado = resultado
+        tarefa.status = "concluida"
+        tarefa.ultimo_erro = None
+        tarefa.proxima_tentativa_em = None
+        db.session.commit()
+        print(f"✅ Tarefa de IA {tarefa_id} ({tarefa.tipo}) concluída")
+
+    def _agendar(self, tarefa_id: int, espera: float):
+        """Recoloca a tarefa na fila após `espera` segundos, sem ocupar um worker."""
+        timer = threading.Timer(espera, self.enfileirar, args=(tarefa_id,))
+        timer.daemon = True
+        timer.start()
+
+
+def reenfileirar_pendentes() -> int:
+    """
+    Recoloca na fila as tarefas que ficaram para trás: pendentes há mais de
+    um minuto (fila cheia, processo reiniciado) cuja próxima tentativa já
+    chegou e "executando" há mais de dez minutos (worker morreu no meio).
+    Retorna quantas foram enfileiradas.
+    """
+    fila = current_app.extensions.get("fila_ia")
+    if fila is None:
+        return 0
+
+    agora = datetime.now()
+    db.session.execute(
+        update(TarefaIA)
+        .where(
+            TarefaIA.status == "executando",
+            TarefaIA.atualizado_em < agora - timedelta(minutes=10),
+        )
+        .values(status="pendente")
+    )
+    db.session.commit()
+
+    ids = [
+        id_ for (id_,) in db.session.query(TarefaIA.id)
+        .filter(
+            TarefaIA.status == "pendente",
+            TarefaIA.criado_em < agora - timedelta(minutes=1),
+            or_(
+                TarefaIA.proxima_tentativa_em.is_(None),
+                TarefaIA.proxima_tentativa_em <= agora,
+            ),
+        )
+        .order_by(TarefaIA.id)
+        .limit(fila.espaco_livre())
+    ]
+    return sum(1 for tarefa_id in ids if fila.enfileirar(tarefa_id))
+
+
+def iniciar_fila_ia(app):
+    """Cria a fila de tarefas de IA do processo."""
+    fila = FilaTarefasIA(
+        app,
+        workers=app.config.get("IA_WORKERS", 2),
+        tamanho=app.config.get("IA_FILA_TAMANHO", 100),
+        max_tentativas=app.config.get("IA_MAX_TENTATIVAS", 3),
+    )
+    app.extensions["fila_ia"] = fila
+    return fila
+
+
+def enfileirar_tarefa_ia(tarefa_id: int) -> bool:
+    """Envia a tarefa (já gravada no banco) para a fila deste processo."""
+    fila = current_app.extensions.get("fila_ia")
+    return fila.enfileirar(tarefa_id) if fila else False
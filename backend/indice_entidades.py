@@ -0,0 +1,101 @@
+import re
+from collections import defaultdict
+
+from busca_fuzzy import BuscaFuzzy
+from texto_utils import normalizar_busca
+
+
+def palavras_de(texto: str) -> list:
+    """Palavras do texto normalizado (sem acentos e pontuação)."""
+    return re.findall(r"\w+", normalizar_busca(texto))
+
+
+def trigramas(palavra: str) -> set:
+    return {palavra[i:i + 3] for i in range(len(palavra) - 2)}
+
+
+class IndiceEntidades:
+    """
+    Índice invertido de um tipo de entidade (clientes, produtos ou OS):
+    palavra -> ids e trigrama -> ids, sobre os campos de texto indexados.
+    Uma palavra da consulta com 3 letras ou mais encontra as entidades
+    que a contêm como trecho (interseção dos trigramas, confirmada no
+    texto); palavras menores só casam inteiras.
+    """
+
+    def __init__(self, campos: tuple, campo_codigo: str = None):
+        self.campos = campos
+        self.campo_codigo = campo_codigo
+        self.registros = {}  # id -> registro
+        self.textos = {}  # id -> {campo: texto normalizado}
+        self.codigos = {}  # código normalizado -> id
+        self._palavras = defaultdict(set)
+        self._trigramas = defaultdict(set)
+        self._fuzzy = {}  # campo -> BuscaFuzzy
+
+    def __len__(self):
+        return len(self.registros)
+
+    def adicionar(self, registro: dict):
+        id_registro = registro["id"]
+        self.registros[id_registro] = registro
+        textos = self.textos[id_registro] = {}
+        for campo in self.campos:
+            texto = normalizar_busca(str(registro.get(campo) or ""))
+            textos[campo] = texto
+            for palavra in re.findall(r"\w+", texto):
+                self._palavras[palavra].add(id_registro)
+                for trigrama in trigramas(palavra):
+                    self._trigramas[trigrama].add(id_registro)
+        if self.campo_codigo and registro.get(self.campo_codigo):
+            self.codigos[normalizar_busca(registro[self.campo_codigo])] = id_registro
+
+    def candidatos(self, palavra: str) -> set:
+        """Ids cujos campos contêm a palavra (inteira, ou como trecho se >= 3 letras)."""
+        if len(palavra) < 3:
+            return set(self._palavras.get(palavra, ()))
+        listas = [self._trigramas.get(t) for t in trigramas(palavra)]
+        if not all(listas):
+            return set()
+        listas.sort(key=len)
+        ids = set(listas[0]).intersection(*listas[1:])
+        # Trigramas em comum não garantem o trecho inteiro: confirma no texto
+        return {
+            i for i in ids if any(palavra in texto for texto in self.textos[i].values())
+        }
+
+    def buscar(self, palavras: list) -> list:
+        """
+        Ids a pontuar para as palavras da consulta: os que contêm todas
+        (quando existem, são os únicos que podem ganhar o bônus de
+        correspondência completa) ou, senão, os que contêm alguma.
+        """
+        conjuntos = sorted((self.candidatos(p) for p in palavras), key=len)
+        if not conjuntos:
+            return []
+        todas = conjuntos[0].intersection(*conjuntos[1:])
+        return sorted(todas or set().union(*conjuntos))
+
+    def fuzzy(self, campo: str) -> BuscaFuzzy:
+        """Busca aproximada sobre um campo, montada na primeira chamada."""
+        busca = self._fuzzy.get(campo)
+        if busca is None:
+            busca = self._fuzzy[campo] = BuscaFuzzy(
+                {i: textos[campo] for i, textos in self.textos.items() if textos[campo]}
+            )
+        return busca
+
+    def por_codigo(self, consulta: str):
+        """Registro cujo código aparece como palavra da consulta (ou None)."""
+        for termo in normalizar_busca(consulta).split():
+            id_registro = self.codigos.get(termo.strip(".,;:!?()\"'"))
+            if id_registro is not None:
+                return self.registros[id_registro]
+        return None
+
+
+def montar_indice(registros, campos: tuple, campo_codigo: str = None) -> IndiceEntidades:
+    indice = IndiceEntidades(campos, campo_codigo)
+    for registro in registros:
+        indice.adicionar(registro)
+    return indice
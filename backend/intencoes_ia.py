@@ -0,0 +1,103 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from texto_utils import normalizar_busca
+
+
+# Tabelas de frases por intenção, em ordem de prioridade (a primeira
+# intenção encontrada de cada grupo vence). As frases são comparadas com
+# o texto normalizado (minúsculas, sem acentos) e só casam com palavras
+# inteiras: "ok" não casa com "book" nem "oi" com "depois".
+INTENCOES = [
+    ("conversacional", "saudacao", [
+        "oi", "ola", "bom dia", "boa tarde", "boa noite", "e ai", "eae",
+    ]),
+    ("conversacional", "sobre_ia", [
+        "voce e uma ia", "e uma ia", "voce e um robo", "o que voce e",
+        "quem e voce",
+    ]),
+    ("conversacional", "capacidades", [
+        "o que voce faz", "o que pode fazer", "suas funcoes", "como voce ajuda",
+        "para que serve",
+    ]),
+    ("conversacional", "agradecimento", [
+        "obrigado", "obrigada", "valeu", "thanks", "thank you", "agradecido",
+    ]),
+    ("conversacional", "confirmacao", [
+        "entendi", "beleza", "ok", "okay", "certo", "claro", "perfeito", "otimo",
+        "bom", "show", "legal",
+    ]),
+    ("conversacional", "despedida", [
+        "tchau", "ate logo", "ate mais", "bye", "falou",
+    ]),
+    ("conversacional", "ajuda", [
+        "como funciona", "como funciona o sistema", "como usar", "ajuda", "help",
+    ]),
+    ("operacao", "exclusao", [
+        "exclua", "delete", "remova", "apague", "elimine", "quero excluir",
+        "quero deletar", "quero remover",
+    ]),
+    ("operacao", "edicao", [
+        "altere", "modifique", "atualize", "edite", "mude", "alterar", "modificar",
+        "quero alterar", "quero modificar", "quero atualizar", "quero editar",
+    ]),
+    ("criacao", "cliente", [
+        "adicionar cliente", "cadastrar cliente", "criar cliente", "novo cliente",
+        "registrar cliente", "incluir cliente", "quero adicionar um cliente",
+        "gostaria de adicionar um cliente",
+    ]),
+    ("criacao", "os", [
+        "criar os", "nova os", "adicionar os", "cadastrar os", "registrar os",
+        "nova ordem", "ordem de servico", "quero criar uma os",
+    ]),
+    ("criacao", "produto", [
+        "adicionar produto", "cadastrar produto", "criar produto", "novo produto",
+        "registrar produto", "incluir produto", "quero adicionar um produto",
+    ]),
+]
+
+# Intenção encontrada; inicio/fim são posições no texto normalizado
+Intencao = namedtuple("Intencao", "grupo nome inicio fim trecho prioridade")
+
+
+def _compilar():
+    """
+    Junta todas as frases em uma única expressão regular. As alternativas
+    vão da mais longa para a mais curta, para que "bom dia" vença "bom" e
+    "quero excluir" vença um trecho menor na mesma posição.
+    """
+    frases = {}
+    for prioridade, (grupo, nome, lista) in enumerate(INTENCOES):
+        for frase in lista:
+            frases.setdefault(normalizar_busca(frase), (grupo, nome, prioridade))
+    ordenadas = sorted(frases, key=len, reverse=True)
+    padrao = r"\b(?:%s)\b" % "|".join(re.escape(f) for f in ordenadas)
+    return re.compile(padrao), frases
+
+
+_PADRAO, _FRASES = _compilar()
+
+
+@lru_cache(maxsize=512)
+def detectar_intencoes(texto: str) -> tuple:
+    """
+    Todas as intenções presentes no texto em uma única passada, ordenadas
+    por prioridade (uma por nome de intenção, a primeira ocorrência).
+    """
+    encontradas = {}
+    for m in _PADRAO.finditer(normalizar_busca(texto)):
+        grupo, nome, prioridade = _FRASES[m.group(0)]
+        if nome not in encontradas:
+            encontradas[nome] = Intencao(
+                grupo, nome, m.start(), m.end(), m.group(0), prioridade
+            )
+    return tuple(sorted(encontradas.values(), key=lambda i: i.prioridade))
+
+
+def intencao_do_grupo(texto: str, grupo: str):
+    """Intenção de maior prioridade do grupo encontrada no texto (ou None)."""
+    for intencao in detectar_intencoes(texto):
+        if intencao.grupo == grupo:
+            return intencao
+    return None
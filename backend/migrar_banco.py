@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Script para atualizar o schema de bancos já existentes.
+O db.create_all() do app só cria tabelas novas; colunas e índices adicionados
+depois aos models são criados aqui. Pode ser executado mais de uma vez.
+"""
+
+from sqlalchemy import delete, insert, inspect, select, text, update
+from sqlalchemy.schema import CreateColumn
+
+from app import create_app
+from extensions import db
+from models import (
+    Cliente,
+    EventoNotificacao,
+    Notificacao,
+    ReciboNotificacao,
+    ResumoFinanceiroDiario,
+    Usuario,
+    gravar_termos_busca_cliente,
+    normalizar_busca,
+    somente_digitos,
+)
+from routes_financeiro import reconstruir_resumo_diario
+from routes_notificacoes import chave_referencia_de_dados
+
+
+def criar_colunas_faltantes():
+    """Adiciona aos bancos existentes as colunas novas declaradas nos models."""
+    inspector = inspect(db.engine)
+    for tabela in db.metadata.sorted_tables:
+        if not inspector.has_table(tabela.name):
+            continue
+        existentes = {c["name"] for c in inspector.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name in existentes:
+                continue
+            ddl = CreateColumn(coluna).compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {tabela.name} ADD COLUMN {ddl}"))
+            print(f"   • Coluna criada: {tabela.name}.{coluna.name}")
+
+
+def criar_indices_faltantes():
+    """Cria os índices declarados nos models que ainda não existem no banco."""
+    inspector = inspect(db.engine)
+    for tabela in db.metadata.sorted_tables:
+        if not inspector.has_table(tabela.name):
+            continue
+        existentes = {i["name"] for i in inspector.get_indexes(tabela.name)}
+        for indice in tabela.indexes:
+            if indice.name in existentes:
+                continue
+            indice.create(bind=db.engine)
+            print(f"   • Índice criado: {indice.name}")
+
+
+def preencher_campos_busca_clientes():
+    """Preenche as colunas e palavras de busca dos clientes já cadastrados."""
+    total = 0
+    while True:
+        lote = (
+            Cliente.query.filter(
+                (Cliente.nome_busca.is_(None))
+                | (Cliente.telefone_digitos.is_(None))
+                | (Cliente.email.is_not(None) & Cliente.email_busca.is_(None))
+            )
+            .limit(1000)
+            .all()
+        )
+        if not lote:
+            break
+        for cliente in lote:
+            cliente.nome_busca = normalizar_busca(cliente.nome)
+            cliente.telefone_digitos = somente_digitos(cliente.telefone)
+            cliente.email_busca = cliente.email.lower() if cliente.email else None
+        db.session.commit()
+        total += len(lote)
+    print(f"   • {total} cliente(s) atualizados")
+
+    # Palavras do nome (busca por sobrenome): refeitas para todos, em lotes
+    ultimo_id = 0
+    while True:
+        with db.engine.begin() as conn:
+            lote = conn.execute(
+                select(Cliente.id, Cliente.nome_busca)
+                .where(Cliente.id > ultimo_id)
+                .order_by(Cliente.id)
+                .limit(1000)
+            ).all()
+            for cliente_id, nome_busca in lote:
+                gravar_termos_busca_cliente(conn, cliente_id, nome_busca)
+        if not lote:
+            break
+        ultimo_id = lote[-1][0]
+    print("   • Palavras de busca dos clientes atualizadas")
+
+
+def criar_indice_trigram_clientes():
+    """Cria o índice trigram do nome dos clientes (apenas PostgreSQL)."""
+    if db.engine.dialect.name != "postgresql":
+        print("   • Banco não é PostgreSQL - busca por nome usa índice de prefixo")
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_clientes_nome_busca_trgm "
+                "ON clientes USING gin (nome_busca gin_trgm_ops)"
+            )
+        )
+
+
+def preencher_resumo_financeiro():
+    """Gera o resumo financeiro diário se ele ainda estiver vazio."""
+    if ResumoFinanceiroDiario.query.first():
+        print("   • Resumo já preenchido (use reconstruir_resumo_financeiro.py para refazer)")
+        return
+    total = reconstruir_resumo_diario()
+    print(f"   • {total} linha(s) geradas")
+
+
+def preencher_chave_referencia_notificacoes():
+    """Preenche a chave de deduplicação das notificações já existentes."""
+    total, ultimo_id = 0, 0
+    while True:
+        lote = (
+            Notificacao.query.filter(
+                Notificacao.id > ultimo_id, Notificacao.chave_referencia.is_(None)
+            )
+            .order_by(Notificacao.id)
+            .limit(1000)
+            .all()
+        )
+        if not lote:
+            break
+        for notificacao in lote:
+            notificacao.chave_referencia = chave_referencia_de_dados(
+                notificacao.dados_referencia
+            )
+        db.session.commit()
+        ultimo_id = lote[-1].id
+        total += len(lote)
+    print(f"   • {total} notificação(ões) atualizadas")
+
+
+def migrar_notificacoes_para_eventos():
+    """Converte as notificações por usuário em eventos únicos com recibos."""
+    if not Notificacao.query.first():
+        print("   • Nenhuma notificação no layout antigo")
+        return
+
+    usuarios_ids = [u.id for u in Usuario.query.with_entities(Usuario.id)]
+    eventos = {}  # chave do evento -> id do EventoNotificacao
+    lidas = {}  # id do evento -> {usuario_id: lida} (quem tinha a cópia)
+
+    ultimo_id = 0
+    while True:
+        lote = (
+            Notificacao.query.filter(Notificacao.id > ultimo_id)
+            .order_by(Notificacao.id)
+            .limit(1000)
+            .all()
+        )
+        if not lote:
+            break
+        for antiga in lote:
+            # Cópias da mesma notificação para usuários diferentes viram um
+            # evento. As cópias eram gravadas em sequência: o criado_em (ao
+            # segundo) separa eventos repetidos com o mesmo texto
+            if antiga.chave_referencia:
+                chave = (
+                    antiga.tipo,
+                    antiga.chave_referencia,
+                    antiga.titulo,
+                    antiga.mensagem,
+                    antiga.criado_em.replace(microsecond=0) if antiga.criado_em else None,
+                )
+            else:
+                chave = ("id", antiga.id)
+            evento_id = eventos.get(chave)
+            if evento_id is None:
+                evento = EventoNotificacao(
+                    tipo=antiga.tipo,
+                    titulo=antiga.titulo,
+                    mensagem=antiga.mensagem,
+                    dados_referencia=antiga.dados_referencia,
+                    chave_referencia=antiga.chave_referencia,
+                    prioridade=antiga.prioridade,
+                    usuario_id=antiga.usuario_id,
+                    criado_em=antiga.criado_em,
+                    atualizado_em=antiga.atualizado_em,
+                )
+                db.session.add(evento)
+                db.session.flush()
+                evento_id = eventos[chave] = evento.id
+            lidas.setdefault(evento_id, {})[antiga.usuario_id] = antiga.lida
+        ultimo_id = lote[-1].id
+
+    # Só vira evento para todos o que tinha cópias para mais de um usuário;
+    # o resto continua visível apenas para o destinatário original
+    destinatarios = {
+        evento_id: None if len(por_usuario) > 1 else next(iter(por_usuario))
+        for evento_id, por_usuario in lidas.items()
+    }
+    para_todos = [e for e, destino in destinatarios.items() if destino is None]
+    for inicio in range(0, len(para_todos), 1000):
+        db.session.execute(
+            update(EventoNotificacao)
+            .where(EventoNotificacao.id.in_(para_todos[inicio:inicio + 1000]))
+            .values(usuario_id=None)
+        )
+
+    # Quem não tinha a cópia (usuários criados depois) conta como já lida.
+    # A marca de cada usuário fica logo abaixo do seu primeiro evento não
+    # lido; recibo "lida" só para as exceções acima da marca.
+    maior_id = max(destinatarios)
+    marcas, recibos = [], []
+    for usuario_id in usuarios_ids:
+        visiveis = sorted(
+            evento_id for evento_id, destino in destinatarios.items()
+            if destino in (None, usuario_id)
+        )
+        nao_lidas = [e for e in visiveis if not lidas[e].get(usuario_id, True)]
+        marca = nao_lidas[0] - 1 if nao_lidas else maior_id
+        marcas.append({"id": usuario_id, "notificacoes_lidas_ate": marca})
+        recibos.extend(
+            {"evento_id": e, "usuario_id": usuario_id, "lida": True, "excluida": False}
+            for e in visiveis
+            if e > marca and lidas[e].get(usuario_id, True)
+        )
+
+    for inicio in range(0, len(recibos), 1000):
+        db.session.execute(insert(ReciboNotificacao), recibos[inicio:inicio + 1000])
+    if marcas:
+        db.session.execute(update(Usuario), marcas)
+
+    db.session.execute(delete(Notificacao))
+    db.session.commit()
+    print(f"   • {len(eventos)} evento(s) e {len(recibos)} recibo(s) criados")
+
+
+# Etapas executadas em ordem; cada uma deve ser idempotente
+ETAPAS = [
+    criar_colunas_faltantes,
+    criar_indices_faltantes,
+    preencher_campos_busca_clientes,
+    criar_indice_trigram_clientes,
+    preencher_resumo_financeiro,
+    preencher_chave_referencia_notificacoes,
+    migrar_notificacoes_para_eventos,
+]
+
+
+def migrar():
+    app = create_app()
+
+    with app.app_context():
+        print("🔧 Atualizando schema do banco de dados...")
+        for etapa in ETAPAS:
+            print(f"➡️  {etapa.__doc__}")
+            etapa()
+        print("✅ Schema atualizado!")
+
+
+if __name__ == "__main__":
+    migrar()
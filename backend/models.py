@@ -1,6 +1,9 @@
 from datetime import datetime
 
+from sqlalchemy import delete, event, func, insert, inspect, select
+
 from extensions import db
+from texto_utils import normalizar_busca, somente_digitos
 
 
 class TimestampMixin:
@@ -23,13 +26,78 @@ class Cliente(TimestampMixin, db.Model):
     observacoes = db.Column(db.Text)
     status = db.Column(db.String(20), nullable=False, default="ativo", index=True)
 
+    # Colunas derivadas para busca indexada (mantidas pelos eventos abaixo)
+    nome_busca = db.Column(db.String(150), index=True)
+    telefone_digitos = db.Column(db.String(20), index=True)
+    email_busca = db.Column(db.String(120), index=True)  # email em minúsculas
+
     ordens_servico = db.relationship(
         "OrdemServico", back_populates="cliente", cascade="all, delete-orphan"
     )
 
 
+@event.listens_for(Cliente, "before_insert")
+@event.listens_for(Cliente, "before_update")
+def _atualizar_campos_busca_cliente(mapper, connection, cliente):
+    cliente.nome_busca = normalizar_busca(cliente.nome)
+    cliente.telefone_digitos = somente_digitos(cliente.telefone)
+    cliente.email_busca = cliente.email.lower() if cliente.email else None
+
+
+class TermoBuscaCliente(db.Model):
+    """
+    Cada palavra do nome normalizado do cliente, para buscar por prefixo de
+    qualquer parte do nome (ex: sobrenome) usando índice, nos bancos sem
+    índice trigram.
+    """
+
+    __tablename__ = "clientes_termos_busca"
+
+    # A chave primária (termo, cliente_id) é o índice da busca por prefixo
+    termo = db.Column(db.String(150), primary_key=True)
+    cliente_id = db.Column(
+        db.Integer, db.ForeignKey("clientes.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
+def gravar_termos_busca_cliente(connection, cliente_id, nome_busca):
+    """Substitui as palavras de busca do cliente (na conexão informada)."""
+    tabela = TermoBuscaCliente.__table__
+    connection.execute(delete(tabela).where(tabela.c.cliente_id == cliente_id))
+    termos = set((nome_busca or "").split())
+    if termos:
+        connection.execute(
+            insert(tabela), [{"termo": t, "cliente_id": cliente_id} for t in termos]
+        )
+
+
+@event.listens_for(Cliente, "after_insert")
+def _criar_termos_busca_cliente(mapper, connection, cliente):
+    gravar_termos_busca_cliente(connection, cliente.id, cliente.nome_busca)
+
+
+@event.listens_for(Cliente, "after_update")
+def _atualizar_termos_busca_cliente(mapper, connection, cliente):
+    if inspect(cliente).attrs.nome.history.has_changes():
+        gravar_termos_busca_cliente(connection, cliente.id, cliente.nome_busca)
+
+
+@event.listens_for(Cliente, "before_delete")
+def _apagar_termos_busca_cliente(mapper, connection, cliente):
+    # O SQLite não aplica o ON DELETE CASCADE sem PRAGMA foreign_keys
+    tabela = TermoBuscaCliente.__table__
+    connection.execute(delete(tabela).where(tabela.c.cliente_id == cliente.id))
+
+
 class ProdutoEstoque(TimestampMixin, db.Model):
     __tablename__ = "produtos_estoque"
+    __table_args__ = (
+        # Índices para a listagem paginada por keyset (ordenação, id)
+        db.Index("ix_produtos_estoque_nome_id", "nome", "id"),
+        db.Index("ix_produtos_estoque_quantidade_id", "quantidade", "id"),
+        db.Index("ix_produtos_estoque_criado_em_id", "criado_em", "id"),
+        db.Index("ix_produtos_estoque_categoria_nome", "categoria", "nome", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     codigo = db.Column(db.String(20), nullable=False, unique=True)
@@ -40,12 +108,23 @@ class ProdutoEstoque(TimestampMixin, db.Model):
     estoque_minimo = db.Column(db.Integer, nullable=False, default=0)
     preco_custo = db.Column(db.Numeric(10, 2), nullable=False, default=0)
     preco_venda = db.Column(db.Numeric(10, 2), nullable=False, default=0)
-    fornecedor = db.Column(db.String(150))
-    localizacao = db.Column(db.String(100))
+    fornecedor = db.Column(db.String(150), index=True)
+    localizacao = db.Column(db.String(100), index=True)
 
 
 class OrdemServico(TimestampMixin, db.Model):
     __tablename__ = "ordens_servico"
+    __table_args__ = (
+        # Índices para a listagem paginada por keyset (criado_em, id)
+        db.Index("ix_ordens_servico_criado_em_id", "criado_em", "id"),
+        db.Index("ix_ordens_servico_status_criado_em", "status", "criado_em", "id"),
+        db.Index(
+            "ix_ordens_servico_prioridade_criado_em", "prioridade", "criado_em", "id"
+        ),
+        db.Index(
+            "ix_ordens_servico_cliente_criado_em", "cliente_id", "criado_em", "id"
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     numero_os = db.Column(db.String(20), nullable=False, unique=True, index=True)
@@ -79,6 +158,61 @@ class OrdemServico(TimestampMixin, db.Model):
     observacoes = db.Column(db.Text)
 
 
+class ResumoFinanceiroDiario(db.Model):
+    """
+    Receita das OS entregues por dia (data de criação da OS) e tipo de aparelho.
+    Atualizado quando uma OS é entregue; reconstruído por
+    reconstruir_resumo_financeiro.py.
+    """
+
+    __tablename__ = "resumo_financeiro_diario"
+    __table_args__ = (
+        db.UniqueConstraint("data", "tipo_aparelho", name="uq_resumo_financeiro_dia_tipo"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False, index=True)
+    tipo_aparelho = db.Column(db.String(50), nullable=False)
+    receita = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    quantidade_os = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Sequencia(db.Model):
+    """Contadores atômicos (ex: número da OS), reservados por UPDATE."""
+
+    __tablename__ = "sequencias"
+
+    nome = db.Column(db.String(50), primary_key=True)
+    valor = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class TarefaAgendada(db.Model):
+    """Trava (lease) e resultado da última execução das tarefas periódicas."""
+
+    __tablename__ = "tarefas_agendadas"
+
+    nome = db.Column(db.String(50), primary_key=True)
+    bloqueado_ate = db.Column(db.DateTime)
+    bloqueado_por = db.Column(db.String(100))
+    ultima_execucao = db.Column(db.DateTime)
+    ultima_duracao_ms = db.Column(db.Integer)
+    ultimo_resultado = db.Column(db.Integer)  # ex: notificações criadas
+    ultimo_erro = db.Column(db.Text)
+
+
+class TicketStream(db.Model):
+    """
+    Ticket de uso único para abrir um stream SSE (o EventSource do navegador
+    não envia o cabeçalho Authorization). Só o hash do ticket é guardado.
+    """
+
+    __tablename__ = "tickets_stream"
+
+    ticket_hash = db.Column(db.String(64), primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=False)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
+
+
 class Usuario(TimestampMixin, db.Model):
     __tablename__ = "usuarios"
 
@@ -90,6 +224,8 @@ class Usuario(TimestampMixin, db.Model):
     telefone = db.Column(db.String(20))
     email = db.Column(db.String(120), unique=True)
     ativo = db.Column(db.Boolean, default=True)
+    # Eventos de notificação com id até este valor contam como lidos
+    notificacoes_lidas_ate = db.Column(db.Integer, default=0)
 
     # Relacionamento com notificações
     notificacoes = db.relationship(
@@ -98,15 +234,123 @@ class Usuario(TimestampMixin, db.Model):
 
 
 class Notificacao(TimestampMixin, db.Model):
+    """
+    Layout antigo: uma linha por notificação e por usuário. Substituído por
+    EventoNotificacao + ReciboNotificacao; mantido para migrar_banco.py.
+    """
+
     __tablename__ = "notificacoes"
+    __table_args__ = (
+        # Verificação "já existe notificação deste tipo para esta entidade e usuário"
+        db.Index("ix_notificacoes_dedup", "tipo", "chave_referencia", "usuario_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     tipo = db.Column(db.String(50), nullable=False, index=True)  # os_atrasada, estoque_critico, etc.
     titulo = db.Column(db.String(200), nullable=False)
     mensagem = db.Column(db.Text, nullable=False)
     dados_referencia = db.Column(db.JSON)  # Dados para link/ação (ex: {"os_id": 123})
+    chave_referencia = db.Column(db.String(50))  # Entidade referenciada (ex: "os:123")
     lida = db.Column(db.Boolean, default=False, index=True)
     prioridade = db.Column(db.String(20), default="normal")  # baixa, normal, alta, urgente
 
     usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), nullable=False, index=True)
     usuario = db.relationship("Usuario", back_populates="notificacoes")
+
+
+class EventoNotificacao(TimestampMixin, db.Model):
+    """
+    Notificação gravada uma única vez. Sem usuario_id vale para todos os
+    usuários; o estado de cada um fica em ReciboNotificacao e na marca
+    Usuario.notificacoes_lidas_ate.
+    """
+
+    __tablename__ = "eventos_notificacao"
+    __table_args__ = (
+        # Verificação "já existe notificação deste tipo para esta entidade"
+        db.Index("ix_eventos_notificacao_dedup", "tipo", "chave_referencia"),
+        # Seleção dos eventos antigos pela retenção (ordenada por criado_em, id)
+        db.Index("ix_eventos_notificacao_criado_em", "criado_em", "id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # os_atrasada, estoque_critico, etc.
+    titulo = db.Column(db.String(200), nullable=False)
+    mensagem = db.Column(db.Text, nullable=False)
+    dados_referencia = db.Column(db.JSON)  # Dados para link/ação (ex: {"os_id": 123})
+    chave_referencia = db.Column(db.String(50))  # Entidade referenciada (ex: "os:123")
+    prioridade = db.Column(db.String(20), default="normal")  # baixa, normal, alta, urgente
+
+    # Destinatário único (opcional); None = todos os usuários
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), index=True)
+
+
+class ChaveNotificada(db.Model):
+    """
+    (tipo, chave_referencia) de eventos já removidos pela retenção. A
+    verificação automática consulta esta tabela junto com os eventos, para
+    não repetir o alerta de uma condição que continua valendo, e apaga a
+    chave quando a condição deixa de valer (um novo alerta pode surgir).
+    """
+
+    __tablename__ = "chaves_notificadas"
+
+    tipo = db.Column(db.String(50), primary_key=True)
+    chave_referencia = db.Column(db.String(50), primary_key=True)
+    removido_em = db.Column(db.DateTime, nullable=False)
+
+
+class ReciboNotificacao(db.Model):
+    """Estado de um evento para um usuário (só existe se ele leu ou excluiu)."""
+
+    __tablename__ = "recibos_notificacao"
+
+    # A chave primária (usuario_id, evento_id) é o índice composto usado nos
+    # anti-joins da listagem e do contador
+    usuario_id = db.Column(db.Integer, db.ForeignKey("usuarios.id"), primary_key=True)
+    evento_id = db.Column(
+        db.Integer,
+        db.ForeignKey("eventos_notificacao.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    lida = db.Column(db.Boolean, nullable=False, default=False)
+    excluida = db.Column(db.Boolean, nullable=False, default=False)
+
+
+@event.listens_for(Usuario, "before_insert")
+def _iniciar_marca_notificacoes(mapper, connection, usuario):
+    # Usuários novos não recebem o histórico de notificações como não lidas
+    if usuario.notificacoes_lidas_ate is None:
+        usuario.notificacoes_lidas_ate = connection.execute(
+            select(func.coalesce(func.max(EventoNotificacao.id), 0))
+        ).scalar()
+
+
+class TarefaIA(TimestampMixin, db.Model):
+    """Tarefa de IA executada em segundo plano pela fila (fila_ia.py)."""
+
+    __tablename__ = "tarefas_ia"
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # resumo_os
+    status = db.Column(db.String(20), nullable=False, default="pendente", index=True)
+    # pendente, executando, concluida, erro
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    ultimo_erro = db.Column(db.Text)
+    resultado = db.Column(db.Text)
+    # Após uma falha, a tarefa volta a "pendente" e só é assumida a partir daqui
+    proxima_tentativa_em = db.Column(db.DateTime)
+
+    os_id = db.Column(db.Integer, db.ForeignKey("ordens_servico.id", ondelete="CASCADE"), index=True)
+
+
+class RespostaIA(db.Model):
+    """Respostas da IA em cache, pela hash do prompt normalizado (cache_ia.py)."""
+
+    __tablename__ = "respostas_ia"
+
+    chave = db.Column(db.String(64), primary_key=True)  # sha256 do prompt
+    tipo = db.Column(db.String(30), nullable=False)  # resumo, pre_diagnostico
+    resposta = db.Column(db.Text, nullable=False)
+    criado_em = db.Column(db.DateTime, default=datetime.now)
+    expira_em = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, request
+from sqlalchemy import and_, or_
+
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 200
+
+
+def paginacao_solicitada() -> bool:
+    """Indica se a requisição pediu a listagem paginada."""
+    return "limite" in request.args or "cursor" in request.args
+
+
+def obter_limite(padrao: int = LIMITE_PADRAO, maximo: int = LIMITE_MAXIMO) -> int:
+    """Lê o parâmetro `limite` da query string respeitando o máximo permitido."""
+    try:
+        limite = int(request.args.get("limite", padrao))
+    except ValueError:
+        abort(400, description="Parâmetro 'limite' deve ser um número inteiro")
+    return max(1, min(limite, maximo))
+
+
+def obter_data_param(nome: str):
+    """Lê um parâmetro de data (YYYY-MM-DD ou ISO 8601) da query string."""
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    try:
+        return datetime.fromisoformat(valor)
+    except ValueError:
+        abort(400, description=f"Parâmetro '{nome}' deve estar no formato YYYY-MM-DD")
+
+
+def filtro_prefixo(coluna, prefixo: str):
+    """
+    Filtro "começa com" expresso como intervalo, para que qualquer banco
+    consiga usar o índice B-tree da coluna (LIKE 'x%' nem sempre usa).
+    """
+    return and_(coluna >= prefixo, coluna < prefixo + "\uffff")
+
+
+def codificar_cursor(valor, id_registro: int) -> str:
+    """Gera um cursor opaco a partir do valor de ordenação e do id do registro."""
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    bruto = json.dumps([valor, id_registro]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str, coluna):
+    """Decodifica um cursor gerado por `codificar_cursor`."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valor, id_registro = json.loads(bruto)
+        if valor is not None and coluna.type.python_type is datetime:
+            valor = datetime.fromisoformat(valor)
+        return valor, int(id_registro)
+    except (ValueError, TypeError):
+        abort(400, description="Cursor de paginação inválido")
+
+
+def paginar_keyset(query, coluna, coluna_id, limite: int, descendente: bool = True):
+    """
+    Aplica paginação por keyset (coluna, id) a uma query.
+    Retorna os registros da página e o cursor da próxima página (ou None).
+    """
+    cursor = request.args.get("cursor")
+    if cursor:
+        valor, id_registro = decodificar_cursor(cursor, coluna)
+        if descendente:
+            query = query.filter(
+                or_(coluna < valor, and_(coluna == valor, coluna_id < id_registro))
+            )
+        else:
+            query = query.filter(
+                or_(coluna > valor, and_(coluna == valor, coluna_id > id_registro))
+            )
+
+    if descendente:
+        query = query.order_by(coluna.desc(), coluna_id.desc())
+    else:
+        query = query.order_by(coluna.asc(), coluna_id.asc())
+
+    # Busca um registro a mais para saber se existe próxima página
+    registros = query.limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(registros) > limite:
+        registros = registros[:limite]
+        ultimo = registros[-1]
+        proximo_cursor = codificar_cursor(getattr(ultimo, coluna.key), ultimo.id)
+
+    return registros, proximo_cursor
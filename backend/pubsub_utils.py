@@ -0,0 +1,57 @@
+import json
+import queue
+import threading
+
+
+def evento_sse(nome, dados):
+    """Formata um evento no protocolo Server-Sent Events."""
+    return f"event: {nome}\ndata: {json.dumps(dados)}\n\n"
+
+
+class CanalEventos:
+    """
+    Pub/sub em memória para entregar eventos aos streams (SSE) abertos
+    neste processo. Cada assinante recebe uma fila própria e limitada;
+    se ela encher (cliente lento), os eventos excedentes são descartados.
+    """
+
+    def __init__(self, tamanho_fila: int = 100):
+        self.tamanho_fila = tamanho_fila
+        self._assinantes = {}  # chave -> set de filas
+        self._lock = threading.Lock()
+
+    def assinar(self, chave) -> queue.Queue:
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._assinantes.setdefault(chave, set()).add(fila)
+        return fila
+
+    def cancelar(self, chave, fila: queue.Queue):
+        with self._lock:
+            filas = self._assinantes.get(chave)
+            if filas:
+                filas.discard(fila)
+                if not filas:
+                    del self._assinantes[chave]
+
+    def publicar(self, chave, evento):
+        with self._lock:
+            filas = list(self._assinantes.get(chave, ()))
+        self._entregar(filas, evento)
+
+    def publicar_todos(self, evento):
+        with self._lock:
+            filas = [f for filas in self._assinantes.values() for f in filas]
+        self._entregar(filas, evento)
+
+    def total_assinantes(self) -> int:
+        with self._lock:
+            return sum(len(filas) for filas in self._assinantes.values())
+
+    @staticmethod
+    def _entregar(filas, evento):
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                pass
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir o resumo financeiro diário a partir das OS entregues.
+Execute após importar dados antigos ou se o resumo ficar inconsistente.
+"""
+
+from app import create_app
+from routes_financeiro import reconstruir_resumo_diario
+
+
+def reconstruir():
+    """Recalcula a tabela resumo_financeiro_diario."""
+    app = create_app()
+
+    with app.app_context():
+        print("🔄 Reconstruindo resumo financeiro diário...")
+        total = reconstruir_resumo_diario()
+        print(f"✅ Resumo reconstruído: {total} linha(s) (dia x tipo de aparelho)")
+
+
+if __name__ == "__main__":
+    reconstruir()
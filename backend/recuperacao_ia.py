@@ -0,0 +1,188 @@
+import re
+
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque, normalizar_busca, somente_digitos
+from paginacao_utils import filtro_prefixo
+
+
+# Palavras da consulta que não identificam nenhum registro
+PALAVRAS_IGNORADAS = {
+    "qual", "quais", "quanto", "quantos", "quantas", "quem", "onde", "como",
+    "que", "para", "por", "com", "sem", "dos", "das", "nos", "nas", "uma",
+    "uns", "umas", "meu", "minha", "esta", "este", "isso", "tem", "ter",
+    "sao", "foi", "ser", "mais", "menos", "todos", "todas", "lista", "listar",
+    "mostrar", "mostre", "ver", "informacoes", "dados", "sobre", "cliente",
+    "clientes", "produto", "produtos", "estoque", "ordem", "ordens", "servico",
+    "status", "telefone", "email", "endereco", "valor", "preco", "quantidade",
+    "receita", "faturamento", "financeiro", "total", "aparelho",
+}
+
+LIMITE_POR_TIPO = 10
+
+
+def cliente_contexto(c) -> dict:
+    return {
+        "id": c.id,
+        "nome": c.nome,
+        "cpf_cnpj": c.cpf_cnpj,
+        "email": c.email,
+        "telefone": c.telefone,
+        "endereco": c.endereco,
+    }
+
+
+def os_contexto(os) -> dict:
+    return {
+        "id": os.id,
+        "numeroOS": os.numero_os,
+        "clienteId": os.cliente_id,
+        "clienteNome": (os.cliente.nome if os.cliente else "Cliente não informado"),
+        "tipoAparelho": os.tipo_aparelho,
+        "marcaModelo": os.marca_modelo,
+        "problemaRelatado": os.problema_relatado,
+        "status": os.status,
+        "valorOrcamento": float(os.valor_orcamento or 0),
+        "dataCriacao": os.criado_em.isoformat() if os.criado_em else None,
+    }
+
+
+def produto_contexto(p) -> dict:
+    return {
+        "id": p.id,
+        "codigo": p.codigo,
+        "nome": p.nome,
+        "categoria": p.categoria,
+        "quantidade": p.quantidade,
+        "estoqueMinimo": p.estoque_minimo,
+        "precoCusto": float(p.preco_custo or 0),
+        "precoVenda": float(p.preco_venda or 0),
+    }
+
+
+def extrair_entidades(consulta: str) -> dict:
+    """
+    Identifica na consulta o que pode apontar para registros específicos:
+    números de OS, sequências de dígitos (CPF/CNPJ, telefone) e palavras
+    (nomes de clientes, nomes e códigos de produtos).
+    """
+    numeros_os = {
+        f"#OS{int(a or b):04d}"
+        for a, b in re.findall(r"\bos\s*#?\s*(\d+)|#os(\d+)", consulta.lower())
+    }
+    digitos = {
+        somente_digitos(d) for d in re.findall(r"\d[\d.\-/() ]{6,}\d", consulta)
+    }
+    palavras_originais = re.findall(r"[\w\-]+", consulta)
+    palavras = []
+    for palavra in palavras_originais:
+        normalizada = normalizar_busca(palavra)
+        if (
+            len(normalizada) >= 3
+            and normalizada not in PALAVRAS_IGNORADAS
+            and not normalizada.isdigit()
+        ):
+            palavras.append((palavra, normalizada))
+    return {
+        "numeros_os": numeros_os,
+        "digitos": {d for d in digitos if len(d) >= 8},
+        "palavras": palavras,
+    }
+
+
+def _filtro_nome_cliente(palavra: str):
+    if db.engine.dialect.name == "postgresql":
+        return Cliente.nome_busca.contains(palavra, autoescape=True)
+    return filtro_prefixo(Cliente.nome_busca, palavra)
+
+
+def _ordenar_por_relevancia(registros, texto_de, palavras):
+    """Registros que contêm mais palavras da consulta primeiro."""
+    termos = [normalizada for _, normalizada in palavras]
+
+    def pontuacao(registro):
+        texto = texto_de(registro)
+        return sum(1 for t in termos if t in texto)
+
+    return sorted(registros, key=pontuacao, reverse=True)
+
+
+def recuperar_dados_relevantes(consulta: str, limite: int = LIMITE_POR_TIPO) -> dict:
+    """
+    Busca no banco inteiro só os registros citados na consulta, com
+    consultas por colunas indexadas (número da OS, nome normalizado do
+    cliente, CPF/CNPJ, telefone, código e nome do produto) e as OS mais
+    recentes dos clientes encontrados.
+    """
+    entidades = extrair_entidades(consulta)
+    palavras = entidades["palavras"]
+
+    # Clientes
+    filtros_cliente = [_filtro_nome_cliente(n) for _, n in palavras]
+    for digitos in entidades["digitos"]:
+        filtros_cliente.append(filtro_prefixo(Cliente.cpf_cnpj, digitos))
+        filtros_cliente.append(filtro_prefixo(Cliente.telefone_digitos, digitos))
+    clientes = []
+    if filtros_cliente:
+        clientes = _ordenar_por_relevancia(
+            Cliente.query.filter(or_(*filtros_cliente)).limit(limite * 3).all(),
+            lambda c: c.nome_busca or "",
+            palavras,
+        )[:limite]
+
+    # Ordens de serviço: pelo número e as mais recentes dos clientes citados
+    ordens = {}
+    consulta_os = OrdemServico.query.options(joinedload(OrdemServico.cliente))
+    if entidades["numeros_os"]:
+        for os in consulta_os.filter(
+            OrdemServico.numero_os.in_(entidades["numeros_os"])
+        ):
+            ordens[os.id] = os
+    for cliente in clientes[:3]:
+        for os in (
+            consulta_os.filter(OrdemServico.cliente_id == cliente.id)
+            .order_by(OrdemServico.criado_em.desc(), OrdemServico.id.desc())
+            .limit(5)
+        ):
+            ordens.setdefault(os.id, os)
+
+    # Produtos: código exato ou início do nome (como digitado ou capitalizado)
+    produtos = []
+    if palavras:
+        filtros_produto = [ProdutoEstoque.codigo.in_(
+            {p for p, _ in palavras} | {p.upper() for p, _ in palavras}
+        )]
+        for original, _ in palavras:
+            filtros_produto.append(filtro_prefixo(ProdutoEstoque.nome, original))
+            filtros_produto.append(
+                filtro_prefixo(ProdutoEstoque.nome, original.capitalize())
+            )
+        produtos = _ordenar_por_relevancia(
+            ProdutoEstoque.query.filter(or_(*filtros_produto)).limit(limite * 3).all(),
+            lambda p: normalizar_busca(f"{p.codigo} {p.nome}"),
+            palavras,
+        )[:limite]
+
+    return {
+        "clientes": [cliente_contexto(c) for c in clientes],
+        "os": [os_contexto(os) for os in list(ordens.values())[:limite]],
+        "produtos": [produto_contexto(p) for p in produtos],
+    }
+
+
+def combinar_contexto(dados_contexto: dict, relevantes: dict) -> dict:
+    """
+    Cópia dos dados de contexto com os registros recuperados no início de
+    cada lista (sem repetir ids) e em `relevantes`. O dicionário em cache
+    não é alterado.
+    """
+    combinado = dict(dados_contexto, relevantes=relevantes)
+    for tipo in ("clientes", "os", "produtos"):
+        encontrados = relevantes.get(tipo, [])
+        ids = {item["id"] for item in encontrados}
+        combinado[tipo] = encontrados + [
+            item for item in dados_contexto.get(tipo, []) if item["id"] not in ids
+        ]
+    return combinado
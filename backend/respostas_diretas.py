@@ -0,0 +1,233 @@
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque, ResumoFinanceiroDiario
+from recuperacao_ia import extrair_entidades, produto_contexto
+from routes_financeiro import resumo_receitas_diario
+from texto_utils import normalizar_busca
+
+
+# Perguntas estruturadas respondidas direto do banco, sem chamar a IA.
+# As expressões são aplicadas ao texto normalizado (sem acentos).
+_FINANCEIRO = re.compile(
+    r"\b(faturamento|faturamos|faturou|faturei|receitas?|vendemos|ganhamos|arrecadamos)\b"
+)
+# "acabando", "repor" etc. só contam perto de "estoque"/"produto" (até três
+# palavras entre eles): "o cliente quer repor a tela" não é pergunta de estoque
+_FALTA = r"(acabando|em falta|repor|reposicao)"
+_ITEM_ESTOQUE = r"(estoque|produtos?)"
+_ESTOQUE_BAIXO = re.compile(
+    r"\bestoque (baixo|critico|minimo)\b|\babaixo do (estoque )?minimo\b"
+    rf"|\b{_ITEM_ESTOQUE}\b(?:\W+\w+){{0,3}}\W+{_FALTA}\b"
+    rf"|\b{_FALTA}\b(?:\W+\w+){{0,3}}\W+{_ITEM_ESTOQUE}\b"
+)
+_PERGUNTA_OS = re.compile(
+    r"\b(status|situacao|andamento|como esta|como ta|pronta|pronto|valor|orcamento)\b"
+)
+_CONTAGEM = re.compile(
+    r"\bquant[oa]s (clientes|os|ordens|produtos)\b(?: (?:estao |que estao |com status )?"
+    r"(aguardando|em reparo|prontas?|entregues?|canceladas?))?"
+)
+_PERIODOS = [
+    (re.compile(r"\bhoje\b"), "hoje"),
+    (re.compile(r"\bontem\b"), "ontem"),
+    (re.compile(r"\b(esta|essa|nesta|nessa|desta|dessa) semana\b"), "semana"),
+    (re.compile(r"\bmes passado\b"), "mes_passado"),
+    (re.compile(r"\b(este|esse|neste|nesse|deste|desse) mes\b|\bno mes\b"), "mes"),
+    (re.compile(r"\b(este|esse|neste|nesse|deste|desse) ano\b"), "ano"),
+]
+
+# Palavras que não restringem uma pergunta de faturamento. Sobrando qualquer
+# outra ("do cliente joao", "com troca de tela", "do tecnico", "entregues
+# pelo"...), a pergunta tem um filtro que o total da empresa não atende e
+# vai para a IA
+_PALAVRAS_FINANCEIRO_GERAL = frozenset({
+    "qual", "quais", "quanto", "quanta", "quantos", "me", "diga", "mostre",
+    "mostra", "informe", "ver", "saber", "o", "a", "os", "as", "de", "do", "da",
+    "dos", "das", "no", "na", "em", "foi", "foram", "e", "eh", "esta", "ta",
+    "total", "totais", "geral", "nosso", "nossa", "nossos", "nossas", "minha",
+    "meu", "empresa", "loja", "assistencia", "ate", "agora", "valor", "ja",
+    "tivemos", "tive", "temos", "tenho", "ao", "todo", "toda", "periodo",
+    "bruto", "bruta", "acumulado", "acumulada",
+})
+
+STATUS_OS = {
+    "aguardando": "aguardando",
+    "em reparo": "em_reparo",
+    "pronta": "pronto",
+    "prontas": "pronto",
+    "entregue": "entregue",
+    "entregues": "entregue",
+    "cancelada": "cancelado",
+    "canceladas": "cancelado",
+}
+STATUS_LEGIVEL = {
+    "aguardando": "aguardando atendimento",
+    "em_reparo": "em reparo",
+    "pronto": "pronta para retirada",
+    "entregue": "entregue",
+    "cancelado": "cancelada",
+}
+
+LIMITE_OS_DIRETA = 6  # palavras: "status da os 12" sim, perguntas abertas não
+
+
+def _moeda(valor: float) -> str:
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _periodo(texto: str):
+    """(nome, início, fim exclusivo) do período citado, ou None para o total."""
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    for padrao, nome in _PERIODOS:
+        if not padrao.search(texto):
+            continue
+        if nome == "hoje":
+            return "hoje", hoje, hoje + timedelta(days=1)
+        if nome == "ontem":
+            return "ontem", hoje - timedelta(days=1), hoje
+        if nome == "semana":
+            inicio = hoje - timedelta(days=hoje.weekday())
+            return "esta semana", inicio, hoje + timedelta(days=1)
+        inicio_mes = hoje.replace(day=1)
+        if nome == "mes_passado":
+            inicio = (inicio_mes - timedelta(days=1)).replace(day=1)
+            return "no mês passado", inicio, inicio_mes
+        if nome == "mes":
+            return "este mês", inicio_mes, hoje + timedelta(days=1)
+        return "este ano", hoje.replace(month=1, day=1), hoje + timedelta(days=1)
+    return None
+
+
+def _responder_os(texto: str, entidades: dict, dados_contexto: dict):
+    if not entidades["numeros_os"]:
+        return None
+    if not _PERGUNTA_OS.search(texto) and len(texto.split()) > LIMITE_OS_DIRETA:
+        return None
+    numero = sorted(entidades["numeros_os"])[0]
+    os = next((o for o in dados_contexto.get("os", []) if o["numeroOS"] == numero), None)
+    if os is None:
+        return f"Não encontrei a OS {numero}.", {"tipo": "nao_encontrado", "dados": {}}
+    resposta = (
+        f"A OS {numero} de {os['clienteNome']} está "
+        f"{STATUS_LEGIVEL.get(os['status'], os['status'])}. "
+        f"Aparelho: {os['tipoAparelho']} {os['marcaModelo']}. "
+        f"Orçamento: {_moeda(os['valorOrcamento'])}."
+    )
+    return resposta, {"tipo": "os", "dados": os}
+
+
+def _pergunta_financeira_geral(texto: str, entidades: dict) -> bool:
+    """Verdadeiro se a pergunta não cita OS, documento ou outro filtro."""
+    if entidades["numeros_os"] or entidades["digitos"]:
+        return False
+    restante = _FINANCEIRO.sub(" ", texto)
+    for padrao, _ in _PERIODOS:
+        restante = padrao.sub(" ", restante)
+    return all(p in _PALAVRAS_FINANCEIRO_GERAL for p in re.findall(r"\w+", restante))
+
+
+def _responder_financeiro(texto: str, entidades: dict, dados_contexto: dict):
+    if not _FINANCEIRO.search(texto) or not _pergunta_financeira_geral(texto, entidades):
+        return None
+    periodo = _periodo(texto)
+    if periodo is None:
+        # Soma do resumo diário (o contexto em cache pode ser da versão anterior)
+        nome = "no total"
+        receitas, quantidade = db.session.query(
+            func.coalesce(func.sum(ResumoFinanceiroDiario.receita), 0),
+            func.coalesce(func.sum(ResumoFinanceiroDiario.quantidade_os), 0),
+        ).one()
+        receitas, quantidade = float(receitas), int(quantidade)
+    else:
+        nome, inicio, fim = periodo
+        resumo = resumo_receitas_diario(inicio, fim, "dia")
+        receitas, quantidade = resumo["receitas"], resumo["quantidade"]
+    resposta = (
+        f"O faturamento {nome} foi de {_moeda(receitas)}, "
+        f"com {quantidade} OS entregue{'s' if quantidade != 1 else ''}."
+    )
+    return resposta, {
+        "tipo": "financeiro",
+        "dados": {
+            "periodo": nome,
+            "receitas_totais": receitas,
+            "os_entregues": quantidade,
+            "total_os": dados_contexto.get("total_os", 0),
+            "total_clientes": dados_contexto.get("total_clientes", 0),
+        },
+    }
+
+
+def _responder_estoque_baixo(texto: str, dados_contexto: dict):
+    if not _ESTOQUE_BAIXO.search(texto):
+        return None
+    falta = ProdutoEstoque.estoque_minimo - ProdutoEstoque.quantidade
+    abaixo_do_minimo = ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo
+    produtos = (
+        ProdutoEstoque.query.filter(abaixo_do_minimo)
+        .order_by(falta.desc(), ProdutoEstoque.id)
+        .limit(20)
+        .all()
+    )
+    total = db.session.query(func.count(ProdutoEstoque.id)).filter(abaixo_do_minimo).scalar()
+    if not produtos:
+        resposta = "Nenhum produto está abaixo do estoque mínimo."
+    else:
+        lista = ", ".join(
+            f"{p.nome} ({p.quantidade}/{p.estoque_minimo})" for p in produtos[:5]
+        )
+        resposta = f"{total} produto(s) abaixo do estoque mínimo. Os mais críticos: {lista}."
+    return resposta, {
+        "tipo": "produtos",
+        "dados": {
+            "total_produtos": dados_contexto.get("total_produtos", 0),
+            "baixo_estoque": [produto_contexto(p) for p in produtos],
+            "todos_produtos": [],
+        },
+    }
+
+
+def _contar(coluna, *filtros) -> int:
+    return db.session.query(func.count(coluna)).filter(*filtros).scalar() or 0
+
+
+def _responder_contagem(texto: str):
+    # COUNT direto no banco: o contexto em cache pode ser da versão anterior
+    m = _CONTAGEM.search(texto)
+    if not m:
+        return None
+    entidade, status = m.group(1), m.group(2)
+    if entidade == "clientes":
+        return f"Há {_contar(Cliente.id, Cliente.status == 'ativo')} clientes ativos.", None
+    if entidade == "produtos":
+        return f"Há {_contar(ProdutoEstoque.id)} produtos cadastrados.", None
+    if status is None:
+        return f"Há {_contar(OrdemServico.id)} ordens de serviço cadastradas.", None
+    status_os = STATUS_OS[status]
+    quantidade = _contar(OrdemServico.id, OrdemServico.status == status_os)
+    return f"Há {quantidade} OS {STATUS_LEGIVEL[status_os]}.", None
+
+
+def responder_diretamente(consulta: str, dados_contexto: dict):
+    """
+    Responde perguntas estruturadas (status de uma OS, faturamento de um
+    período, estoque baixo, contagens) com consultas indexadas e textos
+    prontos. Retorna (resposta, dados) ou None se a pergunta for aberta.
+    """
+    texto = normalizar_busca(consulta)
+    entidades = extrair_entidades(consulta)
+    for responder in (
+        lambda: _responder_os(texto, entidades, dados_contexto),
+        lambda: _responder_financeiro(texto, entidades, dados_contexto),
+        lambda: _responder_estoque_baixo(texto, dados_contexto),
+        lambda: _responder_contagem(texto),
+    ):
+        resultado = responder()
+        if resultado:
+            resposta, dados = resultado
+            return resposta, dados or {"tipo": "contagem", "dados": {}}
+    return None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Política de retenção das notificações.
+Mantém a tabela eventos_notificacao pequena: eventos antigos vão para um
+arquivo JSONL compactado e saem do banco; eventos já lidos por todos e
+recibos redundantes são apagados. A chave de deduplicação de cada evento
+removido fica em chaves_notificadas. Roda pelo agendador ou manualmente.
+"""
+
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+
+from extensions import db
+from models import ChaveNotificada, EventoNotificacao, ReciboNotificacao, Usuario
+from agendador import manter_trava
+
+
+def _guardar_chaves(ids):
+    """Registra (tipo, chave_referencia) dos eventos antes de apagá-los."""
+    ja_guardada = (
+        select(ChaveNotificada.tipo)
+        .where(
+            ChaveNotificada.tipo == EventoNotificacao.tipo,
+            ChaveNotificada.chave_referencia == EventoNotificacao.chave_referencia,
+        )
+        .exists()
+    )
+    origem = (
+        select(EventoNotificacao.tipo, EventoNotificacao.chave_referencia, literal(datetime.now()))
+        .where(
+            EventoNotificacao.id.in_(ids),
+            EventoNotificacao.chave_referencia.is_not(None),
+            ~ja_guardada,
+        )
+        .distinct()
+    )
+    db.session.execute(
+        insert(ChaveNotificada).from_select(
+            ["tipo", "chave_referencia", "removido_em"], origem
+        )
+    )
+
+
+def _apagar_eventos(ids):
+    # Sem a chave, a verificação automática recriaria o alerta de uma
+    # condição que ainda vale (OS atrasada, estoque crítico...)
+    _guardar_chaves(ids)
+    db.session.execute(delete(ReciboNotificacao).where(ReciboNotificacao.evento_id.in_(ids)))
+    db.session.execute(delete(EventoNotificacao).where(EventoNotificacao.id.in_(ids)))
+
+
+def arquivar_eventos_antigos(limite: datetime, diretorio: str, tamanho_lote: int) -> int:
+    """Grava em JSONL.gz e remove os eventos criados antes de `limite`."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"notificacoes-{datetime.now():%Y-%m}.jsonl.gz")
+
+    total = 0
+    while True:
+        manter_trava()
+        lote = (
+            EventoNotificacao.query.filter(EventoNotificacao.criado_em < limite)
+            .order_by(EventoNotificacao.criado_em, EventoNotificacao.id)
+            .limit(tamanho_lote)
+            .all()
+        )
+        if not lote:
+            break
+        ids = [e.id for e in lote]
+
+        recibos = {}
+        for recibo in ReciboNotificacao.query.filter(ReciboNotificacao.evento_id.in_(ids)):
+            recibos.setdefault(recibo.evento_id, []).append(
+                {"usuario_id": recibo.usuario_id, "lida": recibo.lida, "excluida": recibo.excluida}
+            )
+
+        # Grava antes de apagar: uma falha no meio repete o lote no arquivo,
+        # mas nunca perde eventos
+        with gzip.open(caminho, "at", encoding="utf-8") as arquivo:
+            for evento in lote:
+                arquivo.write(json.dumps({
+                    "id": evento.id,
+                    "tipo": evento.tipo,
+                    "titulo": evento.titulo,
+                    "mensagem": evento.mensagem,
+                    "dados_referencia": evento.dados_referencia,
+                    "chave_referencia": evento.chave_referencia,
+                    "prioridade": evento.prioridade,
+                    "usuario_id": evento.usuario_id,
+                    "criado_em": evento.criado_em.isoformat() if evento.criado_em else None,
+                    "recibos": recibos.get(evento.id, []),
+                }, ensure_ascii=False) + "\n")
+
+        _apagar_eventos(ids)
+        db.session.commit()
+        total += len(ids)
+
+    return total
+
+
+def apagar_eventos_lidos(limite: datetime, tamanho_lote: int) -> int:
+    """
+    Apaga, sem arquivar, os eventos criados antes de `limite` que todos os
+    usuários ativos já marcaram como lidos (id abaixo da menor marca).
+    """
+    marca_minima = db.session.query(
+        func.min(func.coalesce(Usuario.notificacoes_lidas_ate, 0))
+    ).filter(Usuario.ativo.is_(True)).scalar() or 0
+
+    total = 0
+    while True:
+        manter_trava()
+        ids = [
+            id_ for (id_,) in db.session.query(EventoNotificacao.id)
+            .filter(
+                EventoNotificacao.id <= marca_minima,
+                EventoNotificacao.criado_em < limite,
+            )
+            .order_by(EventoNotificacao.id)
+            .limit(tamanho_lote)
+        ]
+        if not ids:
+            break
+        _apagar_eventos(ids)
+        db.session.commit()
+        total += len(ids)
+
+    return total
+
+
+def apagar_recibos_redundantes() -> int:
+    """Remove recibos de leitura já cobertos pela marca do usuário."""
+    marca = (
+        select(Usuario.notificacoes_lidas_ate)
+        .where(Usuario.id == ReciboNotificacao.usuario_id)
+        .scalar_subquery()
+    )
+    resultado = db.session.execute(
+        delete(ReciboNotificacao).where(
+            # Recibos de exclusão continuam necessários para esconder o evento
+            ReciboNotificacao.excluida.is_(False),
+            ReciboNotificacao.evento_id <= marca,
+        )
+    )
+    db.session.commit()
+    return max(resultado.rowcount or 0, 0)
+
+
+def aplicar_retencao_notificacoes() -> int:
+    """
+    Aplica a política configurada (NOTIFICACOES_ARQUIVAR_DIAS,
+    NOTIFICACOES_LIDAS_DIAS, NOTIFICACOES_ARQUIVO_DIR) em lotes.
+    Retorna o total de eventos removidos da tabela.
+    """
+    config = current_app.config
+    agora = datetime.now()
+    tamanho_lote = config.get("NOTIFICACOES_RETENCAO_LOTE", 500)
+
+    arquivados = arquivar_eventos_antigos(
+        agora - timedelta(days=config.get("NOTIFICACOES_ARQUIVAR_DIAS", 90)),
+        config.get("NOTIFICACOES_ARQUIVO_DIR"),
+        tamanho_lote,
+    )
+    apagados = apagar_eventos_lidos(
+        agora - timedelta(days=config.get("NOTIFICACOES_LIDAS_DIAS", 30)),
+        tamanho_lote,
+    )
+    recibos = apagar_recibos_redundantes()
+
+    print(
+        f"🧹 Retenção de notificações: {arquivados} arquivada(s), "
+        f"{apagados} lida(s) apagada(s), {recibos} recibo(s) compactado(s)"
+    )
+    return arquivados + apagados
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        aplicar_retencao_notificacoes()
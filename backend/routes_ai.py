@@ -1,11 +1,35 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import func
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
 
-from ai_utils import gerar_pre_diagnostico, gerar_resumo, interpretar_consulta_ia
+from ai_utils import (
+    chamar_mistral_stream,
+    finalizar_consulta_ia,
+    gerar_em_stream,
+    gerar_pre_diagnostico,
+    gerar_resumo,
+    get_cached_resultado_ia,
+    interpretar_consulta_ia,
+    preparar_consulta_ia,
+    prompt_pre_diagnostico,
+    prompt_resumo,
+    set_cached_resultado_ia,
+)
 from auth_utils import login_required
-from models import Cliente, OrdemServico, ProdutoEstoque, Usuario, Notificacao
+from models import Cliente, OrdemServico, ProdutoEstoque, Usuario, Notificacao, TarefaIA
 from extensions import db
+from contexto_ia import obter_contexto, obter_indice_entidades
+from indice_entidades import montar_indice
+from pubsub_utils import evento_sse
+from recuperacao_ia import (
+    cliente_contexto,
+    combinar_contexto,
+    os_contexto,
+    produto_contexto,
+    recuperar_dados_relevantes,
+)
+from versao_dados import versao_dados
 
 bp = Blueprint("ai", __name__)
 
@@ -44,6 +68,70 @@ def gerar_resumo_api():
         )
 
 
+@bp.post("/resumo/stream")
+@login_required
+def gerar_resumo_stream_api():
+    """
+    Como /resumo, mas envia o texto em eventos SSE à medida que a IA o
+    gera: `token` com cada trecho, `fim` com a resposta completa (mesmos
+    campos de /resumo) ou `erro`.
+    """
+    data = request.get_json() or {}
+
+    problema = data.get("problema", "").strip()
+    if not problema:
+        return (
+            jsonify(
+                {
+                    "erro": "Campo obrigatório",
+                    "mensagem": "O campo 'problema' é obrigatório",
+                }
+            ),
+            400,
+        )
+
+    def gerar():
+        trechos = []
+        try:
+            for trecho in gerar_em_stream("resumo", [problema], prompt_resumo(problema)):
+                trechos.append(trecho)
+                yield evento_sse("token", {"texto": trecho})
+            yield evento_sse(
+                "fim", {"resumo": "".join(trechos).strip(), "problema_original": problema}
+            )
+        except Exception as e:
+            print(f"Erro na geração de resumo (stream): {e}")
+            yield evento_sse(
+                "erro",
+                {
+                    "erro": "Erro na geração de resumo",
+                    "mensagem": "Não foi possível gerar o resumo. Tente novamente.",
+                },
+            )
+
+    return resposta_sse(gerar())
+
+
+@bp.get("/tarefas/<int:tarefa_id>")
+@login_required
+def status_tarefa_ia(tarefa_id: int):
+    """Situação de uma tarefa de IA em segundo plano (ex: resumo da OS)."""
+    tarefa = TarefaIA.query.get_or_404(tarefa_id)
+    return jsonify(
+        {
+            "id": tarefa.id,
+            "tipo": tarefa.tipo,
+            "status": tarefa.status,
+            "tentativas": tarefa.tentativas,
+            "osId": tarefa.os_id,
+            "resultado": tarefa.resultado,
+            "erro": tarefa.ultimo_erro,
+            "dataCriacao": tarefa.criado_em.isoformat() if tarefa.criado_em else None,
+            "dataAtualizacao": tarefa.atualizado_em.isoformat() if tarefa.atualizado_em else None,
+        }
+    )
+
+
 @bp.post("/diagnostico")
 @login_required
 def gerar_diagnostico_api():
@@ -88,6 +176,59 @@ def gerar_diagnostico_api():
         )
 
 
+@bp.post("/diagnostico/stream")
+@login_required
+def gerar_diagnostico_stream_api():
+    """Como /diagnostico, em eventos SSE (ver gerar_resumo_stream_api)."""
+    data = request.get_json() or {}
+
+    tipo_aparelho = data.get("tipoAparelho", "").strip()
+    marca_modelo = data.get("marcaModelo", "").strip()
+    problema = data.get("problema", "").strip()
+
+    if not all([tipo_aparelho, marca_modelo, problema]):
+        return (
+            jsonify(
+                {
+                    "erro": "Campos obrigatórios",
+                    "mensagem": "Os campos 'tipoAparelho', 'marcaModelo' e 'problema' são obrigatórios",
+                }
+            ),
+            400,
+        )
+
+    def gerar():
+        trechos = []
+        try:
+            for trecho in gerar_em_stream(
+                "pre_diagnostico",
+                [tipo_aparelho, marca_modelo, problema],
+                prompt_pre_diagnostico(tipo_aparelho, marca_modelo, problema),
+            ):
+                trechos.append(trecho)
+                yield evento_sse("token", {"texto": trecho})
+            yield evento_sse(
+                "fim",
+                {
+                    "diagnostico": "".join(trechos).strip(),
+                    "tipoAparelho": tipo_aparelho,
+                    "marcaModelo": marca_modelo,
+                    "problema": problema,
+                },
+            )
+        except Exception as e:
+            print(f"Erro na geração de diagnóstico (stream): {e}")
+            yield evento_sse(
+                "erro",
+                {
+                    "erro": "Erro na geração de diagnóstico",
+                    "mensagem": "Não foi possível gerar o pré-diagnóstico. Tente novamente.",
+                },
+            )
+
+    return resposta_sse(gerar())
+
+
 @bp.post("/consulta")
 @login_required
 def consulta_ia_api():
@@ -111,62 +252,19 @@ def consulta_ia_api():
         )
 
     try:
-        # Coletar dados de contexto do sistema
-        dados_contexto = coletar_dados_contexto()
-
-        # Interpretar consulta usando IA (com suporte a estado conversacional)
-        # Tentar usar cache de resultado da IA primeiro
-        from ai_utils import (
-            get_cached_resultado_ia,
-            set_cached_resultado_ia,
-            interpretar_consulta_ia,
-        )
-        import hashlib
-
-        consulta_hash = None
-        if (
-            not estado_conversacional
-        ):  # Só cache para consultas normais, não conversacionais
-            consulta_hash = hashlib.md5(consulta.lower().encode()).hexdigest()
-            cached_result = get_cached_resultado_ia(consulta_hash)
-            if cached_result:
-                print("🤖 Usando resposta em cache da IA")
-                resultado = cached_result
-            else:
-                print("🤖 Consultando IA (não em cache)")
-                resultado = interpretar_consulta_ia(
-                    consulta, dados_contexto, estado_conversacional
-                )
-                # Cache apenas respostas bem-sucedidas
-                if (
-                    resultado.get("resposta")
-                    and not resultado.get("dados", {}).get("tipo") == "nao_encontrado"
-                ):
-                    set_cached_resultado_ia(consulta_hash, resultado)
+        versao, resultado = buscar_resultado_em_cache(consulta, estado_conversacional)
+        if resultado:
+            print("🤖 Usando resposta em cache da IA")
         else:
+            versao_servida, dados_contexto = coletar_contexto_consulta(consulta)
+
+            # Interpretar consulta usando IA (com suporte a estado conversacional)
             resultado = interpretar_consulta_ia(
                 consulta, dados_contexto, estado_conversacional
             )
+            guardar_resultado_em_cache(consulta, versao, versao_servida, resultado)
 
-        # Se há uma ação para executar (como criar cliente), executa
-        if resultado.get("acao"):
-            acao = resultado["acao"]
-            if acao["tipo"] == "criar_cliente":
-                # Criar cliente via API
-                try:
-                    from routes_clientes import criar_cliente_interno
-
-                    # Simular request para criar cliente
-                    cliente_criado = criar_cliente_interno(acao["dados"])
-                    resultado["dados"]["cliente_criado"] = cliente_criado
-
-                except Exception as e:
-                    print(f"Erro ao criar cliente via IA: {e}")
-                    resultado["resposta"] = (
-                        "Cliente não pôde ser cadastrado devido a um erro técnico."
-                    )
-                    resultado["dados"] = {}
-
+        executar_acao_consulta(resultado)
         return jsonify(resultado)
 
     except Exception as e:
@@ -185,97 +283,270 @@ def consulta_ia_api():
         )
 
 
-def coletar_dados_contexto() -> dict:
+@bp.post("/consulta/stream")
+@login_required
+def consulta_ia_stream_api():
     """
-    Coleta dados de contexto de todas as tabelas para fornecer à IA.
-    Usa cache em memória para reduzir consultas ao banco.
+    Como /consulta, em eventos SSE: perguntas abertas enviam o texto da IA
+    em eventos `token` à medida que é gerado; todas terminam com `fim`
+    (o mesmo resultado de /consulta) ou `erro`.
     """
-    try:
-        # Tentar usar cache primeiro
-        from ai_utils import get_cached_dados_contexto, set_cached_dados_contexto
-
-        cached_data = get_cached_dados_contexto()
-        if cached_data:
-            print("📊 Usando dados de contexto em cache")
-            return cached_data
-
-        print("📊 Carregando dados de contexto do banco")
-        # Buscar clientes
-        clientes = Cliente.query.filter_by(status="ativo").limit(50).all()
-        clientes_data = []
-        for c in clientes:
-            clientes_data.append(
+    data = request.get_json() or {}
+
+    consulta = data.get("consulta", "").strip()
+    estado_conversacional = data.get("estado_conversacional")
+
+    if not consulta:
+        return (
+            jsonify(
                 {
-                    "id": c.id,
-                    "nome": c.nome,
-                    "cpf_cnpj": c.cpf_cnpj,
-                    "email": c.email,
-                    "telefone": c.telefone,
-                    "endereco": c.endereco,
+                    "erro": "Campo obrigatório",
+                    "mensagem": "O campo 'consulta' é obrigatório",
                 }
-            )
-
-        # Buscar OS com clientes
-        os_data = []
-        ordens = (
-            OrdemServico.query.options(joinedload(OrdemServico.cliente))
-            .limit(100)
-            .all()
+            ),
+            400,
         )
-        for os in ordens:
-            os_dict = {
-                "id": os.id,
-                "numeroOS": os.numero_os,
-                "clienteId": os.cliente_id,
-                "clienteNome": (
-                    os.cliente.nome if os.cliente else "Cliente não informado"
-                ),
-                "tipoAparelho": os.tipo_aparelho,
-                "marcaModelo": os.marca_modelo,
-                "problemaRelatado": os.problema_relatado,
-                "status": os.status,
-                "valorOrcamento": float(os.valor_orcamento or 0),
-                "dataCriacao": os.criado_em.isoformat() if os.criado_em else None,
-            }
-            os_data.append(os_dict)
 
-        # Buscar produtos
-        produtos = ProdutoEstoque.query.limit(100).all()
-        produtos_data = []
-        for p in produtos:
-            produtos_data.append(
+    def gerar():
+        try:
+            versao, resultado = buscar_resultado_em_cache(consulta, estado_conversacional)
+            if resultado:
+                print("🤖 Usando resposta em cache da IA")
+            else:
+                versao_servida, dados_contexto = coletar_contexto_consulta(consulta)
+                resultado, prompt = preparar_consulta_ia(
+                    consulta, dados_contexto, estado_conversacional
+                )
+                if resultado is None:
+                    db.session.rollback()  # não segura a conexão durante a geração
+                    trechos = []
+                    for trecho in chamar_mistral_stream(prompt):
+                        trechos.append(trecho)
+                        yield evento_sse("token", {"texto": trecho})
+                    resultado = finalizar_consulta_ia(
+                        consulta, dados_contexto, "".join(trechos).strip()
+                    )
+                guardar_resultado_em_cache(consulta, versao, versao_servida, resultado)
+
+            executar_acao_consulta(resultado)
+            yield evento_sse("fim", resultado)
+
+        except Exception as e:
+            print(f"Erro na consulta IA (stream): {e}")
+            yield evento_sse(
+                "erro",
                 {
-                    "id": p.id,
-                    "codigo": p.codigo,
-                    "nome": p.nome,
-                    "categoria": p.categoria,
-                    "quantidade": p.quantidade,
-                    "estoqueMinimo": p.estoque_minimo,
-                    "precoCusto": float(p.preco_custo or 0),
-                    "precoVenda": float(p.preco_venda or 0),
-                }
+                    "erro": "Erro na consulta IA",
+                    "mensagem": "Não foi possível processar sua consulta. Tente novamente.",
+                    "resposta": "Desculpe, houve um erro ao processar sua consulta.",
+                    "consulta": consulta,
+                    "estado_conversacional": estado_conversacional,
+                },
             )
 
-        # Calcular métricas financeiras
-        os_entregues = [os for os in ordens if os.status == "entregue"]
-        receitas_totais = sum(float(os.valor_orcamento or 0) for os in os_entregues)
-
-        dados_contexto = {
-            "clientes": clientes_data,
-            "total_clientes": len(clientes_data),
-            "os": os_data,
-            "total_os": len(os_data),
-            "produtos": produtos_data,
-            "total_produtos": len(produtos_data),
-            "receitas_totais": receitas_totais,
-            "os_entregues": len(os_entregues),
-        }
+    return resposta_sse(gerar())
+
 
-        # Salvar no cache
-        set_cached_dados_contexto(dados_contexto)
+def resposta_sse(gerador) -> Response:
+    """Resposta em Server-Sent Events, sem buffer em proxies (nginx)."""
+    return Response(
+        stream_with_context(gerador),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        return dados_contexto
 
+def buscar_resultado_em_cache(consulta: str, estado_conversacional: dict) -> tuple:
+    """
+    (versao, resultado em cache ou None). Só há cache para consultas
+    normais, não conversacionais (versao None). A versão é lida antes dos
+    dados; guardar_resultado_em_cache só grava se o contexto servido for
+    dessa mesma versão, para nunca guardar resposta de dados antigos sob
+    uma versão nova.
+    """
+    versao = None if estado_conversacional else versao_dados()
+    resultado = get_cached_resultado_ia(consulta, versao) if versao is not None else None
+    return versao, resultado
+
+
+def guardar_resultado_em_cache(consulta: str, versao, versao_servida, resultado: dict):
+    # Cache apenas respostas bem-sucedidas e sem ação a executar
+    # (repetir a resposta em cache não pode cadastrar de novo), montadas
+    # com o contexto da versão lida (não com a cópia anterior, servida
+    # enquanto a nova é montada)
+    if (
+        versao is not None
+        and versao_servida == versao
+        and resultado.get("resposta")
+        and not resultado.get("acao")
+        and not resultado.get("dados", {}).get("tipo") == "nao_encontrado"
+    ):
+        set_cached_resultado_ia(consulta, versao, resultado)
+
+
+def coletar_contexto_consulta(consulta: str) -> tuple:
+    """
+    (versao_servida, dados) com os dados de contexto do sistema e os
+    registros citados na consulta (buscados no banco inteiro), com os
+    índices de entidades. `versao_servida` é a versão mais antiga entre o
+    contexto e os índices (None se algum falhou).
+    """
+    versao_contexto, contexto = coletar_dados_contexto()
+    versao_indices, indices = coletar_indices_entidades()
+    dados_contexto = combinar_contexto(contexto, recuperar_dados_relevantes(consulta))
+    dados_contexto["indices"] = indices
+
+    versoes = (versao_contexto, versao_indices)
+    versao_servida = None if None in versoes else min(versoes)
+    return versao_servida, dados_contexto
+
+
+def executar_acao_consulta(resultado: dict):
+    """Se há uma ação para executar (como criar cliente), executa."""
+    if not resultado.get("acao"):
+        return
+    acao = resultado["acao"]
+    if acao["tipo"] == "criar_cliente":
+        # Criar cliente via API
+        try:
+            from routes_clientes import criar_cliente_interno
+
+            # Simular request para criar cliente
+            cliente_criado = criar_cliente_interno(acao["dados"])
+            resultado["dados"]["cliente_criado"] = cliente_criado
+
+        except Exception as e:
+            print(f"Erro ao criar cliente via IA: {e}")
+            resultado["resposta"] = (
+                "Cliente não pôde ser cadastrado devido a um erro técnico."
+            )
+            resultado["dados"] = {}
+
+
+def coletar_dados_contexto() -> tuple:
+    """
+    (versao, dados de contexto de todas as tabelas para fornecer à IA), em
+    cache por versão dos dados (alterações em clientes, OS ou produtos geram
+    uma nova versão, montada em segundo plano e compartilhada entre os
+    workers).
+    """
+    try:
+        return obter_contexto(montar_dados_contexto)
     except Exception as e:
         print(f"Erro ao coletar dados de contexto: {e}")
-        return {}
+        return None, {}
+
+
+def coletar_indices_entidades() -> dict:
+    """
+    Índices invertidos de clientes, produtos e OS do banco inteiro, usados
+    para identificar a entidade citada na consulta, com a versão servida.
+    Montados uma vez por versão dos dados (em segundo plano, como os dados
+    de contexto).
+    """
+    try:
+        return obter_indice_entidades(montar_indices_entidades)
+    except Exception as e:
+        print(f"Erro ao montar índice de entidades: {e}")
+        return None, {}
+
+
+def montar_indices_entidades() -> dict:
+    """Lê só as colunas de identificação de todos os registros, em lotes."""
+    clientes = (
+        {"id": id_, "nome": nome, "telefone": telefone}
+        for id_, nome, telefone in db.session.query(
+            Cliente.id, Cliente.nome, Cliente.telefone
+        )
+        .filter(Cliente.status == "ativo")
+        .yield_per(1000)
+    )
+    produtos = (
+        {"id": id_, "codigo": codigo, "nome": nome, "quantidade": quantidade}
+        for id_, codigo, nome, quantidade in db.session.query(
+            ProdutoEstoque.id,
+            ProdutoEstoque.codigo,
+            ProdutoEstoque.nome,
+            ProdutoEstoque.quantidade,
+        ).yield_per(1000)
+    )
+    ordens = (
+        {
+            "id": id_,
+            "numeroOS": numero_os,
+            "clienteId": cliente_id,
+            "clienteNome": cliente_nome or "Cliente não informado",
+            "status": status,
+        }
+        for id_, numero_os, cliente_id, cliente_nome, status in db.session.query(
+            OrdemServico.id,
+            OrdemServico.numero_os,
+            OrdemServico.cliente_id,
+            Cliente.nome,
+            OrdemServico.status,
+        )
+        .outerjoin(Cliente, Cliente.id == OrdemServico.cliente_id)
+        .yield_per(1000)
+    )
+    return {
+        "cliente": montar_indice(clientes, ("nome",)),
+        "produto": montar_indice(produtos, ("nome", "codigo"), campo_codigo="codigo"),
+        "os": montar_indice(ordens, ("clienteNome", "numeroOS")),
+    }
+
+
+def montar_dados_contexto() -> dict:
+    """
+    Monta os dados de contexto a partir do banco: uma amostra recente de
+    clientes, OS e produtos e os totais do banco inteiro. Registros fora
+    da amostra chegam à IA pela recuperação por consulta (recuperacao_ia).
+    """
+    clientes = (
+        Cliente.query.filter_by(status="ativo")
+        .order_by(Cliente.criado_em.desc(), Cliente.id.desc())
+        .limit(50)
+        .all()
+    )
+    ordens = (
+        OrdemServico.query.options(joinedload(OrdemServico.cliente))
+        .order_by(OrdemServico.criado_em.desc(), OrdemServico.id.desc())
+        .limit(100)
+        .all()
+    )
+    produtos = (
+        ProdutoEstoque.query.order_by(ProdutoEstoque.nome, ProdutoEstoque.id)
+        .limit(100)
+        .all()
+    )
+
+    # Totais e métricas financeiras calculados no banco
+    total_clientes = (
+        db.session.query(func.count(Cliente.id)).filter(Cliente.status == "ativo").scalar()
+    )
+    total_os = db.session.query(func.count(OrdemServico.id)).scalar()
+    total_produtos = db.session.query(func.count(ProdutoEstoque.id)).scalar()
+    receitas_totais, os_entregues = (
+        db.session.query(
+            func.coalesce(func.sum(OrdemServico.valor_orcamento), 0),
+            func.count(OrdemServico.id),
+        )
+        .filter(OrdemServico.status == "entregue")
+        .one()
+    )
+    produtos_baixo_estoque = (
+        db.session.query(func.count(ProdutoEstoque.id))
+        .filter(ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo)
+        .scalar()
+    )
+
+    return {
+        "clientes": [cliente_contexto(c) for c in clientes],
+        "total_clientes": total_clientes,
+        "os": [os_contexto(os) for os in ordens],
+        "total_os": total_os,
+        "produtos": [produto_contexto(p) for p in produtos],
+        "total_produtos": total_produtos,
+        "produtos_baixo_estoque": produtos_baixo_estoque,
+        "receitas_totais": float(receitas_totais or 0),
+        "os_entregues": os_entregues,
+    }
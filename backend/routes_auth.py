@@ -3,7 +3,11 @@ from werkzeug.security import generate_password_hash
 
 from extensions import db
 from models import Usuario
-from auth_utils import autenticar_usuario, gerar_token_jwt, login_required
+from auth_utils import (
+    autenticar_usuario,
+    gerar_token_jwt,
+    login_required,
+)
 
 bp = Blueprint("auth", __name__)
 
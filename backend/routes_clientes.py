@@ -1,10 +1,19 @@
 from flask import Blueprint, jsonify, request, abort
+from sqlalchemy import and_, case, func, or_, select
 from sqlalchemy.exc import IntegrityError
 
 from extensions import db
-from models import Cliente, Usuario
+from models import Cliente, TermoBuscaCliente, normalizar_busca, somente_digitos
 from auth_utils import login_required, get_usuario_atual
+from paginacao_utils import (
+    filtro_prefixo,
+    obter_limite,
+    paginacao_solicitada,
+    paginar_keyset,
+)
 from routes_notificacoes import criar_notificacao_cliente_novo
+from routes_dashboard import invalidar_cache_dashboard
+from routes_financeiro import registrar_os_entregue
 
 bp = Blueprint("clientes", __name__)
 
@@ -59,17 +68,13 @@ def criar_cliente_interno(dados_cliente: dict) -> dict:
 
     try:
         db.session.add(cliente)
-        db.session.commit()
+        db.session.flush()  # gera o id usado na notificação
+
+        # Um único evento para todos os usuários, enviado aos streams após o commit
+        criar_notificacao_cliente_novo(cliente)
 
-        # Criar notificações para todos os usuários após cadastrar cliente
-        try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_cliente_novo(cliente, usuario.id)
-            db.session.commit()
-        except Exception as e:
-            print(f"Aviso: Não foi possível criar notificações para novo cliente: {e}")
-            db.session.rollback()  # Não afetar o cadastro do cliente
+        db.session.commit()
+        invalidar_cache_dashboard()
 
         return cliente_to_dict(cliente)
 
@@ -81,11 +86,96 @@ def criar_cliente_interno(dados_cliente: dict) -> dict:
         raise
 
 
+def filtro_busca_clientes(termo: str):
+    """
+    Monta o filtro do parâmetro `q` usando apenas colunas indexadas:
+    dígitos buscam por prefixo de CPF/CNPJ e telefone, termos com "@" por
+    prefixo do email em minúsculas e o restante pelo nome normalizado
+    (trecho via índice trigram no PostgreSQL; nos demais bancos, cada
+    palavra do termo por prefixo de alguma palavra do nome).
+    """
+    if "@" in termo:
+        return filtro_prefixo(Cliente.email_busca, termo.lower())
+
+    digitos = somente_digitos(termo)
+    if digitos and not any(c.isalpha() for c in termo):
+        return or_(
+            filtro_prefixo(Cliente.cpf_cnpj, digitos),
+            filtro_prefixo(Cliente.telefone_digitos, digitos),
+        )
+
+    nome = normalizar_busca(termo)
+    if db.engine.dialect.name == "postgresql":
+        return Cliente.nome_busca.contains(nome, autoescape=True)
+    return and_(
+        *(
+            Cliente.id.in_(
+                select(TermoBuscaCliente.cliente_id).where(
+                    filtro_prefixo(TermoBuscaCliente.termo, palavra)
+                )
+            )
+            for palavra in nome.split()
+        )
+    )
+
+
 @bp.get("/")
 @login_required
 def listar_clientes():
-    clientes = Cliente.query.order_by(Cliente.criado_em.desc()).all()
-    return jsonify([cliente_to_dict(c) for c in clientes])
+    """
+    Lista os clientes, do mais recente para o mais antigo.
+
+    Filtros opcionais: q (nome, CPF/CNPJ, telefone ou email), status e
+    tipoPessoa. Quando `limite` ou `cursor` são informados a resposta é
+    paginada por keyset (criado_em, id) e inclui `proximoCursor`.
+    """
+    query = Cliente.query
+
+    termo = (request.args.get("q") or "").strip()
+    if termo:
+        query = query.filter(filtro_busca_clientes(termo))
+
+    status = request.args.get("status")
+    if status:
+        query = query.filter(Cliente.status == status)
+
+    tipo_pessoa = request.args.get("tipoPessoa")
+    if tipo_pessoa:
+        query = query.filter(Cliente.tipo_pessoa == tipo_pessoa)
+
+    if not paginacao_solicitada():
+        clientes = query.order_by(Cliente.criado_em.desc(), Cliente.id.desc()).all()
+        return jsonify([cliente_to_dict(c) for c in clientes])
+
+    clientes, proximo_cursor = paginar_keyset(
+        query, Cliente.criado_em, Cliente.id, obter_limite()
+    )
+    return jsonify(
+        {
+            "itens": [cliente_to_dict(c) for c in clientes],
+            "proximoCursor": proximo_cursor,
+        }
+    )
+
+
+@bp.get("/estatisticas")
+@login_required
+def estatisticas_clientes():
+    """Contagens dos cards da página de clientes, calculadas no banco."""
+    total, ativos, com_email, sem_telefone = db.session.query(
+        func.count(Cliente.id),
+        func.count(case((Cliente.status != "inativo", 1))),
+        func.count(case((func.coalesce(Cliente.email, "") != "", 1))),
+        func.count(case((func.coalesce(Cliente.telefone, "") == "", 1))),
+    ).one()
+    return jsonify(
+        {
+            "total": total,
+            "ativos": ativos,
+            "comEmail": com_email,
+            "semTelefone": sem_telefone,
+        }
+    )
 
 
 @bp.post("/")
@@ -131,17 +221,13 @@ def criar_cliente():
 
     try:
         db.session.add(cliente)
-        db.session.commit()
+        db.session.flush()  # gera o id usado na notificação
 
-        # Criar notificações para todos os usuários após cadastrar cliente
-        try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_cliente_novo(cliente, usuario.id)
-            db.session.commit()
-        except Exception as e:
-            print(f"Aviso: Não foi possível criar notificações para novo cliente: {e}")
-            db.session.rollback()  # Não afetar o cadastro do cliente
+        # Um único evento para todos os usuários, enviado aos streams após o commit
+        criar_notificacao_cliente_novo(cliente)
+
+        db.session.commit()
+        invalidar_cache_dashboard()
 
     except IntegrityError as e:
         db.session.rollback()
@@ -193,8 +279,16 @@ def deletar_cliente(cliente_id: int):
         )
 
     try:
+        # As OS do cliente são apagadas em cascata: as entregues saem do
+        # resumo financeiro diário na mesma transação
+        for os_entregue in OrdemServico.query.filter_by(
+            cliente_id=cliente_id, status="entregue"
+        ):
+            registrar_os_entregue(os_entregue, sinal=-1)
+
         db.session.delete(cliente)
         db.session.commit()
+        invalidar_cache_dashboard()
     except IntegrityError as e:
         db.session.rollback()
         raise
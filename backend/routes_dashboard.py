@@ -0,0 +1,81 @@
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import func
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque, ResumoFinanceiroDiario
+from auth_utils import login_required
+from cache_utils import CacheTTL
+from db_utils import expr_prazo_vencido
+from paginacao_utils import obter_data_param
+
+bp = Blueprint("dashboard", __name__)
+
+# Cache por processo; as rotas de escrita chamam invalidar_cache_dashboard()
+# e os demais workers se atualizam pelo TTL curto.
+_cache_resumo = CacheTTL(ttl=30, max_itens=32)
+
+
+def invalidar_cache_dashboard():
+    """Descarta os KPIs em cache após alterações em OS, clientes ou estoque."""
+    _cache_resumo.invalidar()
+
+
+def calcular_resumo_dashboard(inicio: datetime) -> dict:
+    agora = datetime.now()
+
+    por_status = dict(
+        db.session.query(OrdemServico.status, func.count(OrdemServico.id))
+        .group_by(OrdemServico.status)
+        .all()
+    )
+
+    os_atrasadas = OrdemServico.query.filter(
+        OrdemServico.status.in_(["aguardando", "em_reparo"]),
+        expr_prazo_vencido(agora),
+    ).count()
+
+    estoque_critico = ProdutoEstoque.query.filter(
+        ProdutoEstoque.quantidade <= ProdutoEstoque.estoque_minimo
+    ).count()
+
+    clientes_novos = Cliente.query.filter(Cliente.criado_em >= inicio).count()
+
+    receita, os_entregues = db.session.query(
+        func.coalesce(func.sum(ResumoFinanceiroDiario.receita), 0),
+        func.coalesce(func.sum(ResumoFinanceiroDiario.quantidade_os), 0),
+    ).filter(ResumoFinanceiroDiario.data >= inicio.date()).one()
+
+    return {
+        "periodoInicio": inicio.date().isoformat(),
+        "osPorStatus": por_status,
+        "totalOS": sum(por_status.values()),
+        "osAtrasadas": os_atrasadas,
+        "estoqueCritico": estoque_critico,
+        "clientesNovos": clientes_novos,
+        "receita": float(receita or 0),
+        "osEntregues": int(os_entregues or 0),
+        "geradoEm": agora.isoformat(),
+    }
+
+
+@bp.get("/resumo")
+@login_required
+def resumo_dashboard():
+    """
+    KPIs do dashboard em uma única chamada: OS por status, OS atrasadas,
+    itens com estoque crítico, clientes novos e receita desde `inicio`
+    (YYYY-MM-DD, padrão início do mês atual).
+    """
+    hoje = datetime.now()
+    inicio = obter_data_param("inicio") or datetime(hoje.year, hoje.month, 1)
+
+    ttl = current_app.config.get("DASHBOARD_CACHE_TTL", 30)
+    chave = inicio.date().isoformat()
+    resumo = _cache_resumo.get(chave)
+    if resumo is None:
+        resumo = calcular_resumo_dashboard(inicio)
+        _cache_resumo.set(chave, resumo, ttl=ttl)
+
+    return jsonify(resumo)
@@ -1,8 +1,11 @@
 from flask import Blueprint, jsonify, request, abort
+from sqlalchemy import and_, case, func, or_
 
 from extensions import db
 from models import ProdutoEstoque
 from auth_utils import login_required
+from routes_dashboard import invalidar_cache_dashboard
+from paginacao_utils import obter_limite, paginacao_solicitada, paginar_keyset
 
 bp = Blueprint("estoque", __name__)
 
@@ -25,11 +28,123 @@ def produto_to_dict(produto: ProdutoEstoque) -> dict:
     }
 
 
+# Campos aceitos em `ordenarPor` -> (coluna, descendente por padrão)
+ORDENACOES_PRODUTOS = {
+    "nome": (ProdutoEstoque.nome, False),
+    "quantidade": (ProdutoEstoque.quantidade, False),
+    "dataCadastro": (ProdutoEstoque.criado_em, True),
+}
+
+
+def _filtros_situacao():
+    """
+    Condição SQL de cada situação de estoque, com as mesmas faixas de
+    calcularStatusEstoque (js/estoque.js); "baixo" é até 1,5x o mínimo.
+    """
+    quantidade = ProdutoEstoque.quantidade
+    minimo = ProdutoEstoque.estoque_minimo
+    return {
+        "sem_estoque": quantidade <= 0,
+        "critico": and_(quantidade > 0, quantidade <= minimo),
+        "baixo": and_(quantidade > minimo, quantidade * 2 <= minimo * 3),
+        "ok": and_(quantidade > 0, quantidade * 2 > minimo * 3),
+    }
+
+
 @bp.get("/")
 @login_required
 def listar_produtos():
-    produtos = ProdutoEstoque.query.order_by(ProdutoEstoque.criado_em.desc()).all()
-    return jsonify([produto_to_dict(p) for p in produtos])
+    """
+    Lista os produtos do estoque.
+
+    Filtros opcionais: categoria, fornecedor, localizacao, critico=true
+    (quantidade <= estoque mínimo), situacao (ok, baixo, critico ou
+    sem_estoque) e q (trecho do nome ou início do código). Ordenação via `ordenarPor` (nome,
+    quantidade ou dataCadastro) e `ordem` (asc/desc). Quando `limite` ou
+    `cursor` são informados a resposta é paginada por keyset e inclui
+    `proximoCursor`.
+    """
+    query = ProdutoEstoque.query
+
+    for campo_api, coluna in [
+        ("categoria", ProdutoEstoque.categoria),
+        ("fornecedor", ProdutoEstoque.fornecedor),
+        ("localizacao", ProdutoEstoque.localizacao),
+    ]:
+        valor = request.args.get(campo_api)
+        if valor:
+            query = query.filter(coluna == valor)
+
+    if request.args.get("critico", "").lower() in ("true", "1"):
+        query = query.filter(ProdutoEstoque.quantidade <= ProdutoEstoque.estoque_minimo)
+
+    situacao = request.args.get("situacao")
+    if situacao:
+        filtros_situacao = _filtros_situacao()
+        if situacao not in filtros_situacao:
+            abort(
+                400,
+                description="Parâmetro 'situacao' deve ser ok, baixo, critico ou sem_estoque",
+            )
+        query = query.filter(filtros_situacao[situacao])
+
+    termo = request.args.get("q", "").strip()
+    if termo:
+        query = query.filter(
+            or_(
+                ProdutoEstoque.nome.ilike(f"%{termo}%"),
+                ProdutoEstoque.codigo.ilike(f"{termo}%"),
+            )
+        )
+
+    ordenar_por = request.args.get("ordenarPor", "dataCadastro")
+    if ordenar_por not in ORDENACOES_PRODUTOS:
+        abort(
+            400,
+            description="Parâmetro 'ordenarPor' deve ser nome, quantidade ou dataCadastro",
+        )
+    coluna_ordem, descendente = ORDENACOES_PRODUTOS[ordenar_por]
+    ordem = request.args.get("ordem")
+    if ordem:
+        descendente = ordem.lower() == "desc"
+
+    if not paginacao_solicitada():
+        if descendente:
+            query = query.order_by(coluna_ordem.desc(), ProdutoEstoque.id.desc())
+        else:
+            query = query.order_by(coluna_ordem.asc(), ProdutoEstoque.id.asc())
+        return jsonify([produto_to_dict(p) for p in query.all()])
+
+    produtos, proximo_cursor = paginar_keyset(
+        query, coluna_ordem, ProdutoEstoque.id, obter_limite(), descendente
+    )
+    return jsonify(
+        {
+            "itens": [produto_to_dict(p) for p in produtos],
+            "proximoCursor": proximo_cursor,
+        }
+    )
+
+
+@bp.get("/estatisticas")
+@login_required
+def estatisticas_estoque():
+    """Totais dos cards da página de estoque, calculados no banco."""
+    filtros_situacao = _filtros_situacao()
+    total, valor_total, baixo, critico = db.session.query(
+        func.count(ProdutoEstoque.id),
+        func.coalesce(func.sum(ProdutoEstoque.quantidade * ProdutoEstoque.preco_custo), 0),
+        func.count(case((filtros_situacao["baixo"], 1))),
+        func.count(case((filtros_situacao["critico"], 1))),
+    ).one()
+    return jsonify(
+        {
+            "total": total,
+            "valorTotal": float(valor_total or 0),
+            "estoqueBaixo": baixo,
+            "estoqueCritico": critico,
+        }
+    )
 
 
 @bp.post("/")
@@ -60,6 +175,7 @@ def criar_produto():
 
     db.session.add(produto)
     db.session.commit()
+    invalidar_cache_dashboard()
 
     return jsonify(produto_to_dict(produto)), 201
 
@@ -104,6 +220,7 @@ def atualizar_produto(produto_id: int):
         produto.localizacao = (data.get("localizacao") or "").strip() or None
 
     db.session.commit()
+    invalidar_cache_dashboard()
 
     return jsonify(produto_to_dict(produto))
 
@@ -114,4 +231,5 @@ def deletar_produto(produto_id: int):
     produto = ProdutoEstoque.query.get_or_404(produto_id)
     db.session.delete(produto)
     db.session.commit()
+    invalidar_cache_dashboard()
     return "", 204
@@ -0,0 +1,324 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, jsonify, request
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque, ResumoFinanceiroDiario
+from auth_utils import login_required
+from paginacao_utils import obter_data_param
+
+bp = Blueprint("financeiro", __name__)
+
+AGRUPAMENTOS = ("dia", "semana", "mes")
+
+
+def obter_periodo():
+    """Lê inicio/fim da query string (padrão: mês atual). O fim é inclusivo."""
+    hoje = datetime.now()
+    inicio = obter_data_param("inicio") or datetime(hoje.year, hoje.month, 1)
+    fim = obter_data_param("fim")
+    if fim is None:
+        proximo_mes = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+        fim = proximo_mes - timedelta(days=1)
+    if fim < inicio:
+        abort(400, description="A data 'fim' deve ser posterior à data 'inicio'")
+    # Considera o dia final inteiro
+    fim_exclusivo = datetime(fim.year, fim.month, fim.day) + timedelta(days=1)
+    return inicio, fim_exclusivo
+
+
+def chave_agrupamento(dia: str, agrupamento: str) -> str:
+    """Converte uma data YYYY-MM-DD na chave do agrupamento pedido."""
+    if agrupamento == "mes":
+        return dia[:7]
+    if agrupamento == "semana":
+        data = datetime.strptime(dia, "%Y-%m-%d")
+        return (data - timedelta(days=data.weekday())).strftime("%Y-%m-%d")
+    return dia
+
+
+def registrar_os_entregue(os_obj: OrdemServico, sinal: int = 1):
+    """
+    Soma a OS recém-entregue ao resumo diário, na transação atual da sessão
+    (o commit da alteração de status grava as duas coisas juntas). Com
+    `sinal=-1` subtrai a OS (ex: excluída junto com o cliente).
+    """
+    data = (os_obj.criado_em or datetime.now()).date()
+    tipo = os_obj.tipo_aparelho
+    valor = (os_obj.valor_orcamento or 0) * sinal
+
+    def incrementar():
+        return db.session.execute(
+            update(ResumoFinanceiroDiario)
+            .where(
+                ResumoFinanceiroDiario.data == data,
+                ResumoFinanceiroDiario.tipo_aparelho == tipo,
+            )
+            .values(
+                receita=ResumoFinanceiroDiario.receita + valor,
+                quantidade_os=ResumoFinanceiroDiario.quantidade_os + sinal,
+            )
+        ).rowcount
+
+    if incrementar():
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                insert(ResumoFinanceiroDiario).values(
+                    data=data, tipo_aparelho=tipo, receita=valor, quantidade_os=sinal
+                )
+            )
+    except IntegrityError:
+        # Outra requisição criou a linha do dia ao mesmo tempo
+        incrementar()
+
+
+def reconstruir_resumo_diario() -> int:
+    """Recalcula todo o resumo diário a partir das OS entregues."""
+    dia = func.date(OrdemServico.criado_em)
+    agregado = (
+        select(
+            dia,
+            OrdemServico.tipo_aparelho,
+            func.coalesce(func.sum(OrdemServico.valor_orcamento), 0),
+            func.count(OrdemServico.id),
+        )
+        .where(OrdemServico.status == "entregue")
+        .group_by(dia, OrdemServico.tipo_aparelho)
+    )
+
+    db.session.execute(delete(ResumoFinanceiroDiario))
+    db.session.execute(
+        insert(ResumoFinanceiroDiario).from_select(
+            ["data", "tipo_aparelho", "receita", "quantidade_os"], agregado
+        )
+    )
+    db.session.commit()
+    return ResumoFinanceiroDiario.query.count()
+
+
+def resumo_receitas_diario(inicio: datetime, fim: datetime, agrupamento: str) -> dict:
+    """Totais, série e receita por tipo de aparelho lidos do resumo diário."""
+    no_periodo = (
+        ResumoFinanceiroDiario.data >= inicio.date(),
+        ResumoFinanceiroDiario.data < fim.date(),
+    )
+
+    serie = {}
+    receitas, quantidade = 0.0, 0
+    for data_dia, receita_dia, quantidade_dia in (
+        db.session.query(
+            ResumoFinanceiroDiario.data,
+            func.sum(ResumoFinanceiroDiario.receita),
+            func.sum(ResumoFinanceiroDiario.quantidade_os),
+        )
+        .filter(*no_periodo)
+        .group_by(ResumoFinanceiroDiario.data)
+        .order_by(ResumoFinanceiroDiario.data)
+    ):
+        chave = chave_agrupamento(str(data_dia)[:10], agrupamento)
+        ponto = serie.setdefault(chave, {"periodo": chave, "receitas": 0.0, "os": 0})
+        ponto["receitas"] += float(receita_dia or 0)
+        ponto["os"] += int(quantidade_dia or 0)
+        receitas += float(receita_dia or 0)
+        quantidade += int(quantidade_dia or 0)
+
+    por_tipo = [
+        {
+            "tipoAparelho": tipo,
+            "receitas": float(receita or 0),
+            "os": int(qtd or 0),
+            "ticketMedio": float(receita or 0) / qtd if qtd else 0,
+        }
+        for tipo, receita, qtd in (
+            db.session.query(
+                ResumoFinanceiroDiario.tipo_aparelho,
+                func.sum(ResumoFinanceiroDiario.receita),
+                func.sum(ResumoFinanceiroDiario.quantidade_os),
+            )
+            .filter(*no_periodo)
+            .group_by(ResumoFinanceiroDiario.tipo_aparelho)
+            .order_by(func.sum(ResumoFinanceiroDiario.receita).desc())
+        )
+    ]
+
+    return {
+        "receitas": receitas,
+        "quantidade": quantidade,
+        "serie": list(serie.values()),
+        "porTipoAparelho": por_tipo,
+    }
+
+
+def custos_reposicao() -> dict:
+    """Custo estimado para repor os produtos abaixo do estoque mínimo."""
+    falta = ProdutoEstoque.estoque_minimo - ProdutoEstoque.quantidade
+    abaixo_minimo = ProdutoEstoque.query.filter(
+        ProdutoEstoque.quantidade < ProdutoEstoque.estoque_minimo
+    )
+
+    total = abaixo_minimo.with_entities(
+        func.coalesce(func.sum(falta * ProdutoEstoque.preco_custo), 0)
+    ).scalar()
+
+    produtos = (
+        abaixo_minimo.with_entities(
+            ProdutoEstoque.nome,
+            ProdutoEstoque.categoria,
+            falta.label("falta"),
+            ProdutoEstoque.preco_custo,
+        )
+        .order_by((falta * ProdutoEstoque.preco_custo).desc())
+        .limit(100)
+        .all()
+    )
+
+    return {
+        "total": float(total or 0),
+        "produtos": [
+            {
+                "nome": p.nome,
+                "categoria": p.categoria,
+                "quantidadeNecessaria": int(p.falta),
+                "custoUnitario": float(p.preco_custo or 0),
+                "custoTotal": float(p.falta * (p.preco_custo or 0)),
+            }
+            for p in produtos
+        ],
+    }
+
+
+def receitas_por_status(receita_filtro, agrupamento: str):
+    """Totais, série e receita por tipo de aparelho agregados direto das OS."""
+    valor = func.coalesce(OrdemServico.valor_orcamento, 0)
+
+    receitas, quantidade = (
+        db.session.query(func.coalesce(func.sum(valor), 0), func.count(OrdemServico.id))
+        .filter(*receita_filtro)
+        .one()
+    )
+
+    # Série temporal: agrega por dia no banco e agrupa semana/mês aqui
+    dia = func.date(OrdemServico.criado_em)
+    serie = {}
+    for data_dia, receita_dia, quantidade_dia in (
+        db.session.query(dia, func.sum(valor), func.count(OrdemServico.id))
+        .filter(*receita_filtro)
+        .group_by(dia)
+        .order_by(dia)
+    ):
+        chave = chave_agrupamento(str(data_dia)[:10], agrupamento)
+        ponto = serie.setdefault(chave, {"periodo": chave, "receitas": 0.0, "os": 0})
+        ponto["receitas"] += float(receita_dia or 0)
+        ponto["os"] += quantidade_dia
+
+    por_tipo = [
+        {
+            "tipoAparelho": tipo,
+            "receitas": float(receita or 0),
+            "os": qtd,
+            "ticketMedio": float(receita or 0) / qtd if qtd else 0,
+        }
+        for tipo, receita, qtd in (
+            db.session.query(
+                OrdemServico.tipo_aparelho, func.sum(valor), func.count(OrdemServico.id)
+            )
+            .filter(*receita_filtro)
+            .group_by(OrdemServico.tipo_aparelho)
+            .order_by(func.sum(valor).desc())
+        )
+    ]
+
+    return float(receitas or 0), quantidade, list(serie.values()), por_tipo
+
+
+@bp.get("/resumo")
+@login_required
+def resumo_financeiro():
+    """
+    Resumo financeiro do período calculado no banco (agregações com GROUP BY).
+
+    Parâmetros: inicio e fim (YYYY-MM-DD, padrão mês atual), agrupamento
+    (dia, semana ou mes) para a série temporal, status (lista separada por
+    vírgula, padrão "entregue") das OS que contam como receita e
+    limiteDetalhe para a lista de OS que compõem a receita.
+    """
+    inicio, fim = obter_periodo()
+
+    agrupamento = request.args.get("agrupamento", "dia")
+    if agrupamento not in AGRUPAMENTOS:
+        abort(400, description="Parâmetro 'agrupamento' deve ser dia, semana ou mes")
+
+    status_receita = (request.args.get("status") or "entregue").split(",")
+    limite_detalhe = max(1, min(request.args.get("limiteDetalhe", 500, type=int), 5000))
+
+    no_periodo = (OrdemServico.criado_em >= inicio, OrdemServico.criado_em < fim)
+    receita_filtro = (*no_periodo, OrdemServico.status.in_(status_receita))
+
+    if status_receita == ["entregue"]:
+        # Caso padrão: lê do resumo diário (poucas linhas por dia)
+        diario = resumo_receitas_diario(inicio, fim, agrupamento)
+        receitas, quantidade = diario["receitas"], diario["quantidade"]
+        serie, por_tipo = diario["serie"], diario["porTipoAparelho"]
+    else:
+        receitas, quantidade, serie, por_tipo = receitas_por_status(
+            receita_filtro, agrupamento
+        )
+
+    # Contagem de OS do período por status
+    por_status = dict(
+        db.session.query(OrdemServico.status, func.count(OrdemServico.id))
+        .filter(*no_periodo)
+        .group_by(OrdemServico.status)
+        .all()
+    )
+
+    # OS que compõem a receita (para a tabela e exportação)
+    detalhe = (
+        db.session.query(
+            OrdemServico.numero_os,
+            Cliente.nome,
+            OrdemServico.criado_em,
+            OrdemServico.valor_orcamento,
+        )
+        .outerjoin(Cliente, Cliente.id == OrdemServico.cliente_id)
+        .filter(*receita_filtro)
+        .order_by(OrdemServico.criado_em.desc())
+        .limit(limite_detalhe)
+        .all()
+    )
+
+    custos = custos_reposicao()
+    lucro = receitas - custos["total"]
+
+    return jsonify(
+        {
+            "periodo": {
+                "inicio": inicio.date().isoformat(),
+                "fim": (fim - timedelta(days=1)).date().isoformat(),
+                "agrupamento": agrupamento,
+            },
+            "receitas": receitas,
+            "custos": custos["total"],
+            "lucro": lucro,
+            "margem": (lucro / receitas * 100) if receitas > 0 else 0,
+            "osConcluidas": quantidade,
+            "ticketMedio": receitas / quantidade if quantidade else 0,
+            "porStatus": por_status,
+            "serie": serie,
+            "porTipoAparelho": por_tipo,
+            "receitasDetalhe": [
+                {
+                    "numeroOS": numero_os,
+                    "clienteNome": cliente_nome,
+                    "dataCriacao": criado_em.isoformat() if criado_em else None,
+                    "valorOrcamento": float(valor_orcamento or 0),
+                }
+                for numero_os, cliente_nome, criado_em, valor_orcamento in detalhe
+            ],
+            "custosDetalhe": custos["produtos"],
+        }
+    )
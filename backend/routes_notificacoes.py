@@ -1,38 +1,232 @@
-from flask import Blueprint, request, jsonify, g
-from sqlalchemy import desc
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request, jsonify, g, stream_with_context
+from sqlalchemy import String, delete, event, func, insert, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from extensions import db
-from models import Notificacao, Usuario, OrdemServico, ProdutoEstoque, Cliente
-from auth_utils import login_required
+from models import (
+    ChaveNotificada,
+    Cliente,
+    EventoNotificacao,
+    OrdemServico,
+    ProdutoEstoque,
+    ReciboNotificacao,
+    Usuario,
+)
+from auth_utils import (
+    TICKET_STREAM_VALIDADE_SEGUNDOS,
+    consumir_ticket_stream,
+    gerar_ticket_stream,
+    login_required,
+)
+from db_utils import expr_prazo_vencido, json_objeto_sql, texto_sql
+from pubsub_utils import CanalEventos, evento_sse
 
 bp = Blueprint('notificacoes', __name__)
 
+# Streams SSE abertos neste processo, por usuário
+canal_notificacoes = CanalEventos()
+
+LIMITE_LISTAGEM = 50
+
+# Streams SSE abertos neste processo. Cada um ocupa uma thread do worker
+# enquanto durar: acima de NOTIFICACOES_STREAM_MAX o cliente recebe 503 e
+# usa o polling, para sobrarem threads para as demais rotas da API
+_streams_abertos = 0
+_streams_lock = threading.Lock()
+
+
+def _reservar_stream() -> bool:
+    global _streams_abertos
+    with _streams_lock:
+        if _streams_abertos >= current_app.config.get("NOTIFICACOES_STREAM_MAX", 16):
+            return False
+        _streams_abertos += 1
+        return True
+
+
+def _liberar_stream():
+    global _streams_abertos
+    with _streams_lock:
+        _streams_abertos -= 1
+
+
+def _resposta_streams_esgotados():
+    espera = current_app.config.get("NOTIFICACOES_STREAM_RETRY", 60)
+    resposta = jsonify(
+        {
+            "erro": "Limite de conexões",
+            "mensagem": "Muitos streams abertos; tente novamente mais tarde",
+            "retry": espera,
+        }
+    )
+    resposta.status_code = 503
+    resposta.headers["Retry-After"] = str(espera)
+    return resposta
+
+
+def evento_to_dict(evento, lida=False):
+    return {
+        "id": evento.id,
+        "tipo": evento.tipo,
+        "titulo": evento.titulo,
+        "mensagem": evento.mensagem,
+        "dados_referencia": evento.dados_referencia,
+        "lida": lida,
+        "prioridade": evento.prioridade,
+        "criado_em": evento.criado_em.isoformat() if evento.criado_em else None
+    }
+
+
+# ================================
+# CONSULTAS POR USUÁRIO
+# ================================
+# Um evento está lido para o usuário se o id é menor ou igual à sua marca
+# (notificacoes_lidas_ate) ou se existe recibo com lida=True; recibos com
+# excluida=True escondem o evento. Sem recibo e acima da marca = não lido.
+
+def marca_lidas(usuario_id):
+    return db.session.query(
+        func.coalesce(Usuario.notificacoes_lidas_ate, 0)
+    ).filter(Usuario.id == usuario_id).scalar() or 0
+
+
+def visivel_para(usuario_id):
+    # Escrito com COALESCE (e não "IS NULL OR =") para o banco percorrer a
+    # chave primária em ordem e parar no LIMIT, em vez de juntar dois
+    # índices e ordenar todo o histórico (ver benchmark_notificacoes.py)
+    return func.coalesce(EventoNotificacao.usuario_id, usuario_id) == usuario_id
+
+
+def existe_recibo(usuario_id, *condicoes):
+    return (
+        select(ReciboNotificacao.evento_id)
+        .where(
+            ReciboNotificacao.usuario_id == usuario_id,
+            ReciboNotificacao.evento_id == EventoNotificacao.id,
+            *condicoes,
+        )
+        .exists()
+    )
+
+
+def filtro_nao_lidas(usuario_id, marca):
+    return (
+        EventoNotificacao.id > marca,
+        visivel_para(usuario_id),
+        ~existe_recibo(
+            usuario_id,
+            or_(ReciboNotificacao.lida.is_(True), ReciboNotificacao.excluida.is_(True)),
+        ),
+    )
+
+
+def filtro_lidas(usuario_id, marca):
+    return (
+        visivel_para(usuario_id),
+        or_(
+            EventoNotificacao.id <= marca,
+            existe_recibo(usuario_id, ReciboNotificacao.lida.is_(True)),
+        ),
+        ~existe_recibo(usuario_id, ReciboNotificacao.excluida.is_(True)),
+    )
+
+
+def contar_nao_lidas(usuario_id):
+    """Número de notificações não lidas do usuário."""
+    marca = marca_lidas(usuario_id)
+    return EventoNotificacao.query.filter(*filtro_nao_lidas(usuario_id, marca)).count()
+
+
+def gravar_recibo(evento_id, usuario_id, **valores):
+    """Cria ou atualiza o recibo do usuário para o evento (na sessão atual)."""
+    def atualizar():
+        return db.session.execute(
+            update(ReciboNotificacao)
+            .where(
+                ReciboNotificacao.evento_id == evento_id,
+                ReciboNotificacao.usuario_id == usuario_id,
+            )
+            .values(**valores)
+        ).rowcount
+
+    if atualizar():
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(
+                insert(ReciboNotificacao).values(
+                    evento_id=evento_id, usuario_id=usuario_id, **valores
+                )
+            )
+    except IntegrityError:
+        # Outra requisição do mesmo usuário criou o recibo ao mesmo tempo
+        atualizar()
+
+
+def buscar_evento_do_usuario(evento_id, usuario_id):
+    return EventoNotificacao.query.filter(
+        EventoNotificacao.id == evento_id,
+        visivel_para(usuario_id),
+    ).first()
+
+
+# Publica as notificações criadas pelo ORM só depois do commit,
+# para o stream nunca anunciar algo que sofreu rollback
+@event.listens_for(Session, "after_flush")
+def _coletar_notificacoes_novas(session, flush_context):
+    novas = [obj for obj in session.new if isinstance(obj, EventoNotificacao)]
+    if novas:
+        session.info.setdefault("notificacoes_novas", []).extend(
+            (n.usuario_id, evento_to_dict(n)) for n in novas
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _publicar_notificacoes_novas(session):
+    for usuario_id, dados in session.info.pop("notificacoes_novas", []):
+        if usuario_id is None:
+            canal_notificacoes.publicar_todos({"notificacao": dados})
+        else:
+            canal_notificacoes.publicar(usuario_id, {"notificacao": dados})
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_notificacoes_novas(session):
+    session.info.pop("notificacoes_novas", None)
+
 
 @bp.get('/api/notificacoes')
 @login_required
 def listar_notificacoes():
     """Lista notificações do usuário logado."""
     try:
+        marca = marca_lidas(g.usuario_id)
+
         # Busca notificações não lidas primeiro, depois as lidas
-        notificacoes = Notificacao.query.filter_by(usuario_id=g.usuario_id)\
-            .order_by(Notificacao.lida.asc(), desc(Notificacao.criado_em))\
-            .limit(50)\
+        nao_lidas = EventoNotificacao.query\
+            .filter(*filtro_nao_lidas(g.usuario_id, marca))\
+            .order_by(EventoNotificacao.id.desc())\
+            .limit(LIMITE_LISTAGEM)\
             .all()
 
-        resultado = []
-        for notif in notificacoes:
-            resultado.append({
-                "id": notif.id,
-                "tipo": notif.tipo,
-                "titulo": notif.titulo,
-                "mensagem": notif.mensagem,
-                "dados_referencia": notif.dados_referencia,
-                "lida": notif.lida,
-                "prioridade": notif.prioridade,
-                "criado_em": notif.criado_em.isoformat() if notif.criado_em else None
-            })
-
-        return jsonify(resultado)
+        lidas = []
+        if len(nao_lidas) < LIMITE_LISTAGEM:
+            lidas = EventoNotificacao.query\
+                .filter(*filtro_lidas(g.usuario_id, marca))\
+                .order_by(EventoNotificacao.id.desc())\
+                .limit(LIMITE_LISTAGEM - len(nao_lidas))\
+                .all()
+
+        return jsonify(
+            [evento_to_dict(e, lida=False) for e in nao_lidas]
+            + [evento_to_dict(e, lida=True) for e in lidas]
+        )
 
     except Exception as e:
         print(f"Erro ao listar notificações: {e}")
@@ -44,15 +238,10 @@ def listar_notificacoes():
 def marcar_como_lida(notificacao_id):
     """Marca uma notificação como lida."""
     try:
-        notificacao = Notificacao.query.filter_by(
-            id=notificacao_id,
-            usuario_id=g.usuario_id
-        ).first()
-
-        if not notificacao:
+        if not buscar_evento_do_usuario(notificacao_id, g.usuario_id):
             return jsonify({"erro": "Notificação não encontrada"}), 404
 
-        notificacao.lida = True
+        gravar_recibo(notificacao_id, g.usuario_id, lida=True)
         db.session.commit()
 
         return jsonify({"sucesso": True})
@@ -66,17 +255,54 @@ def marcar_como_lida(notificacao_id):
 @bp.put('/api/notificacoes/marcar-todas-lidas')
 @login_required
 def marcar_todas_lidas():
-    """Marca todas as notificações do usuário como lidas."""
+    """
+    Marca como lidas as notificações não lidas do usuário até `ateId` (o
+    maior id que o cliente listou). Grava recibos em vez de avançar a marca:
+    um evento com id menor gravado por uma transação que ainda não terminou
+    ficaria abaixo da marca e nunca seria visto como não lido.
+    """
     try:
-        Notificacao.query.filter_by(
-            usuario_id=g.usuario_id,
-            lida=False
-        ).update({"lida": True})
+        data = request.get_json(silent=True) or {}
+        usuario_id = g.usuario_id
+        marca = marca_lidas(usuario_id)
+
+        filtros = [*filtro_nao_lidas(usuario_id, marca)]
+        faixa_recibos = [ReciboNotificacao.evento_id > marca]
+        if data.get("ateId") is not None:
+            ate_id = int(data["ateId"])
+            filtros.append(EventoNotificacao.id <= ate_id)
+            faixa_recibos.append(ReciboNotificacao.evento_id <= ate_id)
+
+        # Recibos existentes (nem lidos nem excluídos) e, em um único
+        # INSERT ... SELECT, os que faltam
+        db.session.execute(
+            update(ReciboNotificacao)
+            .where(
+                ReciboNotificacao.usuario_id == usuario_id,
+                ReciboNotificacao.lida.is_(False),
+                ReciboNotificacao.excluida.is_(False),
+                *faixa_recibos,
+            )
+            .values(lida=True)
+        )
+        origem = select(
+            literal(usuario_id),
+            EventoNotificacao.id,
+            literal(True),
+            literal(False),
+        ).where(*filtros, ~existe_recibo(usuario_id))
+        db.session.execute(
+            insert(ReciboNotificacao).from_select(
+                ["usuario_id", "evento_id", "lida", "excluida"], origem
+            )
+        )
 
         db.session.commit()
 
         return jsonify({"sucesso": True})
 
+    except (TypeError, ValueError):
+        return jsonify({"erro": "Parâmetro inválido", "mensagem": "ateId deve ser um número"}), 400
     except Exception as e:
         db.session.rollback()
         print(f"Erro ao marcar todas notificações como lidas: {e}")
@@ -86,17 +312,12 @@ def marcar_todas_lidas():
 @bp.delete('/api/notificacoes/<int:notificacao_id>')
 @login_required
 def excluir_notificacao(notificacao_id):
-    """Exclui uma notificação."""
+    """Exclui (esconde) uma notificação para o usuário logado."""
     try:
-        notificacao = Notificacao.query.filter_by(
-            id=notificacao_id,
-            usuario_id=g.usuario_id
-        ).first()
-
-        if not notificacao:
+        if not buscar_evento_do_usuario(notificacao_id, g.usuario_id):
             return jsonify({"erro": "Notificação não encontrada"}), 404
 
-        db.session.delete(notificacao)
+        gravar_recibo(notificacao_id, g.usuario_id, excluida=True)
         db.session.commit()
 
         return jsonify({"sucesso": True})
@@ -112,201 +333,344 @@ def excluir_notificacao(notificacao_id):
 def contador_notificacoes():
     """Retorna o número de notificações não lidas."""
     try:
-        contador = Notificacao.query.filter_by(
-            usuario_id=g.usuario_id,
-            lida=False
-        ).count()
-
-        return jsonify({"nao_lidas": contador})
+        return jsonify({"nao_lidas": contar_nao_lidas(g.usuario_id)})
 
     except Exception as e:
         print(f"Erro ao contar notificações: {e}")
         return jsonify({"erro": "Erro interno do servidor"}), 500
 
 
+@bp.post('/api/notificacoes/stream/ticket')
+@login_required
+def ticket_stream_notificacoes():
+    """
+    Emite o ticket de uso único exigido para abrir o stream, ou 503 (com
+    `retry`) se este processo já está no limite de streams abertos.
+    """
+    if _streams_abertos >= current_app.config.get("NOTIFICACOES_STREAM_MAX", 16):
+        return _resposta_streams_esgotados()
+
+    try:
+        return jsonify(
+            {
+                "ticket": gerar_ticket_stream(g.usuario_id),
+                "validade": TICKET_STREAM_VALIDADE_SEGUNDOS,
+            }
+        )
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Erro ao gerar ticket do stream: {e}")
+        return jsonify({"erro": "Erro interno do servidor"}), 500
+
+
+@bp.get('/api/notificacoes/stream')
+def stream_notificacoes():
+    """
+    Stream (Server-Sent Events) com novas notificações e o contador de não
+    lidas. O EventSource do navegador não envia cabeçalhos, então a conexão
+    é autorizada por um ticket de uso único (?ticket=..., obtido em
+    /api/notificacoes/stream/ticket); o JWT nunca vai na URL.
+
+    Eventos publicados por outros processos não chegam aqui; por isso o
+    contador também é recalculado a cada NOTIFICACOES_STREAM_RECONTAGEM
+    segundos. A conexão é encerrada após NOTIFICACOES_STREAM_DURACAO
+    segundos, liberando a thread; o cliente reconecta com um novo ticket.
+    No máximo NOTIFICACOES_STREAM_MAX streams por processo (503 acima disso).
+    """
+    usuario_id = consumir_ticket_stream(request.args.get("ticket", ""))
+    if usuario_id is None:
+        return jsonify(
+            {"erro": "Ticket inválido", "mensagem": "Ticket ausente, expirado ou já utilizado"}
+        ), 401
+    if not _reservar_stream():
+        return _resposta_streams_esgotados()
+
+    duracao = current_app.config.get("NOTIFICACOES_STREAM_DURACAO", 300)
+    recontagem = current_app.config.get("NOTIFICACOES_STREAM_RECONTAGEM", 120)
+    heartbeat = 20
+
+    def contador():
+        total = contar_nao_lidas(usuario_id)
+        db.session.rollback()  # não segura conexão/transação entre eventos
+        return evento_sse("contador", {"nao_lidas": total})
+
+    def gerar():
+        fila = canal_notificacoes.assinar(usuario_id)
+        try:
+            yield "retry: 5000\n\n"
+            yield contador()
+
+            fim = time.monotonic() + duracao
+            proxima_recontagem = time.monotonic() + recontagem
+            while time.monotonic() < fim:
+                try:
+                    eventos = [fila.get(timeout=heartbeat)]
+                except queue.Empty:
+                    if time.monotonic() >= proxima_recontagem:
+                        proxima_recontagem = time.monotonic() + recontagem
+                        yield contador()
+                    else:
+                        yield ": ping\n\n"
+                    continue
+
+                # Agrupa rajadas (ex: verificação automática) em um só contador
+                while not fila.empty():
+                    eventos.append(fila.get_nowait())
+                for evento in eventos:
+                    if "notificacao" in evento:
+                        yield evento_sse("notificacao", evento["notificacao"])
+                proxima_recontagem = time.monotonic() + recontagem
+                yield contador()
+        finally:
+            canal_notificacoes.cancelar(usuario_id, fila)
+
+    resposta = Response(
+        stream_with_context(gerar()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Chamado pelo servidor ao encerrar a resposta, mesmo se o gerador nunca rodou
+    resposta.call_on_close(_liberar_stream)
+    return resposta
+
+
 # ================================
 # FUNÇÕES PARA CRIAR NOTIFICAÇÕES
 # ================================
 
-def criar_notificacao_os_atrasada(os, usuario_id):
-    """Cria notificação para OS atrasada."""
+def chave_referencia(entidade, entidade_id):
+    """Chave de deduplicação da entidade referenciada (ex: "os:123")."""
+    return f"{entidade}:{entidade_id}"
+
+
+def chave_referencia_de_dados(dados):
+    """Deduz a chave de deduplicação a partir de `dados_referencia`."""
+    dados = dados or {}
+    for campo, entidade in (("os_id", "os"), ("produto_id", "produto"), ("cliente_id", "cliente")):
+        if dados.get(campo) is not None:
+            return chave_referencia(entidade, dados[campo])
+    return None
+
+
+def criar_notificacao_os_atrasada(os, usuario_id=None):
+    """Cria notificação para OS atrasada (sem usuario_id: para todos)."""
     titulo = f"OS {os.numero_os} - Prazo Vencido"
     mensagem = f"Cliente {os.cliente.nome} aguardando retorno. Prazo estimado excedido."
 
-    notificacao = Notificacao(
+    notificacao = EventoNotificacao(
         tipo="os_atrasada",
         titulo=titulo,
         mensagem=mensagem,
         dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
+        chave_referencia=chave_referencia("os", os.id),
         prioridade="alta",
         usuario_id=usuario_id
     )
     db.session.add(notificacao)
 
 
-def criar_notificacao_estoque_critico(produto, usuario_id):
-    """Cria notificação para estoque crítico."""
+def criar_notificacao_estoque_critico(produto, usuario_id=None):
+    """Cria notificação para estoque crítico (sem usuario_id: para todos)."""
     titulo = f"{produto.nome} - Estoque Crítico"
     mensagem = f"Apenas {produto.quantidade} unidades disponíveis (mínimo: {produto.estoque_minimo})."
 
-    notificacao = Notificacao(
+    notificacao = EventoNotificacao(
         tipo="estoque_critico",
         titulo=titulo,
         mensagem=mensagem,
         dados_referencia={"produto_id": produto.id},
+        chave_referencia=chave_referencia("produto", produto.id),
         prioridade="alta",
         usuario_id=usuario_id
     )
     db.session.add(notificacao)
 
 
-def criar_notificacao_os_pronta(os, usuario_id):
-    """Cria notificação para OS pronta."""
+def criar_notificacao_os_pronta(os, usuario_id=None):
+    """Cria notificação para OS pronta (sem usuario_id: para todos)."""
     titulo = f"OS {os.numero_os} - Pronta para Retirada"
     mensagem = f"Aparelho de {os.cliente.nome} está pronto. Cliente deve ser contactado."
 
-    notificacao = Notificacao(
+    notificacao = EventoNotificacao(
         tipo="os_pronta",
         titulo=titulo,
         mensagem=mensagem,
         dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
+        chave_referencia=chave_referencia("os", os.id),
         prioridade="normal",
         usuario_id=usuario_id
     )
     db.session.add(notificacao)
 
 
-def criar_notificacao_cliente_novo(cliente, usuario_id):
-    """Cria notificação para novo cliente."""
+def criar_notificacao_cliente_novo(cliente, usuario_id=None):
+    """Cria notificação para novo cliente (sem usuario_id: para todos)."""
     titulo = f"Novo Cliente Cadastrado"
     mensagem = f"{cliente.nome} foi adicionado à base de dados."
 
-    notificacao = Notificacao(
+    notificacao = EventoNotificacao(
         tipo="cliente_novo",
         titulo=titulo,
         mensagem=mensagem,
         dados_referencia={"cliente_id": cliente.id},
+        chave_referencia=chave_referencia("cliente", cliente.id),
         prioridade="baixa",
         usuario_id=usuario_id
     )
     db.session.add(notificacao)
 
 
-def verificar_e_criar_notificacoes():
-    """Verifica condições do sistema e cria notificações automaticamente."""
+# Colunas preenchidas pelos INSERT ... SELECT da verificação automática
+COLUNAS_EVENTO = [
+    "tipo",
+    "titulo",
+    "mensagem",
+    "dados_referencia",
+    "chave_referencia",
+    "prioridade",
+    "criado_em",
+    "atualizado_em",
+]
+
+
+def inserir_eventos_faltantes(tipo, prioridade, entidade, titulo, mensagem,
+                              dados, chave, filtros, joins=()):
+    """
+    Cria, em um único INSERT ... SELECT, o evento `tipo` para cada registro de
+    `entidade` que atende `filtros` e ainda não tem evento com a mesma chave
+    de referência (nem na tabela, nem removido pela retenção enquanto a
+    condição continua valendo). Retorna quantos foram criados.
+    """
+    agora = datetime.now()
+
+    ja_notificado = (
+        select(EventoNotificacao.id)
+        .where(
+            EventoNotificacao.tipo == tipo,
+            EventoNotificacao.chave_referencia == chave,
+        )
+        .exists()
+    )
+    ja_removido = (
+        select(ChaveNotificada.tipo)
+        .where(
+            ChaveNotificada.tipo == tipo,
+            ChaveNotificada.chave_referencia == chave,
+        )
+        .exists()
+    )
+
+    # Condição resolvida (OS entregue, estoque reposto): a chave removida
+    # pela retenção deixa de bloquear um novo alerta se ela voltar a valer
+    ainda_valendo = select(chave).select_from(entidade)
+    for tabela, condicao in joins:
+        ainda_valendo = ainda_valendo.outerjoin(tabela, condicao)
+    db.session.execute(
+        delete(ChaveNotificada).where(
+            ChaveNotificada.tipo == tipo,
+            ChaveNotificada.chave_referencia.not_in(ainda_valendo.where(*filtros)),
+        )
+    )
+
+    origem = select(
+        literal(tipo, String),
+        titulo,
+        mensagem,
+        dados,
+        chave,
+        literal(prioridade, String),
+        literal(agora),
+        literal(agora),
+    ).select_from(entidade)
+    for tabela, condicao in joins:
+        origem = origem.outerjoin(tabela, condicao)
+    origem = origem.where(*filtros, ~ja_notificado, ~ja_removido)
+
+    resultado = db.session.execute(
+        insert(EventoNotificacao).from_select(COLUNAS_EVENTO, origem)
+    )
+    return max(resultado.rowcount or 0, 0)
+
+
+def verificar_e_criar_notificacoes(propagar_erro: bool = False):
+    """
+    Verifica condições do sistema e cria notificações automaticamente.
+    Cada verificação é um INSERT ... SELECT com anti-join que grava um evento
+    por OS/produto (não por usuário); o número de comandos é fixo.
+    Retorna o número de notificações criadas.
+    Com `propagar_erro` a falha é levantada após o rollback (para o
+    agendador registrar o erro da execução).
+    """
     try:
-        from datetime import datetime, timedelta
-        hoje = datetime.utcnow()
-
-        # Busca todos os usuários ativos
-        usuarios_ids = [u.id for u in Usuario.query.filter_by(ativo=True).all()]
-
-        if not usuarios_ids:
-            print("Nenhum usuário ativo encontrado")
-            return
-
-        notificacoes_para_criar = []
-
-        # === VERIFICA OS ATRASADAS ===
-        os_atrasadas = OrdemServico.query.filter(
-            OrdemServico.status.in_(['aguardando', 'em_reparo']),
-            OrdemServico.criado_em + timedelta(days=OrdemServico.prazo_estimado) < hoje
-        ).all()
-
-        if os_atrasadas:
-            # Busca notificações existentes para OS atrasadas
-            os_ids_existentes = {os.id for os in os_atrasadas}
-            notificacoes_existentes_os = Notificacao.query.filter(
-                Notificacao.tipo == "os_atrasada",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['os_id'].astext.cast(db.Integer).in_(os_ids_existentes)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_map = {(n.usuario_id, n.dados_referencia.get('os_id')) for n in notificacoes_existentes_os}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for os in os_atrasadas:
-                    if (usuario_id, os.id) not in existentes_map:
-                        notificacao = Notificacao(
-                            tipo="os_atrasada",
-                            titulo=f"OS {os.numero_os} - Prazo Vencido",
-                            mensagem=f"Cliente {os.cliente.nome} aguardando retorno. Prazo estimado excedido.",
-                            dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
-                            prioridade="alta",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
-
-        # === VERIFICA ESTOQUE CRÍTICO ===
-        produtos_criticos = ProdutoEstoque.query.filter(
-            ProdutoEstoque.quantidade <= ProdutoEstoque.estoque_minimo
-        ).all()
-
-        if produtos_criticos:
-            # Busca notificações existentes para produtos críticos
-            produto_ids_existentes = {p.id for p in produtos_criticos}
-            notificacoes_existentes_prod = Notificacao.query.filter(
-                Notificacao.tipo == "estoque_critico",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['produto_id'].astext.cast(db.Integer).in_(produto_ids_existentes)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_prod_map = {(n.usuario_id, n.dados_referencia.get('produto_id')) for n in notificacoes_existentes_prod}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for produto in produtos_criticos:
-                    if (usuario_id, produto.id) not in existentes_prod_map:
-                        notificacao = Notificacao(
-                            tipo="estoque_critico",
-                            titulo=f"{produto.nome} - Estoque Crítico",
-                            mensagem=f"Apenas {produto.quantidade} unidades disponíveis (mínimo: {produto.estoque_minimo}).",
-                            dados_referencia={"produto_id": produto.id},
-                            prioridade="alta",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
-
-        # === VERIFICA OS PRONTAS ===
-        os_prontas = OrdemServico.query.filter_by(status="pronto").all()
-
-        if os_prontas:
-            # Busca notificações existentes para OS prontas
-            os_prontas_ids = {os.id for os in os_prontas}
-            notificacoes_existentes_prontas = Notificacao.query.filter(
-                Notificacao.tipo == "os_pronta",
-                Notificacao.usuario_id.in_(usuarios_ids),
-                Notificacao.dados_referencia['os_id'].astext.cast(db.Integer).in_(os_prontas_ids)
-            ).all()
-
-            # Mapeia quais combinações já existem
-            existentes_prontas_map = {(n.usuario_id, n.dados_referencia.get('os_id')) for n in notificacoes_existentes_prontas}
-
-            # Cria notificações apenas para combinações que não existem
-            for usuario_id in usuarios_ids:
-                for os in os_prontas:
-                    if (usuario_id, os.id) not in existentes_prontas_map:
-                        notificacao = Notificacao(
-                            tipo="os_pronta",
-                            titulo=f"OS {os.numero_os} - Pronta para Retirada",
-                            mensagem=f"Aparelho de {os.cliente.nome} está pronto. Cliente deve ser contactado.",
-                            dados_referencia={"os_id": os.id, "cliente_id": os.cliente_id},
-                            prioridade="normal",
-                            usuario_id=usuario_id
-                        )
-                        notificacoes_para_criar.append(notificacao)
-
-        # Insere todas as notificações de uma vez
-        if notificacoes_para_criar:
-            db.session.bulk_save_objects(notificacoes_para_criar)
-            db.session.commit()
-            print(f"✅ Criadas {len(notificacoes_para_criar)} notificações automaticamente")
+        agora = datetime.now()
+        nome_cliente = func.coalesce(Cliente.nome, "")
+        join_cliente = [(Cliente, Cliente.id == OrdemServico.cliente_id)]
+        chave_os = texto_sql("os:", OrdemServico.id)
+        dados_os = json_objeto_sql(os_id=OrdemServico.id, cliente_id=OrdemServico.cliente_id)
+
+        total = 0
+
+        # === OS ATRASADAS ===
+        total += inserir_eventos_faltantes(
+            "os_atrasada",
+            "alta",
+            OrdemServico,
+            titulo=texto_sql("OS ", OrdemServico.numero_os, " - Prazo Vencido"),
+            mensagem=texto_sql(
+                "Cliente ", nome_cliente, " aguardando retorno. Prazo estimado excedido."
+            ),
+            dados=dados_os,
+            chave=chave_os,
+            filtros=[
+                OrdemServico.status.in_(["aguardando", "em_reparo"]),
+                expr_prazo_vencido(agora),
+            ],
+            joins=join_cliente,
+        )
+
+        # === ESTOQUE CRÍTICO ===
+        total += inserir_eventos_faltantes(
+            "estoque_critico",
+            "alta",
+            ProdutoEstoque,
+            titulo=texto_sql(ProdutoEstoque.nome, " - Estoque Crítico"),
+            mensagem=texto_sql(
+                "Apenas ", ProdutoEstoque.quantidade,
+                " unidades disponíveis (mínimo: ", ProdutoEstoque.estoque_minimo, ").",
+            ),
+            dados=json_objeto_sql(produto_id=ProdutoEstoque.id),
+            chave=texto_sql("produto:", ProdutoEstoque.id),
+            filtros=[ProdutoEstoque.quantidade <= ProdutoEstoque.estoque_minimo],
+        )
+
+        # === OS PRONTAS ===
+        total += inserir_eventos_faltantes(
+            "os_pronta",
+            "normal",
+            OrdemServico,
+            titulo=texto_sql("OS ", OrdemServico.numero_os, " - Pronta para Retirada"),
+            mensagem=texto_sql(
+                "Aparelho de ", nome_cliente, " está pronto. Cliente deve ser contactado."
+            ),
+            dados=dados_os,
+            chave=chave_os,
+            filtros=[OrdemServico.status == "pronto"],
+            joins=join_cliente,
+        )
+
+        db.session.commit()
+        if total:
+            # Criadas por INSERT ... SELECT (fora do ORM): streams recontam
+            canal_notificacoes.publicar_todos({"atualizar": True})
+            print(f"✅ Criadas {total} notificações automaticamente")
         else:
             print("✅ Verificação de notificações concluída - nenhuma nova notificação necessária")
+        return total
 
     except Exception as e:
         db.session.rollback()
+        if propagar_erro:
+            raise
         print(f"❌ Erro ao verificar notificações: {e}")
+        return 0
@@ -1,13 +1,24 @@
 from datetime import datetime, timedelta
 
-from flask import Blueprint, abort, jsonify, request
+from flask import Blueprint, abort, current_app, jsonify, request
+from sqlalchemy import or_
 from sqlalchemy.orm import joinedload
 
 from extensions import db
-from models import Cliente, OrdemServico, Usuario
+from models import Cliente, OrdemServico, TarefaIA
 from auth_utils import login_required
+from db_utils import expr_prazo_vencido
+from paginacao_utils import (
+    obter_data_param,
+    obter_limite,
+    paginacao_solicitada,
+    paginar_keyset,
+)
 from routes_notificacoes import criar_notificacao_os_pronta
-from ai_utils import gerar_resumo
+from routes_financeiro import registrar_os_entregue
+from routes_dashboard import invalidar_cache_dashboard
+from sequencia_utils import proximo_valor
+from fila_ia import enfileirar_tarefa_ia
 
 bp = Blueprint("os", __name__)
 
@@ -43,32 +54,102 @@ def os_to_dict(os_obj: OrdemServico, incluir_cliente: bool = True) -> dict:
     return base
 
 
-def gerar_proximo_numero_os() -> str:
+def _ultimo_numero_os_legado() -> int:
+    """Último número de OS gravado antes da sequência existir no banco."""
     ultimo = (
         OrdemServico.query.order_by(OrdemServico.id.desc()).with_entities(
             OrdemServico.numero_os
         )
     ).first()
     if not ultimo or not ultimo[0]:
-        return "#OS0001"
+        return 0
 
     numero = ultimo[0].replace("#", "").replace("OS", "")
     try:
-        prox = int(numero) + 1
+        return int(numero)
     except ValueError:
-        prox = 1
-    return f"#OS{prox:04d}"
+        return 0
+
+
+def gerar_proximo_numero_os() -> str:
+    numero = proximo_valor(
+        "numero_os",
+        tamanho_bloco=current_app.config.get("SEQUENCIA_OS_BLOCO", 1),
+        valor_inicial=_ultimo_numero_os_legado,
+    )
+    return f"#OS{numero:04d}"
 
 
 @bp.get("/")
 @login_required
 def listar_os():
-    ordens = (
-        OrdemServico.query.options(joinedload(OrdemServico.cliente))
-        .order_by(OrdemServico.criado_em.desc())
-        .all()
+    """
+    Lista as OS, da mais recente para a mais antiga.
+
+    Filtros opcionais: status, prioridade (aceitam lista separada por vírgula),
+    clienteId, dataInicio, dataFim, atrasadas=true (aguardando ou em reparo
+    com prazo vencido) e q (trecho do número, aparelho ou nome do cliente).
+    Quando `limite` ou `cursor` são informados a resposta é paginada por
+    keyset (criado_em, id) e inclui `proximoCursor`.
+    """
+    query = OrdemServico.query.options(joinedload(OrdemServico.cliente))
+
+    termo = request.args.get("q", "").strip()
+    if termo:
+        padrao = f"%{termo}%"
+        query = query.outerjoin(Cliente, Cliente.id == OrdemServico.cliente_id).filter(
+            or_(
+                OrdemServico.numero_os.ilike(padrao),
+                OrdemServico.marca_modelo.ilike(padrao),
+                Cliente.nome.ilike(padrao),
+            )
+        )
+
+    if request.args.get("atrasadas") == "true":
+        # Mesma definição do card "OS atrasadas" do dashboard
+        query = query.filter(
+            OrdemServico.status.in_(["aguardando", "em_reparo"]),
+            expr_prazo_vencido(datetime.now()),
+        )
+
+    status = request.args.get("status")
+    if status:
+        query = query.filter(OrdemServico.status.in_(status.split(",")))
+
+    prioridade = request.args.get("prioridade")
+    if prioridade:
+        query = query.filter(OrdemServico.prioridade.in_(prioridade.split(",")))
+
+    cliente_id = request.args.get("clienteId", type=int)
+    if cliente_id:
+        query = query.filter(OrdemServico.cliente_id == cliente_id)
+
+    data_inicio = obter_data_param("dataInicio")
+    if data_inicio:
+        query = query.filter(OrdemServico.criado_em >= data_inicio)
+
+    data_fim = obter_data_param("dataFim")
+    if data_fim:
+        # dataFim é inclusiva: considera o dia inteiro quando vier só a data
+        if data_fim.time() == datetime.min.time():
+            data_fim += timedelta(days=1)
+        query = query.filter(OrdemServico.criado_em < data_fim)
+
+    if not paginacao_solicitada():
+        ordens = query.order_by(
+            OrdemServico.criado_em.desc(), OrdemServico.id.desc()
+        ).all()
+        return jsonify([os_to_dict(o) for o in ordens])
+
+    ordens, proximo_cursor = paginar_keyset(
+        query, OrdemServico.criado_em, OrdemServico.id, obter_limite()
+    )
+    return jsonify(
+        {
+            "itens": [os_to_dict(o) for o in ordens],
+            "proximoCursor": proximo_cursor,
+        }
     )
-    return jsonify([os_to_dict(o) for o in ordens])
 
 
 @bp.post("/")
@@ -107,31 +188,20 @@ def criar_os():
     )
 
     db.session.add(os_obj)
-    db.session.commit()
+    db.session.flush()
 
-    # Gera resumo automático usando IA em background (não bloqueia resposta)
-    try:
-        from threading import Thread
-
-        def gerar_resumo_background():
-            try:
-                resumo_ia = gerar_resumo(data["problemaRelatado"])
-                # Atualizar observações com o resumo da IA se não houver observações
-                if not os_obj.observacoes:
-                    os_obj.observacoes = f"[IA] Resumo: {resumo_ia}"
-                    db.session.commit()
-                print(f"✅ Resumo IA gerado para OS {os_obj.numero_os}")
-            except Exception as e:
-                print(
-                    f"Aviso: Não foi possível gerar resumo automático para OS {os_obj.numero_os}: {e}"
-                )
-
-        # Executa em thread separada para não bloquear resposta
-        thread = Thread(target=gerar_resumo_background, daemon=True)
-        thread.start()
-    except Exception as e:
-        print(f"Aviso: Não foi possível iniciar geração de resumo em background: {e}")
-        # Não afeta a criação da OS se falhar
+    # OS já cadastrada como entregue também entra no resumo financeiro
+    if os_obj.status == "entregue":
+        registrar_os_entregue(os_obj)
+
+    # Resumo automático por IA: a tarefa é gravada junto com a OS e
+    # processada pela fila em segundo plano (não bloqueia a resposta)
+    tarefa = TarefaIA(tipo="resumo_os", os_id=os_obj.id)
+    db.session.add(tarefa)
+
+    db.session.commit()
+    invalidar_cache_dashboard()
+    enfileirar_tarefa_ia(tarefa.id)
 
     return jsonify(os_to_dict(os_obj)), 201
 
@@ -182,18 +252,17 @@ def atualizar_os(os_id: int):
     if "valorOrcamento" in data:
         os_obj.valor_orcamento = data["valorOrcamento"]
 
-    db.session.commit()
+    # OS entregue entra no resumo financeiro diário na mesma transação
+    if status_anterior != "entregue" and novo_status == "entregue":
+        registrar_os_entregue(os_obj)
 
-    # Criar notificação se o status mudou para "pronto"
+    # Um único evento para todos os usuários se o status mudou para "pronto"
+    # (enviado aos streams após o commit)
     if status_anterior != "pronto" and novo_status == "pronto":
-        try:
-            usuarios = Usuario.query.filter_by(ativo=True).all()
-            for usuario in usuarios:
-                criar_notificacao_os_pronta(os_obj, usuario.id)
-            db.session.commit()
-        except Exception as e:
-            print(f"Aviso: Não foi possível criar notificações para OS pronta: {e}")
-            db.session.rollback()  # Não afetar a atualização da OS
+        criar_notificacao_os_pronta(os_obj)
+
+    db.session.commit()
+    invalidar_cache_dashboard()
 
     return jsonify(os_to_dict(os_obj))
 
@@ -252,5 +321,6 @@ def deletar_os(os_id: int):
 
     db.session.delete(os_obj)
     db.session.commit()
+    invalidar_cache_dashboard()
 
     return "", 204
@@ -0,0 +1,62 @@
+import threading
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Sequencia
+
+
+# Blocos reservados por este processo: nome -> [próximo valor, último valor]
+_blocos = {}
+_blocos_lock = threading.Lock()
+
+
+def _reservar_bloco(nome: str, tamanho: int, valor_inicial=None) -> tuple:
+    """
+    Reserva `tamanho` valores da sequência em uma transação própria e curta.
+    O UPDATE trava a linha até o commit, então dois processos nunca recebem
+    o mesmo intervalo. `valor_inicial` (callable) só é usado na criação da
+    sequência, para continuar a partir dos dados já existentes.
+    """
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            update(Sequencia)
+            .where(Sequencia.nome == nome)
+            .values(valor=Sequencia.valor + tamanho)
+        )
+        if resultado.rowcount == 0:
+            inicial = valor_inicial() if valor_inicial else 0
+            try:
+                with conn.begin_nested():
+                    conn.execute(
+                        insert(Sequencia).values(nome=nome, valor=inicial + tamanho)
+                    )
+            except IntegrityError:
+                # Outro processo criou a sequência ao mesmo tempo
+                conn.execute(
+                    update(Sequencia)
+                    .where(Sequencia.nome == nome)
+                    .values(valor=Sequencia.valor + tamanho)
+                )
+        ultimo = conn.execute(
+            select(Sequencia.valor).where(Sequencia.nome == nome)
+        ).scalar_one()
+
+    return ultimo - tamanho + 1, ultimo
+
+
+def proximo_valor(nome: str, tamanho_bloco: int = 1, valor_inicial=None) -> int:
+    """
+    Retorna o próximo valor da sequência `nome`.
+    Com `tamanho_bloco` > 1 o processo reserva vários valores de uma vez e
+    os entrega da memória; valores não usados viram lacunas ao reiniciar.
+    """
+    with _blocos_lock:
+        bloco = _blocos.get(nome)
+        if not bloco or bloco[0] > bloco[1]:
+            bloco = list(_reservar_bloco(nome, max(1, tamanho_bloco), valor_inicial))
+            _blocos[nome] = bloco
+        valor = bloco[0]
+        bloco[0] += 1
+    return valor
@@ -0,0 +1,16 @@
+import re
+import unicodedata
+
+
+def normalizar_busca(texto: str) -> str:
+    """Normaliza texto para busca: minúsculas, sem acentos e espaços extras."""
+    if not texto:
+        return ""
+    sem_acentos = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in sem_acentos if not unicodedata.combining(c))
+    return " ".join(sem_acentos.lower().split())
+
+
+def somente_digitos(texto: str) -> str:
+    """Remove tudo que não for dígito (CPF/CNPJ, telefone)."""
+    return re.sub(r"\D", "", texto or "")
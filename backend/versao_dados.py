@@ -0,0 +1,68 @@
+import os
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Cliente, OrdemServico, ProdutoEstoque, Sequencia
+from cache_utils import CacheTTL
+from sequencia_utils import proximo_valor
+
+
+# Versão dos dados usados pela IA (clientes, OS e produtos), guardada na
+# tabela sequencias: todo commit que altera esses models incrementa o
+# contador, e os caches que incluem a versão na chave deixam de valer em
+# todos os processos
+SEQUENCIA_VERSAO = "versao_dados_ia"
+MODELOS_MONITORADOS = (Cliente, OrdemServico, ProdutoEstoque)
+
+# Evita ler o banco a cada consulta; alterações feitas em outro processo
+# aparecem em no máximo IA_VERSAO_TTL segundos
+_versao_local = CacheTTL(ttl=float(os.getenv("IA_VERSAO_TTL", "2")), max_itens=1)
+
+
+def versao_dados() -> int:
+    """Versão atual dos dados de clientes, OS e produtos."""
+    versao = _versao_local.get(SEQUENCIA_VERSAO)
+    if versao is None:
+        with db.engine.connect() as conn:
+            versao = conn.execute(
+                select(Sequencia.valor).where(Sequencia.nome == SEQUENCIA_VERSAO)
+            ).scalar() or 0
+        _versao_local.set(SEQUENCIA_VERSAO, versao)
+    return versao
+
+
+def incrementar_versao_dados() -> int:
+    """
+    Marca os dados como alterados, em uma transação própria e curta depois
+    do commit: a linha da sequência não fica travada durante as transações
+    da aplicação (só o UPDATE do incremento disputa a linha).
+    """
+    versao = proximo_valor(SEQUENCIA_VERSAO)
+    _versao_local.set(SEQUENCIA_VERSAO, versao)
+    return versao
+
+
+@event.listens_for(Session, "after_flush")
+def _detectar_alteracao_dados(session, flush_context):
+    alterados = (*session.new, *session.dirty, *session.deleted)
+    if any(isinstance(obj, MODELOS_MONITORADOS) for obj in alterados):
+        session.info["dados_ia_alterados"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _publicar_versao_dados(session):
+    # Os dados já estão gravados: até o incremento, leitores podem ver a
+    # versão anterior (aceitável para um cache)
+    if session.info.pop("dados_ia_alterados", False):
+        try:
+            incrementar_versao_dados()
+        except Exception as e:
+            # Sem o incremento os caches expiram só pelo TTL
+            print(f"Aviso: não foi possível atualizar a versão dos dados: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracao_dados(session):
+    session.info.pop("dados_ia_alterados", None)
@@ -0,0 +1,9 @@
+"""
+Ponto de entrada web (gunicorn --chdir backend wsgi:app).
+Cada worker importa este módulo após o fork e inicia seus serviços.
+"""
+
+from app import create_app, iniciar_servicos
+
+app = create_app()
+iniciar_servicos(app)
@@ -408,7 +408,7 @@ class AIChatManager {
 
         // Enviar para API
         try {
-            const resposta = await this.consultarIA(mensagem);
+            const resposta = await this.consultarIAStream(mensagem);
             this.removerLoading();
             this.adicionarMensagemIA(resposta);
         } catch (error) {
@@ -452,6 +452,101 @@ class AIChatManager {
         return resultado;
     }
 
+    // Como consultarIA, mas exibe o texto da IA à medida que é gerado
+    // (eventos SSE de /api/ai/consulta/stream)
+    async consultarIAStream(consulta) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return this.consultarIA(consulta);
+        }
+
+        const payload = { consulta };
+        if (this.estadoConversacional) {
+            payload.estado_conversacional = this.estadoConversacional;
+        }
+
+        const response = await fetch('/api/ai/consulta/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': `Bearer ${getToken()}`
+            },
+            body: JSON.stringify(payload)
+        });
+
+        if (!response.ok) {
+            const error = await response.json();
+            throw new Error(error.mensagem || 'Erro na consulta');
+        }
+        if (!response.body) {
+            throw new Error('Resposta sem conteúdo');
+        }
+
+        const leitor = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let textoParcial = '';
+        let resultado = null;
+
+        while (true) {
+            const { value, done } = await leitor.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const blocos = buffer.split('\n\n');
+            buffer = blocos.pop(); // último bloco pode estar incompleto
+
+            for (const bloco of blocos) {
+                const evento = this.lerEventoSSE(bloco);
+                if (!evento) continue;
+
+                if (evento.nome === 'token') {
+                    textoParcial += evento.dados.texto;
+                    this.atualizarMensagemParcial(textoParcial);
+                } else if (evento.nome === 'fim') {
+                    resultado = evento.dados;
+                } else if (evento.nome === 'erro') {
+                    throw new Error(evento.dados.mensagem || 'Erro na consulta');
+                }
+            }
+        }
+
+        if (!resultado) {
+            throw new Error('Resposta incompleta');
+        }
+
+        // Atualizar estado conversacional se fornecido pela API
+        if (resultado.estado_conversacional) {
+            this.estadoConversacional = resultado.estado_conversacional;
+        } else {
+            this.estadoConversacional = null; // Finalizar fluxo conversacional
+        }
+
+        return resultado;
+    }
+
+    lerEventoSSE(bloco) {
+        let nome = 'message';
+        const dados = [];
+        for (const linha of bloco.split('\n')) {
+            if (linha.startsWith('event:')) {
+                nome = linha.slice(6).trim();
+            } else if (linha.startsWith('data:')) {
+                dados.push(linha.slice(5).trim());
+            }
+        }
+        if (dados.length === 0) return null;
+        return { nome, dados: JSON.parse(dados.join('\n')) };
+    }
+
+    // Substitui o "Processando..." pelo texto recebido até agora
+    atualizarMensagemParcial(texto) {
+        const elemento = document.querySelector('#loadingMessage .message-text');
+        if (elemento) {
+            elemento.textContent = texto;
+            this.scrollParaBaixo();
+        }
+    }
+
     adicionarMensagemUsuario(texto) {
         const timestamp = new Date().toISOString();
         const messageData = {
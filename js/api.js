@@ -97,6 +97,24 @@ async function listarClientesApi() {
   return await apiRequest("/api/clientes");
 }
 
+// Busca uma página de clientes (paginação por cursor).
+// Filtros: q (nome, CPF/CNPJ, telefone ou email), status, tipoPessoa.
+// Retorna { itens, proximoCursor }; proximoCursor é null na última página.
+async function listarClientesPaginaApi(filtros = {}) {
+  const params = new URLSearchParams({ limite: 50 });
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.set(chave, valor);
+    }
+  });
+  return await apiRequest(`/api/clientes?${params.toString()}`);
+}
+
+// Contagens dos cards da página de clientes.
+async function estatisticasClientesApi() {
+  return await apiRequest("/api/clientes/estatisticas");
+}
+
 async function criarClienteApi(dados) {
   return await apiRequest("/api/clientes", {
     method: "POST",
@@ -119,6 +137,25 @@ async function listarProdutosApi() {
   return await apiRequest("/api/estoque");
 }
 
+// Busca uma página de produtos (paginação por cursor).
+// Filtros: q, categoria, fornecedor, localizacao, critico, situacao,
+// ordenarPor, ordem.
+// Retorna { itens, proximoCursor }; proximoCursor é null na última página.
+async function listarProdutosPaginaApi(filtros = {}) {
+  const params = new URLSearchParams({ limite: 100 });
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.set(chave, valor);
+    }
+  });
+  return await apiRequest(`/api/estoque?${params.toString()}`);
+}
+
+// Totais dos cards da página de estoque.
+async function estatisticasEstoqueApi() {
+  return await apiRequest("/api/estoque/estatisticas");
+}
+
 async function criarProdutoApi(dados) {
   return await apiRequest("/api/estoque", {
     method: "POST",
@@ -148,6 +185,18 @@ async function listarOSApi() {
   return await apiRequest("/api/os");
 }
 
+// Busca uma página de OS (paginação por cursor).
+// Retorna { itens, proximoCursor }; proximoCursor é null na última página.
+async function listarOSPaginaApi(filtros = {}) {
+  const params = new URLSearchParams({ limite: 100 });
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.set(chave, valor);
+    }
+  });
+  return await apiRequest(`/api/os?${params.toString()}`);
+}
+
 async function criarOSApi(dados) {
   return await apiRequest("/api/os", {
     method: "POST",
@@ -162,6 +211,32 @@ async function atualizarOSApi(id, dados) {
   });
 }
 
+// ========================================
+// FINANCEIRO - Funções específicas
+// ========================================
+
+// Resumo financeiro agregado no servidor.
+// Filtros: inicio, fim (YYYY-MM-DD), agrupamento (dia/semana/mes), status.
+async function resumoFinanceiroApi(filtros = {}) {
+  const params = new URLSearchParams();
+  Object.entries(filtros).forEach(([chave, valor]) => {
+    if (valor !== undefined && valor !== null && valor !== "") {
+      params.set(chave, valor);
+    }
+  });
+  return await apiRequest(`/api/financeiro/resumo?${params.toString()}`);
+}
+
+// ========================================
+// DASHBOARD - Funções específicas
+// ========================================
+
+// KPIs do dashboard (contagens e receita desde `inicio`, padrão mês atual).
+async function resumoDashboardApi(inicio) {
+  const params = inicio ? `?inicio=${encodeURIComponent(inicio)}` : "";
+  return await apiRequest(`/api/dashboard/resumo${params}`);
+}
+
 // ========================================
 // AI - Funções específicas
 // ========================================
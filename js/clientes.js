@@ -114,6 +114,19 @@ function buscarClientes(termo) {
   });
 }
 
+/**
+ * Busca uma página de clientes no servidor (busca indexada e filtros)
+ * e a mantém em memória; com `cursor`, acrescenta à página anterior
+ * @param {object} filtros - q, status, tipoPessoa e cursor
+ * @returns {Promise<string|null>} Cursor da próxima página (null na última)
+ */
+async function carregarPaginaClientes(filtros = {}) {
+  const pagina = await listarClientesPaginaApi(filtros);
+  const itens = pagina.itens || [];
+  clientesEmMemoria = filtros.cursor ? clientesEmMemoria.concat(itens) : itens;
+  return pagina.proximoCursor;
+}
+
 // ============================
 // FUNÇÕES DE VALIDAÇÃO
 // ============================
@@ -311,7 +324,6 @@ function formatarTelefone(valor) {
 // INICIALIZAÇÃO
 // ============================
 
-// Carrega clientes ao iniciar
-carregarClientes();
+// Cada página carrega os clientes de que precisa (lista completa para
+// selects ou páginas filtradas via carregarPaginaClientes)
 console.log("✅ clientes.js carregado com sucesso!");
-console.log("📊 Total de clientes:", clientesEmMemoria.length);
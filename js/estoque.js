@@ -9,27 +9,72 @@ let produtosEmMemoria = [];
 // Variáveis globais
 let produtosFiltrados = [];
 let produtoAtual = null;
-let paginaAtual = 1;
-const itensPorPagina = 10;
+let proximoCursorProdutos = null; // Cursor da próxima página (null na última)
+let cargaProdutosAtual = 0; // Descarta respostas de filtros já substituídos
+let temporizadorBuscaProdutos = null;
+let totalProdutosCadastrados = 0; // Do banco inteiro (estatísticas)
 
 // ============================
 // FUNÇÕES DE DADOS
 // ============================
 
 /**
- * Carrega todos os produtos da API
+ * Filtros da tela convertidos nos parâmetros de GET /api/estoque
+ */
+function filtrosServidor() {
+    const filtroStatus = document.querySelector('.filter-btn.active[data-filter]')?.getAttribute('data-filter') || 'all';
+    return {
+        ordenarPor: 'nome',
+        q: document.getElementById('searchInput').value.trim(),
+        categoria: document.getElementById('categoryFilter').value,
+        situacao: filtroStatus !== 'all' ? filtroStatus : '',
+    };
+}
+
+/**
+ * Carrega a primeira página de produtos com os filtros atuais, em ordem
+ * alfabética; as demais páginas vêm sob demanda (carregarMaisProdutos)
  * @returns {Promise<Array>} Array de produtos
  */
 async function carregarProdutos() {
+    const carga = ++cargaProdutosAtual;
     try {
-        const produtos = await listarProdutosApi();
-        produtosEmMemoria = produtos || [];
+        const pagina = await listarProdutosPaginaApi(filtrosServidor());
+        if (carga !== cargaProdutosAtual) return produtosEmMemoria;
+        produtosEmMemoria = pagina.itens || [];
+        proximoCursorProdutos = pagina.proximoCursor;
     } catch (e) {
+        if (carga !== cargaProdutosAtual) return produtosEmMemoria;
         produtosEmMemoria = [];
+        proximoCursorProdutos = null;
     }
+    produtosFiltrados = produtosEmMemoria;
+    renderizarTabela();
+    renderizarPaginacao();
     return produtosEmMemoria;
 }
 
+/**
+ * Busca a próxima página com os mesmos filtros e a acrescenta à tabela
+ */
+async function carregarMaisProdutos() {
+    if (!proximoCursorProdutos) return;
+
+    const carga = cargaProdutosAtual;
+    try {
+        const pagina = await listarProdutosPaginaApi({ ...filtrosServidor(), cursor: proximoCursorProdutos });
+        if (carga !== cargaProdutosAtual) return;
+        produtosEmMemoria.push(...(pagina.itens || []));
+        proximoCursorProdutos = pagina.proximoCursor;
+        produtosFiltrados = produtosEmMemoria;
+        renderizarTabela();
+        renderizarPaginacao();
+    } catch (e) {
+        console.error('❌ Erro ao carregar mais produtos:', e);
+        alert('Erro ao carregar mais produtos. Tente novamente.');
+    }
+}
+
 /**
  * Adiciona um novo produto via API
  * @param {object} produto - Dados do produto
@@ -132,31 +177,11 @@ function buscarProdutoPorId(id) {
     return produtosEmMemoria.find(p => p.id === parseInt(id)) || null;
 }
 
-/**
- * Busca produtos por termo
- */
-function buscarProdutos(termo) {
-    if (!termo || termo.trim() === '') {
-        return produtosEmMemoria;
-    }
-    
-    const termoLower = termo.toLowerCase();
-    
-    return produtosEmMemoria.filter(produto => {
-        return (
-            produto.nome.toLowerCase().includes(termoLower) ||
-            produto.codigo.toLowerCase().includes(termoLower) ||
-            produto.categoria.toLowerCase().includes(termoLower) ||
-            (produto.descricao && produto.descricao.toLowerCase().includes(termoLower))
-        );
-    });
-}
-
 /**
  * Gera código do produto
  */
 function gerarCodigoProduto() {
-    const proximoNumero = produtosEmMemoria.length + 1;
+    const proximoNumero = totalProdutosCadastrados + 1;
     return `P${proximoNumero.toString().padStart(4, '0')}`;
 }
 
@@ -215,27 +240,27 @@ function validarFormularioProduto(dados) {
 // ============================
 
 /**
- * Atualiza as estatísticas na tela
+ * Atualiza as estatísticas na tela (totais do banco inteiro)
  */
-function atualizarEstatisticas() {
-    const total = produtosEmMemoria.length;
-    const valorTotal = produtosEmMemoria.reduce((total, p) => total + (p.quantidade * p.precoCusto), 0);
-    const estoqueBaixo = produtosEmMemoria.filter(p => calcularStatusEstoque(p.quantidade, p.estoqueMinimo) === 'baixo').length;
-    const estoqueCritico = produtosEmMemoria.filter(p => calcularStatusEstoque(p.quantidade, p.estoqueMinimo) === 'critico').length;
-
-    document.getElementById('totalProdutos').textContent = total;
-    document.getElementById('valorTotal').textContent = `R$ ${valorTotal.toLocaleString('pt-BR', {minimumFractionDigits: 2})}`;
-    document.getElementById('estoqueBaixo').textContent = estoqueBaixo;
-    document.getElementById('estoqueCritico').textContent = estoqueCritico;
+async function atualizarEstatisticas() {
+    try {
+        const estatisticas = await estatisticasEstoqueApi();
+        totalProdutosCadastrados = estatisticas.total;
+
+        document.getElementById('totalProdutos').textContent = estatisticas.total;
+        document.getElementById('valorTotal').textContent = `R$ ${estatisticas.valorTotal.toLocaleString('pt-BR', {minimumFractionDigits: 2})}`;
+        document.getElementById('estoqueBaixo').textContent = estatisticas.estoqueBaixo;
+        document.getElementById('estoqueCritico').textContent = estatisticas.estoqueCritico;
+    } catch (e) {
+        console.error('❌ Erro ao carregar estatísticas do estoque:', e);
+    }
 }
 
 /**
  * Renderiza a tabela de produtos
  */
 function renderizarTabela() {
-    const inicio = (paginaAtual - 1) * itensPorPagina;
-    const fim = inicio + itensPorPagina;
-    const produtosPagina = produtosFiltrados.slice(inicio, fim);
+    const produtosPagina = produtosFiltrados;
 
     const tbody = document.getElementById('productsTableBody');
     tbody.innerHTML = '';
@@ -247,7 +272,7 @@ function renderizarTabela() {
                     <div style="font-size: 48px; margin-bottom: 20px;"><i class="bi bi-box-seam"></i></div>
                     <div>Nenhum produto encontrado</div>
                     <div style="font-size: 14px; margin-top: 10px;">
-                        ${produtosEmMemoria.length === 0 ? 'Cadastre seu primeiro produto!' : 'Tente ajustar os filtros de busca.'}
+                        ${totalProdutosCadastrados === 0 ? 'Cadastre seu primeiro produto!' : 'Tente ajustar os filtros de busca.'}
                     </div>
                 </td>
             </tr>
@@ -298,79 +323,37 @@ function renderizarTabela() {
 }
 
 /**
- * Renderiza a paginação
+ * Renderiza o botão "Carregar mais" quando há próxima página
  */
 function renderizarPaginacao() {
-    const totalPaginas = Math.ceil(produtosFiltrados.length / itensPorPagina);
     const pagination = document.getElementById('pagination');
-    
-    if (totalPaginas <= 1) {
+
+    if (!proximoCursorProdutos) {
         pagination.innerHTML = '';
         return;
     }
 
-    let paginacaoHTML = '<div class="pagination-controls">';
-    
-    // Botão anterior
-    if (paginaAtual > 1) {
-        paginacaoHTML += `<button class="pagination-btn" onclick="irParaPagina(${paginaAtual - 1})">‹ Anterior</button>`;
-    }
-    
-    // Números das páginas
-    for (let i = 1; i <= totalPaginas; i++) {
-        if (i === paginaAtual) {
-            paginacaoHTML += `<button class="pagination-btn active">${i}</button>`;
-        } else {
-            paginacaoHTML += `<button class="pagination-btn" onclick="irParaPagina(${i})">${i}</button>`;
-        }
-    }
-    
-    // Botão próximo
-    if (paginaAtual < totalPaginas) {
-        paginacaoHTML += `<button class="pagination-btn" onclick="irParaPagina(${paginaAtual + 1})">Próximo ›</button>`;
-    }
-    
-    paginacaoHTML += '</div>';
-    pagination.innerHTML = paginacaoHTML;
+    pagination.innerHTML = `
+        <div class="pagination-controls">
+            <button class="pagination-btn" onclick="carregarMaisProdutos()">Carregar mais</button>
+        </div>
+    `;
 }
 
 /**
- * Vai para uma página específica
+ * Aplica filtros: busca, categoria e situação rodam no servidor
  */
-function irParaPagina(pagina) {
-    paginaAtual = pagina;
-    renderizarTabela();
-    renderizarPaginacao();
+function aplicarFiltros() {
+    clearTimeout(temporizadorBuscaProdutos);
+    return carregarProdutos();
 }
 
 /**
- * Aplica filtros de busca
+ * Busca com atraso, para não consultar a API a cada tecla
  */
-function aplicarFiltros() {
-    const termoBusca = document.getElementById('searchInput').value.trim();
-    const filtroCategoria = document.getElementById('categoryFilter').value;
-    const filtroStatus = document.querySelector('.filter-btn.active[data-filter]')?.getAttribute('data-filter') || 'all';
-
-    // Busca por termo
-    let produtos = buscarProdutos(termoBusca);
-
-    // Filtro por categoria
-    if (filtroCategoria) {
-        produtos = produtos.filter(p => p.categoria.toLowerCase() === filtroCategoria.toLowerCase());
-    }
-
-    // Filtro por status
-    if (filtroStatus !== 'all') {
-        produtos = produtos.filter(p => {
-            const status = calcularStatusEstoque(p.quantidade, p.estoqueMinimo);
-            return status === filtroStatus;
-        });
-    }
-
-    produtosFiltrados = produtos;
-    paginaAtual = 1;
-    renderizarTabela();
-    renderizarPaginacao();
+function aplicarBusca() {
+    clearTimeout(temporizadorBuscaProdutos);
+    temporizadorBuscaProdutos = setTimeout(carregarProdutos, 300);
 }
 
 /**
@@ -589,7 +572,6 @@ async function excluirProduto(id) {
             await removerProduto(id);
             alert('Produto excluído com sucesso!');
             await carregarProdutos(); // Recarrega produtos após exclusão
-            aplicarFiltros();
             atualizarEstatisticas();
         } catch (e) {
             alert('Erro ao excluir produto. Tente novamente.');
@@ -634,9 +616,7 @@ function exportarProdutos() {
  * Inicializa o módulo de estoque - deve ser chamada apenas após o DOM estar carregado
  */
 async function initEstoque() {
-    await carregarProdutos();
-    aplicarFiltros();
-    atualizarEstatisticas();
+    await Promise.all([carregarProdutos(), atualizarEstatisticas()]);
     console.log('✅ estoque.js carregado com sucesso!');
     console.log('📊 Total de produtos:', produtosEmMemoria.length);
 }
@@ -676,7 +656,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
                 fecharModal();
                 await carregarProdutos(); // Recarrega produtos após operação
-                aplicarFiltros();
                 atualizarEstatisticas();
             } catch (e) {
                 // Exibe a mensagem de erro do backend se disponível
@@ -2,10 +2,9 @@
 // FINANCEIRO.JS - Lógica específica da página financeiro
 // ========================================
 
-// Variáveis globais para armazenar dados em memória
-let osEmMemoria = [];
-let clientesEmMemoria = [];
-let produtosEmMemoria = [];
+// Resumos calculados no servidor (/api/financeiro/resumo)
+let resumoPeriodo = null;
+let resumoGrafico = null;
 
 // Variáveis de controle
 let periodoAtual = 'mes_atual';
@@ -18,54 +17,30 @@ let chartReceitasVsCustos = null;
 // ============================
 
 /**
- * Carrega todas as OS da API
+ * Carrega o resumo do período selecionado (agregado no servidor)
  */
-async function carregarOS() {
-    try {
-        console.log('📡 Carregando OS para financeiro...');
-        const os = await listarOSApi();
-        osEmMemoria = os || [];
-        console.log('✅ OS carregadas:', osEmMemoria.length);
-        return osEmMemoria;
-    } catch (e) {
-        console.error('❌ Erro ao carregar OS:', e);
-        osEmMemoria = [];
-        return osEmMemoria;
-    }
-}
-
-/**
- * Carrega todos os clientes da API
- */
-async function carregarClientes() {
-    try {
-        console.log('📡 Carregando clientes para financeiro...');
-        const clientes = await listarClientesApi();
-        clientesEmMemoria = clientes || [];
-        console.log('✅ Clientes carregados:', clientesEmMemoria.length);
-        return clientesEmMemoria;
-    } catch (e) {
-        console.error('❌ Erro ao carregar clientes:', e);
-        clientesEmMemoria = [];
-        return clientesEmMemoria;
-    }
+async function carregarResumoPeriodo() {
+    const { inicio, fim } = getPeriodoDatas();
+    resumoPeriodo = await resumoFinanceiroApi({
+        inicio: formatarDataISO(inicio),
+        fim: formatarDataISO(fim),
+        agrupamento: 'dia'
+    });
+    return resumoPeriodo;
 }
 
 /**
- * Carrega todos os produtos da API
+ * Carrega a série mensal dos últimos 6 meses para o gráfico
  */
-async function carregarProdutos() {
-    try {
-        console.log('📡 Carregando produtos para financeiro...');
-        const produtos = await listarProdutosApi();
-        produtosEmMemoria = produtos || [];
-        console.log('✅ Produtos carregados:', produtosEmMemoria.length);
-        return produtosEmMemoria;
-    } catch (e) {
-        console.error('❌ Erro ao carregar produtos:', e);
-        produtosEmMemoria = [];
-        return produtosEmMemoria;
-    }
+async function carregarResumoGrafico() {
+    const hoje = new Date();
+    resumoGrafico = await resumoFinanceiroApi({
+        inicio: formatarDataISO(new Date(hoje.getFullYear(), hoje.getMonth() - 5, 1)),
+        fim: formatarDataISO(new Date(hoje.getFullYear(), hoje.getMonth() + 1, 0)),
+        agrupamento: 'mes',
+        limiteDetalhe: 0
+    });
+    return resumoGrafico;
 }
 
 // ============================
@@ -76,28 +51,7 @@ async function carregarProdutos() {
  * Calcula métricas financeiras baseado no período
  */
 function calcularMetricasFinanceiras() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    // Filtra OS do período e status entregue
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
-
-    // Calcula receitas (valor das OS entregues)
-    const receitas = osPeriodo.reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-
-    // Calcula custos (estimativa baseada em produtos com estoque baixo)
-    const custos = produtosEmMemoria.reduce((total, produto) => {
-        // Estimativa: custo médio por produto x quantidade em estoque baixa
-        const custoEstimado = produto.quantidade < produto.estoqueMinimo ?
-            (produto.precoCusto || 0) * (produto.estoqueMinimo - produto.quantidade) : 0;
-        return total + custoEstimado;
-    }, 0);
-
-    const lucro = receitas - custos;
-    const margem = receitas > 0 ? ((lucro / receitas) * 100) : 0;
+    const { receitas, custos, lucro, margem } = resumoPeriodo;
 
     // Atualiza indicadores na interface
     document.getElementById('totalReceitas').textContent = formatarMoeda(receitas);
@@ -211,32 +165,25 @@ function gerarDadosGrafico() {
     const receitas = [];
     const custos = [];
 
+    const receitasPorMes = {};
+    (resumoGrafico?.serie || []).forEach(ponto => {
+        receitasPorMes[ponto.periodo] = ponto.receitas;
+    });
+
+    // Custos estimados (igual para todos os meses por enquanto)
+    const custosMes = (resumoGrafico?.custos || 0) / 6; // Divide pelos 6 meses
+
     // Últimos 6 meses
     for (let i = 5; i >= 0; i--) {
         const data = new Date();
+        data.setDate(1);
         data.setMonth(data.getMonth() - i);
 
         const mes = data.toLocaleDateString('pt-BR', { month: 'short', year: '2-digit' });
         labels.push(mes);
 
-        // Calcula receitas do mês
-        const inicioMes = new Date(data.getFullYear(), data.getMonth(), 1);
-        const fimMes = new Date(data.getFullYear(), data.getMonth() + 1, 0);
-
-        const receitasMes = osEmMemoria
-            .filter(os => {
-                if (os.status !== 'entregue') return false;
-                const dataOS = new Date(os.dataCriacao);
-                return dataOS >= inicioMes && dataOS <= fimMes;
-            })
-            .reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-
-        // Custos estimados (igual para todos os meses por enquanto)
-        const custosMes = produtosEmMemoria.reduce((total, produto) => {
-            return total + ((produto.precoCusto || 0) * Math.max(0, produto.estoqueMinimo - produto.quantidade));
-        }, 0) / 6; // Divide pelos 6 meses
-
-        receitas.push(receitasMes);
+        const chave = `${data.getFullYear()}-${String(data.getMonth() + 1).padStart(2, '0')}`;
+        receitas.push(receitasPorMes[chave] || 0);
         custos.push(custosMes);
     }
 
@@ -257,20 +204,12 @@ function renderizarRelatorios() {
  * Renderiza relatório de receitas
  */
 function renderizarRelatorioReceitas() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osReceitas = osEmMemoria
-        .filter(os => {
-            if (os.status !== 'entregue') return false;
-            const dataOS = new Date(os.dataCriacao);
-            return dataOS >= inicio && dataOS <= fim;
-        })
-        .sort((a, b) => new Date(b.dataCriacao) - new Date(a.dataCriacao));
+    const osReceitas = resumoPeriodo.receitasDetalhe;
 
     const tbody = document.getElementById('receitasTableBody');
     const count = document.getElementById('receitasCount');
 
-    count.textContent = osReceitas.length + ' OS concluídas';
+    count.textContent = resumoPeriodo.osConcluidas + ' OS concluídas';
 
     if (osReceitas.length === 0) {
         tbody.innerHTML = '<tr><td colspan="4" style="text-align: center; padding: 40px;">Nenhuma OS concluída no período</td></tr>';
@@ -292,9 +231,7 @@ function renderizarRelatorioReceitas() {
  */
 function renderizarRelatorioCustos() {
     // Por enquanto, mostra produtos com estoque baixo (custos estimados)
-    const produtosCustos = produtosEmMemoria
-        .filter(p => p.quantidade < p.estoqueMinimo)
-        .sort((a, b) => ((b.estoqueMinimo - b.quantidade) * (b.precoCusto || 0)) - ((a.estoqueMinimo - a.quantidade) * (a.precoCusto || 0)));
+    const produtosCustos = resumoPeriodo.custosDetalhe;
 
     const tbody = document.getElementById('custosTableBody');
     const count = document.getElementById('custosCount');
@@ -307,9 +244,9 @@ function renderizarRelatorioCustos() {
     }
 
     tbody.innerHTML = produtosCustos.map(produto => {
-        const qtdNecessaria = produto.estoqueMinimo - produto.quantidade;
-        const custoUnitario = produto.precoCusto || 0;
-        const custoTotal = qtdNecessaria * custoUnitario;
+        const qtdNecessaria = produto.quantidadeNecessaria;
+        const custoUnitario = produto.custoUnitario;
+        const custoTotal = produto.custoTotal;
 
         return `
             <tr>
@@ -327,21 +264,7 @@ function renderizarRelatorioCustos() {
  * Renderiza relatório de lucro
  */
 function renderizarRelatorioLucro() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
-
-    const receitas = osPeriodo.reduce((total, os) => total + (os.valorOrcamento || 0), 0);
-    const custos = produtosEmMemoria.reduce((total, produto) => {
-        return total + ((produto.precoCusto || 0) * Math.max(0, produto.estoqueMinimo - produto.quantidade));
-    }, 0);
-
-    const lucro = receitas - custos;
-    const margem = receitas > 0 ? ((lucro / receitas) * 100) : 0;
+    const { receitas, custos, lucro, margem } = resumoPeriodo;
 
     document.getElementById('resumoReceitas').textContent = formatarMoeda(receitas);
     document.getElementById('resumoCustos').textContent = formatarMoeda(custos);
@@ -353,25 +276,12 @@ function renderizarRelatorioLucro() {
  * Renderiza relatório de produtividade
  */
 function renderizarRelatorioProdutividade() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
+    const osConcluidasMes = resumoPeriodo.osConcluidas;
 
-    const osConcluidasMes = osPeriodo.filter(os => os.status === 'entregue').length;
+    // Tempo médio (estimativa simples: 3 dias por OS)
+    const tempoMedio = osConcluidasMes > 0 ? 3 : 0;
 
-    // Tempo médio (estimativa baseada na diferença entre criação e entrega)
-    const osComTempo = osPeriodo.filter(os => os.status === 'entregue');
-    const tempoTotal = osComTempo.reduce((total, os) => {
-        // Estimativa simples: 3 dias por OS
-        return total + 3;
-    }, 0);
-    const tempoMedio = osComTempo.length > 0 ? tempoTotal / osComTempo.length : 0;
-
-    const ticketMedio = osComTempo.length > 0 ?
-        osComTempo.reduce((total, os) => total + (os.valorOrcamento || 0), 0) / osComTempo.length : 0;
+    const ticketMedio = resumoPeriodo.ticketMedio;
 
     // Crescimento mensal (simplificado)
     const crescimento = 0; // TODO: implementar cálculo real
@@ -465,6 +375,15 @@ function formatarData(dataString) {
     return data.toLocaleDateString('pt-BR');
 }
 
+/**
+ * Formata data local como YYYY-MM-DD (parâmetros da API)
+ */
+function formatarDataISO(data) {
+    const mes = String(data.getMonth() + 1).padStart(2, '0');
+    const dia = String(data.getDate()).padStart(2, '0');
+    return `${data.getFullYear()}-${mes}-${dia}`;
+}
+
 // ============================
 // CONTROLES DE INTERFACE
 // ============================
@@ -476,11 +395,10 @@ async function carregarDadosFinanceiros() {
     try {
         console.log('💰 Carregando dados financeiros para período:', periodoAtual);
 
-        // Carrega OS, clientes e produtos
+        // Carrega os resumos já agregados pelo servidor
         await Promise.all([
-            carregarOS(),
-            carregarClientes(),
-            carregarProdutos()
+            carregarResumoPeriodo(),
+            carregarResumoGrafico()
         ]);
 
         // Calcula métricas
@@ -523,13 +441,7 @@ function exportarRelatorio(formato) {
  * Exporta dados em CSV
  */
 function exportarCSV() {
-    const { inicio, fim } = getPeriodoDatas();
-
-    const osPeriodo = osEmMemoria.filter(os => {
-        if (os.status !== 'entregue') return false;
-        const dataOS = new Date(os.dataCriacao);
-        return dataOS >= inicio && dataOS <= fim;
-    });
+    const osPeriodo = resumoPeriodo ? resumoPeriodo.receitasDetalhe : [];
 
     let csv = 'OS,Cliente,Data Conclusão,Valor\n';
 
@@ -13,6 +13,9 @@ class NotificationManager {
 
         this.notificacoes = [];
         this.isOpen = false;
+        this.stream = null;
+        this.falhasStream = 0;
+        this.pollingId = null;
 
         this.init();
     }
@@ -49,8 +52,80 @@ class NotificationManager {
         // Carregar notificações iniciais
         this.carregarNotificacoes();
 
-        // Atualizar contador periodicamente
-        setInterval(() => {
+        // Recebe novas notificações e o contador pelo servidor (SSE)
+        this.conectarStream();
+    }
+
+    async conectarStream() {
+        const token = getToken();
+        if (!token) return;
+
+        if (!window.EventSource) {
+            this.iniciarPolling();
+            return;
+        }
+
+        // O EventSource não envia cabeçalhos: pede um ticket de uso único
+        // (o JWT não vai na URL)
+        let ticket;
+        try {
+            const response = await fetch('/api/notificacoes/stream/ticket', {
+                method: 'POST',
+                headers: {
+                    'Authorization': `Bearer ${token}`
+                }
+            });
+            if (response.status === 503) {
+                // Servidor no limite de streams: polling até o tempo sugerido
+                const retry = (await response.json()).retry || 60;
+                this.iniciarPolling();
+                setTimeout(() => this.conectarStream(), retry * 1000);
+                return;
+            }
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            ticket = (await response.json()).ticket;
+        } catch (error) {
+            console.error('Erro ao abrir stream de notificações:', error);
+            this.iniciarPolling();
+            return;
+        }
+
+        this.stream = new EventSource(`/api/notificacoes/stream?ticket=${encodeURIComponent(ticket)}`);
+
+        this.stream.addEventListener('contador', (e) => {
+            this.falhasStream = 0;
+            this.pararPolling();
+            this.exibirContador(JSON.parse(e.data).nao_lidas || 0);
+        });
+
+        this.stream.addEventListener('notificacao', (e) => {
+            const notificacao = JSON.parse(e.data);
+            this.notificacoes = [notificacao, ...this.notificacoes.filter(n => n.id !== notificacao.id)];
+            this.renderizarNotificacoes();
+        });
+
+        this.stream.onerror = () => {
+            // O ticket já foi consumido: a reconexão automática do navegador
+            // falharia, então fecha e reconecta com um ticket novo. Falhas
+            // seguidas (ex: 503 por limite de streams) espaçam as tentativas
+            this.stream.close();
+            this.stream = null;
+            this.falhasStream++;
+            this.iniciarPolling();
+            const espera = Math.min(5000 * 2 ** (this.falhasStream - 1), 120000);
+            setTimeout(() => this.conectarStream(), espera);
+        };
+    }
+
+    pararPolling() {
+        if (!this.pollingId) return;
+        clearInterval(this.pollingId);
+        this.pollingId = null;
+    }
+
+    iniciarPolling() {
+        if (this.pollingId) return;
+        this.pollingId = setInterval(() => {
             this.atualizarContador();
         }, 30000); // A cada 30 segundos
     }
@@ -106,15 +181,18 @@ class NotificationManager {
 
             if (response.ok) {
                 const data = await response.json();
-                const count = data.nao_lidas || 0;
-                this.notificationCount.textContent = count;
-                this.notificationCount.style.display = count > 0 ? 'flex' : 'none';
+                this.exibirContador(data.nao_lidas || 0);
             }
         } catch (error) {
             console.error('Erro ao atualizar contador:', error);
         }
     }
 
+    exibirContador(count) {
+        this.notificationCount.textContent = count;
+        this.notificationCount.style.display = count > 0 ? 'flex' : 'none';
+    }
+
     renderizarNotificacoes() {
         if (this.notificacoes.length === 0) {
             this.notificationList.innerHTML = `
@@ -225,11 +303,15 @@ class NotificationManager {
 
     async marcarTodasComoLidas() {
         try {
+            // Só até a mais recente exibida: as que chegarem depois continuam não lidas
+            const ateId = this.notificacoes.reduce((maior, n) => Math.max(maior, n.id), 0);
             const response = await fetch('/api/notificacoes/marcar-todas-lidas', {
                 method: 'PUT',
                 headers: {
-                    'Authorization': `Bearer ${getToken()}`
-                }
+                    'Authorization': `Bearer ${getToken()}`,
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ ateId })
             });
 
             if (response.ok) {